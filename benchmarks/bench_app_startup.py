@@ -0,0 +1,54 @@
+"""
+Cold-start and warm-rerun time of the Streamlit app, run headless with
+`streamlit.testing` against a stand-in Neo4j driver.
+
+    python benchmarks/bench_app_startup.py [reruns]
+"""
+import os
+import sys
+import time
+from unittest.mock import MagicMock, patch
+
+import neo4j
+from streamlit.testing.v1 import AppTest
+
+REPO_ROOT = os.path.join(os.path.dirname(__file__), "..")
+# `streamlit run src/app.py` puts src/ on the path for the app's flat imports
+sys.path.insert(0, os.path.join(REPO_ROOT, "src"))
+DEFERRED_MODULES = ["neo4j_graphrag", "openai", "streamlit_agraph"]
+
+
+if __name__ == "__main__":
+    reruns = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    # The app reads its locale files relative to the repository root
+    os.chdir(REPO_ROOT)
+    os.environ.setdefault("NEO4J_URI", "neo4j://localhost:7687")
+    os.environ.setdefault("NEO4J_USERNAME", "neo4j")
+    os.environ.setdefault("NEO4J_PASSWORD", "password")
+
+    # Not the stand-ins module: it imports setup_database, which would load neo4j_graphrag up front
+    driver = MagicMock(spec=neo4j.Driver)
+    # Answers the version check Text2CypherRetriever runs when it is built
+    driver.execute_query.return_value = ([{"versions": ["5.26.0"], "edition": "enterprise"}], None, [])
+    with patch("neo4j.GraphDatabase.driver", return_value=driver):
+        app = AppTest.from_file("src/app.py", default_timeout=60)
+        start = time.perf_counter()
+        app.run()
+        cold = time.perf_counter() - start
+        if app.exception:
+            raise SystemExit(app.exception[0].message)
+
+        start = time.perf_counter()
+        for _ in range(reruns):
+            app.run()
+        warm = (time.perf_counter() - start) / reruns
+
+        start = time.perf_counter()
+        for i in range(reruns):
+            app.sidebar.selectbox[0].select(["日本語", "English"][i % 2]).run()
+        interaction = (time.perf_counter() - start) / reruns
+
+    print(f"cold start:          {cold * 1000:8.1f}ms")
+    print(f"warm rerun:          {warm * 1000:8.1f}ms")
+    print(f"widget interaction:  {interaction * 1000:8.1f}ms")
+    print(f"not yet imported:    {', '.join(name for name in DEFERRED_MODULES if name not in sys.modules)}")
@@ -0,0 +1,50 @@
+"""
+Compare one statement per row against UNWIND bulk statements when flushing a
+buffered graph, using a stand-in driver that counts statements and rows.
+
+    python benchmarks/bench_bulk_writes.py [n_works] [round_trip_seconds]
+"""
+import sys
+import time
+
+from stand_ins import counting_handler, synthetic_work
+
+
+def fill(handler, n_works: int) -> None:
+    seed = synthetic_work(0)
+    handler.add_work(seed)
+    for i in range(1, n_works):
+        work = synthetic_work(i)
+        author = {"id": f"https://openalex.org/A{i % 997}", "display_name": f"Author {i % 997}"}
+        institution = {"id": f"https://openalex.org/I{i % 53}", "display_name": f"Institution {i % 53}"}
+        handler.add_work(work)
+        handler.add_author(author)
+        handler.add_institution(institution)
+        handler.add_authored(author, work)
+        handler.add_affiliated_with(author, institution)
+        handler.add_referenced(seed, work)
+
+
+def per_row(n_works: int, round_trip: float):
+    with counting_handler(round_trip) as (handler, driver):
+        fill(handler, n_works)
+        start = time.perf_counter()
+        with driver.session() as session:
+            session.execute_write(lambda tx: [tx.run(query, **params) for query, params in handler.query_buffer])
+        return time.perf_counter() - start, driver
+
+
+def bulk(n_works: int, round_trip: float):
+    with counting_handler(round_trip) as (handler, driver):
+        fill(handler, n_works)
+        start = time.perf_counter()
+        handler.flush()
+        return time.perf_counter() - start, driver
+
+
+if __name__ == "__main__":
+    n_works = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    round_trip = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0005
+    for name, run in [("per-row", per_row), ("unwind", bulk)]:
+        elapsed, driver = run(n_works, round_trip)
+        print(f"{name:8s} statements={driver.statements:6d} rows={driver.rows:6d} time={elapsed:.3f}s")
@@ -0,0 +1,31 @@
+"""
+Embeddings requests per work and embedding time when Work titles are embedded one
+request per title versus in batches.
+
+    python benchmarks/bench_embedding_batches.py [n_works] [latency_seconds]
+"""
+import sys
+import time
+
+from stand_ins import FakeEmbedder, counting_handler, synthetic_work
+
+
+def run(n_works: int, latency: float, batch_size: int, max_in_flight: int):
+    embedder = FakeEmbedder(latency)
+    with counting_handler(0.0, embedder=embedder, embedding_batch_size=batch_size, max_in_flight_batches=max_in_flight) as (handler, _):
+        for i in range(n_works):
+            handler.add_work(synthetic_work(i))
+        start = time.perf_counter()
+        handler.embed_pending()
+        return time.perf_counter() - start, embedder.requests
+
+
+if __name__ == "__main__":
+    n_works = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.005
+    for batch_size, max_in_flight in [(1, 1), (100, 1), (100, 4)]:
+        elapsed, requests = run(n_works, latency, batch_size, max_in_flight)
+        print(
+            f"batch_size={batch_size:4d} in_flight={max_in_flight} requests={requests:5d} "
+            f"requests/work={requests / n_works:.3f} time={elapsed:.3f}s"
+        )
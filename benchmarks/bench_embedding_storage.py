@@ -0,0 +1,85 @@
+"""
+Storage per work and recall@k of shortened and quantized title embeddings, against exact
+search over the full 1536-dimensional vectors. Shortening keeps the leading dimensions
+and renormalizes, which is what the API's `dimensions` parameter returns for
+text-embedding-3 models.
+
+The corpus is the full-size vectors in the embedding cache when it holds at least
+`n_works` of them; otherwise synthetic vectors whose variance decays over the dimensions,
+so the recall figures are only illustrative.
+
+    python benchmarks/bench_embedding_storage.py [n_works] [queries] [k]
+"""
+import os
+import sqlite3
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from config import EMBEDDING_CACHE_PATH, EMBEDDING_MODEL
+from vector_index import quantize, unit_rows
+
+FULL_DIMENSIONS = 1536
+DIMENSIONS = [1536, 1024, 768, 512, 256]
+
+
+def cached_vectors(n_works: int) -> np.ndarray | None:
+    if not os.path.exists(EMBEDDING_CACHE_PATH):
+        return None
+    connection = sqlite3.connect(EMBEDDING_CACHE_PATH)
+    rows = connection.execute(
+        "SELECT vector FROM embeddings WHERE model = ? AND dimensions = 0 LIMIT ?", (EMBEDDING_MODEL, n_works)
+    ).fetchall()
+    connection.close()
+    if len(rows) < n_works:
+        return None
+    return np.array([np.frombuffer(vector, dtype=np.float32) for vector, in rows])
+
+
+def synthetic_vectors(n_works: int, seed: int = 0) -> np.ndarray:
+    """
+    Clustered vectors with most of the variance in the leading dimensions.
+    """
+    rng = np.random.default_rng(seed)
+    spread = 1.0 / np.sqrt(1.0 + np.arange(FULL_DIMENSIONS) / 64.0)
+    centers = rng.normal(size=(max(n_works // 50, 1), FULL_DIMENSIONS)) * spread
+    members = centers[rng.integers(0, len(centers), size=n_works)]
+    return (members + 0.5 * rng.normal(size=(n_works, FULL_DIMENSIONS)) * spread).astype(np.float32)
+
+
+def top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    return np.argpartition(-(queries @ corpus.T), k - 1, axis=1)[:, :k]
+
+
+def recall(found: np.ndarray, expected: np.ndarray) -> float:
+    return float(np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(found, expected)]))
+
+
+if __name__ == "__main__":
+    n_works = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    k = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+    corpus = cached_vectors(n_works)
+    if corpus is None:
+        print(f"corpus: {n_works} synthetic vectors (no {n_works} cached {EMBEDDING_MODEL} vectors); recall is illustrative")
+        corpus = synthetic_vectors(n_works)
+    else:
+        print(f"corpus: {n_works} cached {EMBEDDING_MODEL} title vectors")
+    rng = np.random.default_rng(1)
+    # Questions land near titles: perturbed corpus rows, left out of the corpus searched
+    held_out = rng.choice(n_works, size=n_queries, replace=False)
+    queries = corpus[held_out] + 0.3 * rng.normal(size=(n_queries, corpus.shape[1])).astype(np.float32) * corpus.std(axis=0)
+    corpus = np.delete(corpus, held_out, axis=0)
+
+    expected = top_k(unit_rows(corpus.astype(np.float64)), unit_rows(queries.astype(np.float64)), k)
+    print(f"{'dims':>5s} {'neo4j float64':>14s} {'neo4j float32':>14s} {'local int8':>11s}   recall@{k} float32  int8")
+    for dimensions in DIMENSIONS:
+        shortened = unit_rows(corpus[:, :dimensions].astype(np.float32))
+        shortened_queries = unit_rows(queries[:, :dimensions].astype(np.float32))
+        float_recall = recall(top_k(shortened, shortened_queries, k), expected)
+        quantized, scales = quantize(shortened)
+        int8_recall = recall(top_k(quantized.astype(np.float32) * scales[:, None], shortened_queries, k), expected)
+        print(f"{dimensions:5d} {8 * dimensions:12d} B {4 * dimensions:12d} B {dimensions + 4:9d} B   "
+              f"{float_recall:15.3f} {int8_recall:5.3f}")
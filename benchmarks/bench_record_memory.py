@@ -0,0 +1,81 @@
+"""
+Peak traced memory of holding 10k works as parsed full OpenAlex dicts versus
+`select`-projected responses converted to compact records.
+
+    python benchmarks/bench_record_memory.py [n_works]
+"""
+import json
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from records import WORK_FIELDS, WorkRecord
+
+
+def full_work(i: int, rng: random.Random) -> dict:
+    """
+    A work shaped like a full OpenAlex response, with the fields the crawl never reads.
+    """
+    words = [f"word{rng.randrange(5000)}" for _ in range(150)]
+    return {
+        "id": f"https://openalex.org/W{i}",
+        "doi": f"https://doi.org/10.0000/{i}",
+        "title": f"Synthetic work {i}",
+        "display_name": f"Synthetic work {i}",
+        "publication_year": 2020,
+        "updated_date": "2024-01-01T00:00:00.000000",
+        "cited_by_count": rng.randrange(1000),
+        "authorships": [
+            {
+                "author_position": "middle",
+                "author": {"id": f"https://openalex.org/A{rng.randrange(20000)}", "display_name": "Author", "orcid": None},
+                "institutions": [{"id": f"https://openalex.org/I{rng.randrange(2000)}", "display_name": "Institution", "country_code": "JP", "type": "education"}],
+                "raw_affiliation_strings": ["Department of Synthetic Data, Example University"],
+            }
+            for _ in range(6)
+        ],
+        "referenced_works": [f"https://openalex.org/W{rng.randrange(50000)}" for _ in range(40)],
+        "related_works": [f"https://openalex.org/W{rng.randrange(50000)}" for _ in range(20)],
+        "abstract_inverted_index": {word: [position] for position, word in enumerate(words)},
+        "concepts": [{"id": f"https://openalex.org/C{c}", "display_name": "Concept", "level": 1, "score": 0.5} for c in range(10)],
+        "locations": [{"is_oa": True, "landing_page_url": f"https://example.org/{i}", "pdf_url": None, "source": {"display_name": "Journal"}} for _ in range(2)],
+        "counts_by_year": [{"year": 2020 + y, "cited_by_count": y} for y in range(5)],
+    }
+
+
+def responses(n_works: int, fields: list[str] | None) -> list[str]:
+    rng = random.Random(0)
+    bodies = []
+    for start in range(0, n_works, 100):
+        works = [full_work(i, rng) for i in range(start, min(start + 100, n_works))]
+        if fields:
+            works = [{field: work[field] for field in fields} for work in works]
+        bodies.append(json.dumps({"results": works}))
+    return bodies
+
+
+def peak_memory(bodies: list[str], to_record) -> tuple[int, int]:
+    tracemalloc.start()
+    held = []
+    for body in bodies:
+        held.extend(to_record(work) for work in json.loads(body)["results"])
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, peak
+
+
+if __name__ == "__main__":
+    n_works = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    for name, fields, to_record in [
+        ("full dicts", None, lambda work: work),
+        ("projected dicts", WORK_FIELDS, lambda work: work),
+        ("projected records", WORK_FIELDS, WorkRecord.from_openalex),
+    ]:
+        current, peak = peak_memory(responses(n_works, fields), to_record)
+        print(
+            f"{name:18s} held={current / 2**20:7.1f}MiB peak={peak / 2**20:7.1f}MiB "
+            f"peak/10k works={peak / n_works * 10_000 / 2**20:7.1f}MiB"
+        )
@@ -0,0 +1,92 @@
+"""
+Latency of connection paths on a synthetic citation graph: bidirectional BFS over the
+in-memory CSR snapshot against a one-sided BFS over the same snapshot and, when
+NEO4J_URI is set and `--neo4j` is given, against Cypher `SHORTEST 1` on the same graph
+written to that database (into the `:Work` label, so use a scratch database).
+
+    python benchmarks/bench_shortest_paths.py [n_works] [references_per_work] [pairs] [--neo4j]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from graph import GraphSnapshot
+
+
+def synthetic_graph(n_works: int, references: int, seed: int = 0) -> tuple[GraphSnapshot, np.ndarray, np.ndarray]:
+    """
+    Every work cites `references` earlier works, biased towards older ones as citations are.
+    """
+    rng = np.random.default_rng(seed)
+    sources = np.repeat(np.arange(1, n_works), references)
+    targets = (rng.random(len(sources)) ** 2 * sources).astype(np.int64)
+    ids = [f"W{i}" for i in range(n_works)]
+    return GraphSnapshot.from_edges(ids, np.zeros(n_works), sources, targets), sources, targets
+
+
+def one_sided(graph: GraphSnapshot, source: str, target: str) -> int:
+    """
+    Length of the shortest path by plain breadth-first search from the source.
+    """
+    distance = np.full(len(graph.ids), -1, dtype=np.int32)
+    frontier = np.array([graph.index[source]], dtype=np.int32)
+    distance[frontier] = 0
+    goal = graph.index[target]
+    hops = 0
+    while len(frontier) and distance[goal] < 0:
+        hops += 1
+        reached = graph.expand(frontier)
+        frontier = np.unique(reached[distance[reached] < 0])
+        distance[frontier] = hops
+    return int(distance[goal])
+
+
+def load_into_neo4j(driver, ids: list[str], sources: np.ndarray, targets: np.ndarray, batch: int = 20000) -> None:
+    driver.execute_query("CREATE CONSTRAINT constraint_unique_work_id IF NOT EXISTS FOR (n:Work) REQUIRE n.id IS UNIQUE")
+    for start in range(0, len(ids), batch):
+        driver.execute_query("UNWIND $ids AS id MERGE (:Work {id: id})", parameters_={"ids": ids[start:start + batch]})
+    for start in range(0, len(sources), batch):
+        rows = [{"source": ids[s], "target": ids[t]} for s, t in zip(sources[start:start + batch], targets[start:start + batch])]
+        driver.execute_query(
+            "UNWIND $rows AS row MATCH (a:Work {id: row.source}), (b:Work {id: row.target}) MERGE (a)-[:REFERENCED]->(b)",
+            parameters_={"rows": rows},
+        )
+
+
+def timed(run, pairs) -> float:
+    start = time.perf_counter()
+    for source, target in pairs:
+        run(source, target)
+    return (time.perf_counter() - start) / len(pairs)
+
+
+if __name__ == "__main__":
+    arguments = [argument for argument in sys.argv[1:] if not argument.startswith("--")]
+    n_works = int(arguments[0]) if len(arguments) > 0 else 300000
+    references = int(arguments[1]) if len(arguments) > 1 else 4
+    n_pairs = int(arguments[2]) if len(arguments) > 2 else 50
+
+    start = time.perf_counter()
+    graph, sources, targets = synthetic_graph(n_works, references)
+    print(f"snapshot: {len(graph.ids)} nodes, {graph.edge_count} edges, "
+          f"{(graph.indptr.nbytes + graph.indices.nbytes) / 2**20:.1f} MiB CSR, built in {time.perf_counter() - start:.2f}s")
+
+    rng = np.random.default_rng(1)
+    pairs = [(graph.ids[a], graph.ids[b]) for a, b in rng.integers(0, n_works, size=(n_pairs, 2))]
+    lengths = [len(graph.shortest_paths([a], [b])[0]) - 1 for a, b in pairs]
+    print(f"path lengths: min={min(lengths)} median={int(np.median(lengths))} max={max(lengths)}")
+
+    bidirectional = timed(lambda a, b: graph.shortest_paths([a], [b]), pairs)
+    print(f"bidirectional BFS:  {bidirectional * 1000:8.2f}ms per path")
+    print(f"one-sided BFS:      {timed(lambda a, b: one_sided(graph, a, b), pairs) * 1000:8.2f}ms per path")
+
+    if "--neo4j" in sys.argv and os.getenv("NEO4J_URI"):
+        from neo4j import GraphDatabase
+        with GraphDatabase.driver(os.getenv("NEO4J_URI"), auth=(os.getenv("NEO4J_USERNAME"), os.getenv("NEO4J_PASSWORD"))) as driver:
+            load_into_neo4j(driver, graph.ids, sources, targets)
+            cypher = "MATCH p = SHORTEST 1 (a:Work {id: $source})-[*]-(b:Work {id: $target}) RETURN p"
+            neo4j_time = timed(lambda a, b: driver.execute_query(cypher, parameters_={"source": a, "target": b}, routing_="r"), pairs)
+            print(f"Cypher SHORTEST 1:  {neo4j_time * 1000:8.2f}ms per path")
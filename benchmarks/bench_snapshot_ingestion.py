@@ -0,0 +1,55 @@
+"""
+Throughput of the streaming snapshot pipeline writing neo4j-admin import CSVs, on a
+synthetic snapshot of gzipped JSON-lines parts.
+
+    python benchmarks/bench_snapshot_ingestion.py [n_works]
+"""
+import gzip
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from ingest_snapshot import CsvSink, ingest_snapshot
+
+
+def write_part(path: str, records) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def write_snapshot(directory: str, n_works: int) -> None:
+    n_authors = max(n_works // 10, 1)
+    n_institutions = max(n_works // 100, 1)
+    works = (
+        {
+            "id": f"https://openalex.org/W{i}",
+            "title": f"Work {i}",
+            "concepts": [{"id": f"https://openalex.org/C{1 + i % 2}"}],
+            "authorships": [{"author": {"id": f"https://openalex.org/A{i % n_authors}"}}],
+            "referenced_works": [f"https://openalex.org/W{j}" for j in range(max(0, i - 3), i)],
+        }
+        for i in range(n_works)
+    )
+    authors = (
+        {"id": f"https://openalex.org/A{i}", "display_name": f"Author {i}", "affiliations": [{"institution": {"id": f"https://openalex.org/I{i % n_institutions}"}}]}
+        for i in range(n_authors)
+    )
+    institutions = ({"id": f"https://openalex.org/I{i}", "display_name": f"Institution {i}"} for i in range(n_institutions))
+    write_part(os.path.join(directory, "works", "updated_date=2024-01-01", "part_000.gz"), works)
+    write_part(os.path.join(directory, "authors", "updated_date=2024-01-01", "part_000.gz"), authors)
+    write_part(os.path.join(directory, "institutions", "updated_date=2024-01-01", "part_000.gz"), institutions)
+
+
+if __name__ == "__main__":
+    n_works = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    with tempfile.TemporaryDirectory() as directory:
+        write_snapshot(os.path.join(directory, "snapshot"), n_works)
+        sink = CsvSink(os.path.join(directory, "import"))
+        summary = ingest_snapshot(os.path.join(directory, "snapshot"), sink)
+        sink.close()
+    print(f"snapshot ingestion: {summary['works']} works, {summary['authors']} authors, {summary['institutions']} institutions "
+          f"in {summary['seconds']:.2f}s, {summary['records_per_second']:.0f} records/sec")
@@ -0,0 +1,44 @@
+"""
+Time the authors-of-a-paper question with the old `lower(w.title) CONTAINS` scan
+against resolving the title through the normalized-title and full-text indexes.
+Needs a Neo4j database with the crawled graph and the indexes from `create_indexes`
+(NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD).
+
+    python benchmarks/bench_title_resolution.py [repeats]
+"""
+import os
+import sys
+import time
+
+from neo4j import GraphDatabase
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from entity_resolution import EntityResolver
+from intent import AUTHORS_OF_WORK_QUERY
+
+CONTAINS_QUERY = (
+    "MATCH (a:Author)-[r:AUTHORED]->(w:Work) "
+    "WHERE lower(w.title) CONTAINS lower($title) "
+    "RETURN a, r, w"
+)
+
+
+def timed(run, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        run()
+    return (time.perf_counter() - start) / repeats
+
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    with GraphDatabase.driver(os.getenv("NEO4J_URI"), auth=(os.getenv("NEO4J_USERNAME"), os.getenv("NEO4J_PASSWORD"))) as driver:
+        records, _, _ = driver.execute_query("MATCH (w:Work) WHERE w.title IS NOT NULL RETURN w.title AS title LIMIT 5", routing_="r")
+        resolver = EntityResolver(driver)
+        for title in [record["title"] for record in records]:
+            # A one-letter typo misses the exact match and goes through the full-text index
+            typo = title[:3] + title[4:] if len(title) > 4 else title
+            scan = timed(lambda: driver.execute_query(CONTAINS_QUERY, parameters_={"title": title}, routing_="r"), repeats)
+            exact = timed(lambda: driver.execute_query(AUTHORS_OF_WORK_QUERY, parameters_=resolver.resolve_mentions({"title": title}), routing_="r"), repeats)
+            fuzzy = timed(lambda: driver.execute_query(AUTHORS_OF_WORK_QUERY, parameters_=resolver.resolve_mentions({"title": typo}), routing_="r"), repeats)
+            print(f"{title[:40]:40s} contains={scan * 1000:7.1f}ms exact={exact * 1000:7.1f}ms fulltext={fuzzy * 1000:7.1f}ms")
@@ -0,0 +1,79 @@
+"""
+Build, refresh and query the local vector index on synthetic Work vectors, float32 and
+int8, exported from a stand-in driver that generates the vectors batch by batch.
+With NEO4J_URI set, the same queries are also timed against the Neo4j vector index.
+
+    python benchmarks/bench_vector_index.py [n_works] [dimensions] [queries]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+from vector_index import DIMENSIONS_QUERY, EXPORT_QUERY, LocalVectorIndex
+
+
+class GeneratingDriver:
+    """
+    Answers the index's queries for works W0..W{n-1}, each with a vector seeded by its number.
+    """
+    def __init__(self, n_works: int, dimensions: int):
+        self.n_works = n_works
+        self.dimensions = dimensions
+
+    def vector(self, work_id: str) -> list[float]:
+        return np.random.default_rng(int(work_id[1:])).normal(size=self.dimensions).tolist()
+
+    def execute_query(self, query, parameters_=None, routing_=None):
+        if query == EXPORT_QUERY:
+            return [{"id": i, "title": f"Paper {i}", "title_hash": i, "vector": self.vector(i)} for i in parameters_["ids"]], None, None
+        if query == DIMENSIONS_QUERY:
+            return [{"dimensions": self.dimensions}], None, None
+        return [{"id": f"W{i}", "title_hash": f"W{i}"} for i in range(self.n_works)], None, None
+
+
+def timed(run, repeats: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        run()
+    return (time.perf_counter() - start) / repeats
+
+
+if __name__ == "__main__":
+    n_works = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    dimensions = int(sys.argv[2]) if len(sys.argv) > 2 else 1536
+    n_queries = int(sys.argv[3]) if len(sys.argv) > 3 else 32
+    queries = np.random.default_rng(10**9).normal(size=(n_queries, dimensions))
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for dtype in ["float32", "int8"]:
+            driver = GeneratingDriver(n_works, dimensions)
+            index = LocalVectorIndex(os.path.join(directory, dtype), dtype=dtype)
+            start = time.perf_counter()
+            index.refresh(driver)
+            build = time.perf_counter() - start
+
+            driver.n_works = n_works + n_works // 100
+            start = time.perf_counter()
+            refreshed = index.refresh(driver)
+            refresh = time.perf_counter() - start
+
+            single = timed(lambda: [index.search([query], 3) for query in queries], 1) / n_queries
+            batched = timed(lambda: index.search(queries, 3), 1) / n_queries
+            results[dtype] = [[work_id for work_id, _, _ in result] for result in index.search(queries, 3)]
+            print(f"{dtype:7s} {index.state.matrix.nbytes / 2**20:7.1f} MiB  build={build:6.1f}s  "
+                  f"refresh(+1%)={refresh:5.1f}s {refreshed}  query={single * 1000:6.2f}ms  batched={batched * 1000:6.2f}ms/query")
+
+    agreement = np.mean([len(set(a) & set(b)) / 3 for a, b in zip(results["float32"], results["int8"])])
+    print(f"int8 top-3 overlap with float32: {agreement:.3f}")
+
+    if os.getenv("NEO4J_URI"):
+        from neo4j import GraphDatabase
+        with GraphDatabase.driver(os.getenv("NEO4J_URI"), auth=(os.getenv("NEO4J_USERNAME"), os.getenv("NEO4J_PASSWORD"))) as driver:
+            cypher = "CALL db.index.vector.queryNodes('work-vector-index', 3, $vector) YIELD node, score RETURN node.title, score"
+            neo4j_time = timed(lambda: [driver.execute_query(cypher, {"vector": query[:1536].tolist()}) for query in queries], 1) / n_queries
+            print(f"neo4j vector index query: {neo4j_time * 1000:6.2f}ms (round trip included)")
@@ -0,0 +1,101 @@
+"""
+Local stand-ins for Neo4j and OpenAI used by the benchmark scripts.
+"""
+import os
+import sys
+import time
+from contextlib import contextmanager
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
+
+from setup_database import Neo4jHandler
+
+
+class CountingTransaction:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def run(self, query, **parameters):
+        self.driver.statements += 1
+        self.driver.rows += len(parameters["rows"]) if "rows" in parameters else 1
+        time.sleep(self.driver.round_trip)
+
+
+class CountingSession:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute_write(self, work):
+        self.driver.transactions += 1
+        return work(CountingTransaction(self.driver))
+
+
+class CountingDriver:
+    """
+    Counts statements, rows and transactions, and sleeps `round_trip` seconds per statement
+    to stand in for the network latency to a remote database.
+    """
+    def __init__(self, round_trip: float = 0.0005):
+        self.round_trip = round_trip
+        self.statements = 0
+        self.rows = 0
+        self.transactions = 0
+
+    def verify_connectivity(self):
+        return None
+
+    def session(self):
+        return CountingSession(self)
+
+    def execute_query(self, query, parameters=None, **kwargs):
+        self.statements += 1
+        time.sleep(self.round_trip)
+        return [], None, []
+
+    def close(self):
+        return None
+
+
+class FakeEmbedder:
+    """
+    Deterministic embedder that sleeps `latency` seconds per request, like a remote embeddings API.
+    """
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.requests += 1
+        time.sleep(self.latency)
+        return [[float(len(text)), float(sum(map(ord, text)) % 997), 1.0] for text in texts]
+
+
+@contextmanager
+def counting_handler(round_trip: float = 0.0005, **kwargs):
+    driver = CountingDriver(round_trip)
+    kwargs.setdefault("embedder", FakeEmbedder())
+    with patch("setup_database.GraphDatabase.driver", return_value=driver):
+        handler = Neo4jHandler(uri="bolt://localhost:7687", username="neo4j", password="password", **kwargs)
+    try:
+        yield handler, driver
+    finally:
+        handler.close()
+
+
+def synthetic_work(i: int, n_refs: int = 0) -> dict:
+    return {
+        "id": f"https://openalex.org/W{i}",
+        "title": f"Synthetic work {i}",
+        "authorships": [{"author": {"id": f"https://openalex.org/A{i % 997}"}}],
+        "referenced_works": [f"https://openalex.org/W{(i * 31 + k) % 100000}" for k in range(n_refs)],
+    }
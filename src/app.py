@@ -1,18 +1,27 @@
 import json
 import os
+from contextlib import nullcontext
 import neo4j.graph
 import streamlit as st
-from streamlit_agraph import agraph, Node, Edge, Config
 import neo4j
 from neo4j import GraphDatabase
 from neo4j.exceptions import ServiceUnavailable
-from neo4j_graphrag.retrievers import Text2CypherRetriever
-from neo4j_graphrag.llm import OpenAILLM
-from neo4j_graphrag.embeddings import OpenAIEmbeddings
-from config import NEO4J_SCHEMA, EXAMPLES
+from config import NEO4J_SCHEMA, EXAMPLES, CYPHER_CACHE_MAX_ENTRIES, CYPHER_CACHE_TTL_SECONDS, CYPHER_CACHE_SIMILARITY, FEW_SHOT_EXAMPLES
+from config import QUERY_MAX_HOPS, QUERY_LIMIT, QUERY_TIMEOUT_SECONDS, QUERY_MAX_NODES, QUERY_MAX_EDGES
+from config import GRAPH_SNAPSHOT_TTL_SECONDS, CONNECTION_PATHS, LOCAL_VECTOR_INDEX_DIR, QUERY_METRICS_PATH
+from query_cache import CypherCache, schema_fingerprint
+from intent import IntentParser, CONNECTION_QUERY
+from entity_resolution import EntityResolver, quoted_mentions
+from query_guard import QueryGuard
+from graph import GraphSnapshot
+from telemetry import QueryMetrics, QueryTrace
 
+# neo4j_graphrag, openai and streamlit_agraph take most of the import time, so they are
+# imported where first used rather than here; Streamlit keeps them loaded across reruns.
 
-# Function to load translations dynamically
+
+# Function to load translations dynamically, read once per process
+@st.cache_data
 def load_translations(language_code):
     file_path = f"src/locales/{language_code}.json"
     with open(file_path, "r", encoding="utf-8") as f:
@@ -52,9 +61,18 @@ def get_neo4j_driver(uri: str, username: str, password: str) -> neo4j.Driver:
         raise
     return driver
 
-# @st.cache_resource
-def setup_text2cypher(driver: neo4j.Driver) -> Text2CypherRetriever:
-    llm = OpenAILLM(model_name="gpt-4o-mini")
+# Embeddings are cached on disk and shared with setup_database.py
+@st.cache_resource
+def get_embedder():
+    from embedding import create_embedder
+    return create_embedder()
+
+# The leading underscore keeps Streamlit from hashing the driver, itself a cached resource
+@st.cache_resource
+def setup_text2cypher(_driver: neo4j.Driver):
+    from neo4j_graphrag.retrievers import Text2CypherRetriever
+    from prompting import TokenCountingOpenAILLM
+    llm = TokenCountingOpenAILLM(model_name="gpt-4o-mini")
     custom_prompt = """Task: Generate a Cypher statement for querying a Neo4j graph database from a user input.
 
 Schema:
@@ -63,6 +81,9 @@ Schema:
 Vector Search Results:
 {vector_search_results}
 
+Resolved Titles:
+{resolved_titles}
+
 Examples:
 {examples}
 
@@ -72,11 +93,66 @@ Input:
 Instructions:
 - Ensure the query returns all nodes and relationships involved in the query.
 - Do not use any properties or relationships not included in the schema.
+- When a quoted title has resolved IDs, match that work with `w.id IN [...]` instead of comparing titles.
 - Do not include triple backticks ``` or any additional text except the generated Cypher statement in your response.
 
 Cypher query:
 """
-    return Text2CypherRetriever(driver=driver, llm=llm, neo4j_schema=NEO4J_SCHEMA, examples=EXAMPLES, custom_prompt=custom_prompt)
+    return Text2CypherRetriever(driver=_driver, llm=llm, neo4j_schema=NEO4J_SCHEMA, examples=EXAMPLES, custom_prompt=custom_prompt)
+
+# The example questions are embedded once per process
+@st.cache_resource
+def get_example_selector():
+    from prompting import ExampleSelector
+    return ExampleSelector(get_embedder(), EXAMPLES, FEW_SHOT_EXAMPLES)
+
+# Generated Cypher is shared by every session of this process
+@st.cache_resource
+def get_cypher_cache() -> CypherCache:
+    return CypherCache(max_entries=CYPHER_CACHE_MAX_ENTRIES, ttl=CYPHER_CACHE_TTL_SECONDS, similarity_threshold=CYPHER_CACHE_SIMILARITY)
+
+# Read at most once a minute; cached Cypher is dropped when the prompt or the graph's schema changes
+@st.cache_data(ttl=60)
+def get_schema_fingerprint(_driver: neo4j.Driver) -> str:
+    records, _, _ = _driver.execute_query(
+        "CALL db.labels() YIELD label WITH collect(label) AS labels "
+        "CALL db.relationshipTypes() YIELD relationshipType WITH labels, collect(relationshipType) AS types "
+        "CALL db.propertyKeys() YIELD propertyKey RETURN labels, types, collect(propertyKey) AS keys",
+        routing_="r",
+    )
+    database_schema = [sorted(value) for value in records[0].values()] if records else []
+    return schema_fingerprint(NEO4J_SCHEMA, EXAMPLES, database_schema)
+
+# Common question shapes are answered with fixed, parameterized Cypher instead of the LLM
+@st.cache_resource
+def get_intent_parser() -> IntentParser:
+    return IntentParser()
+
+# Maps quoted titles and names to node IDs through the title and name indexes
+@st.cache_resource
+def get_entity_resolver(_driver: neo4j.Driver) -> EntityResolver:
+    return EntityResolver(_driver)
+
+# Every answer runs through the guard, so that one runaway query cannot tie up the database
+@st.cache_resource
+def get_query_guard(_driver: neo4j.Driver) -> QueryGuard:
+    return QueryGuard(_driver, max_hops=QUERY_MAX_HOPS, limit=QUERY_LIMIT, timeout=QUERY_TIMEOUT_SECONDS, max_nodes=QUERY_MAX_NODES, max_edges=QUERY_MAX_EDGES)
+
+# Structure of the whole graph, for connection questions
+@st.cache_resource(ttl=GRAPH_SNAPSHOT_TTL_SECONDS)
+def get_graph_snapshot(_driver: neo4j.Driver) -> GraphSnapshot:
+    return GraphSnapshot.load(_driver)
+
+# Work vectors memory-mapped from LOCAL_VECTOR_INDEX_DIR, shared read-only between app processes
+@st.cache_resource
+def get_local_vector_index():
+    from vector_index import LocalVectorIndex
+    return LocalVectorIndex(LOCAL_VECTOR_INDEX_DIR)
+
+# Stage timings of every question, appended to QUERY_METRICS_PATH by all sessions of this process
+@st.cache_resource
+def get_query_metrics() -> QueryMetrics | None:
+    return QueryMetrics(QUERY_METRICS_PATH) if QUERY_METRICS_PATH else None
 
 uri = os.getenv("NEO4J_URI")
 username = os.getenv("NEO4J_USERNAME")
@@ -92,11 +168,10 @@ driver = get_neo4j_driver(
     username=username,
     password=password
 )
-retriever = setup_text2cypher(driver)
-embedder = OpenAIEmbeddings(model="text-embedding-3-small")
 
 # Helper function to add a single node
 def add_node(node: neo4j.graph.Node, label_key: str, nodes: list, id_history: set) -> None:
+    from streamlit_agraph import Node
     node_id = node["id"]
     if node_id not in id_history:
         if "Work" in node.labels:
@@ -121,6 +196,7 @@ def add_node(node: neo4j.graph.Node, label_key: str, nodes: list, id_history: se
 
 # Helper function to add a relationship
 def add_relationship(relationship: neo4j.graph.Relationship, nodes: list, edges: list, id_history: set) -> None:
+    from streamlit_agraph import Edge
     add_node(relationship.start_node, "title" if "Work" in relationship.start_node.labels else "display_name", nodes, id_history)
     add_node(relationship.end_node, "title" if "Work" in relationship.start_node.labels else "display_name", nodes, id_history)
     edges.append(Edge(
@@ -130,6 +206,7 @@ def add_relationship(relationship: neo4j.graph.Relationship, nodes: list, edges:
     ))
 
 def prepare_graph_data(records):
+    from streamlit_agraph import Config
     nodes = []
     edges = []
     id_history = set()
@@ -149,14 +226,112 @@ def prepare_graph_data(records):
     config = Config(height=500)
     return nodes, edges, config
 
-def vector_search(driver, embedder, query_text):
-    vector = embedder.embed_query(query_text)
+def vector_search(driver, embedder, query_text, vector=None):
+    if vector is None:
+        vector = embedder.embed_query(query_text)
+    if LOCAL_VECTOR_INDEX_DIR:
+        index = get_local_vector_index()
+        # Picks up the files rewritten by the last ingestion run
+        index.reload_if_changed()
+        if len(index):
+            return [(title, score) for _, title, score in index.search([vector], 3)[0]]
     records, summary, keys = driver.execute_query(
         "CALL db.index.vector.queryNodes('work-vector-index', 3, $vector) YIELD node, score RETURN node.title, score",
         {"vector": vector}
     )
     return records
 
+def connection_paths(driver, parameters):
+    """
+    Answers a connection question from the graph snapshot: the shortest paths from the
+    author, through their work, to the other work, with only the nodes on them read from Neo4j.
+    Returns None when a work or author is newer than the snapshot.
+    """
+    snapshot = get_graph_snapshot(driver)
+    if not all(node_id in snapshot.index for ids in parameters.values() for node_id in ids):
+        return None
+    paths = snapshot.author_paths(parameters["author_ids"], parameters["title_ids"], parameters["other_title_ids"], k=CONNECTION_PATHS, max_hops=QUERY_MAX_HOPS)
+    if not paths:
+        return CONNECTION_QUERY, {}, []
+    cypher, path_parameters = snapshot.path_query(paths)
+    records, _, _ = driver.execute_query(cypher, parameters_=path_parameters, routing_="r")
+    return cypher, path_parameters, records
+
+def run_guarded(guard, trace, cypher, parameters=None):
+    with trace.stage("cypher"):
+        result = guard.run(cypher, parameters)
+    trace.count("records", len(result.records))
+    trace.count("truncated", int(result.truncated))
+    return result
+
+def answer_question(driver, query_text, trace):
+    """
+    Cypher run for `query_text`, its parameters, the records it returned and whether they
+    were cut off by the query guard. The intent parser and the Cypher cache are tried first;
+    the LLM is called only when both miss. The time of each stage is added to `trace`.
+    """
+    from prompting import generate_cypher
+    guard = get_query_guard(driver)
+    resolver = get_entity_resolver(driver)
+    with trace.stage("intent"):
+        intent = get_intent_parser().parse(query_text)
+    if intent is not None:
+        with trace.stage("entity_resolution"):
+            parameters = resolver.resolve_mentions(intent.parameters)
+    # A mention that resolves to no node, for instance in a graph built before titles and
+    # names were normalized, is left to the cache and the LLM rather than answered with nothing
+    if intent is not None and all(parameters.values()):
+        trace.path = "intent"
+        if intent.name == "connection":
+            with trace.stage("graph_paths"):
+                answer = connection_paths(driver, parameters)
+            if answer is not None:
+                trace.path = "graph"
+                cypher, path_parameters, records = answer
+                trace.count("records", len(records))
+                return cypher, {**intent.parameters, **path_parameters}, records, False
+        result = run_guarded(guard, trace, intent.cypher, parameters)
+        return result.cypher, {**intent.parameters, **parameters}, result.records, result.truncated
+
+    cypher_cache = get_cypher_cache()
+    with trace.stage("cypher_cache"):
+        cypher_cache.set_schema(get_schema_fingerprint(driver))
+        # Reuse the Cypher of the same question, or of a near-identical one, without calling the LLM
+        cypher = cypher_cache.get_exact(query_text)
+    vector = None
+    if cypher is None:
+        embedder = get_embedder()
+        with trace.stage("embedding"):
+            vector = embedder.embed_query(query_text)
+        with trace.stage("cypher_cache"):
+            cypher = cypher_cache.get_similar(query_text, vector)
+    if cypher is not None:
+        trace.path = "cache"
+        result = run_guarded(guard, trace, cypher)
+        return result.cypher, {}, result.records, result.truncated
+
+    trace.path = "llm"
+    retriever = setup_text2cypher(driver)
+    with trace.stage("vector_search"):
+        records = vector_search(driver, embedder, query_text, vector)
+    vector_search_results = "\n".join([f"title: {record[0]}, score: {record[1]}" for record in records])
+    with trace.stage("entity_resolution"):
+        resolved_titles = "\n".join(f"\"{title}\": {', '.join(resolver.resolve_works(title)) or 'not found'}" for title in quoted_mentions(query_text))
+    with trace.stage("examples"):
+        examples = get_example_selector().select(vector)
+    # Generate Cypher query from natural language
+    with trace.stage("llm"):
+        cypher = generate_cypher(retriever, query_text, {"schema": NEO4J_SCHEMA, "vector_search_results": vector_search_results, "resolved_titles": resolved_titles, "examples": "\n".join(examples)})
+    usage = retriever.llm.last_usage()
+    if usage:
+        trace.count("prompt_tokens", usage["prompt_tokens"])
+        trace.count("completion_tokens", usage["completion_tokens"])
+        trace.count("examples", len(examples))
+    result = run_guarded(guard, trace, cypher)
+    if result.records:
+        cypher_cache.put(query_text, cypher, vector)
+    return result.cypher, {}, result.records, result.truncated
+
 # Initialize session state for graph data
 if "graph_data" not in st.session_state:
     st.session_state.graph_data = None
@@ -165,36 +340,64 @@ with col2:
     button = st.button(translations["run_query_button"], use_container_width=True)
 
 # Process Query
+trace = None
+new_graph = False
 if button:
     if not query_text.strip():
         st.error(translations["query_error"])
     else:
+        trace = QueryTrace(query_text)
         with st.spinner(translations["processing_message"]):
             try:
-                records = vector_search(driver, embedder, query_text)
-                vector_search_results = "\n".join([f"title: {record[0]}, score: {record[1]}" for record in records])
-                # Generate Cypher query from natural language
-                results = retriever.get_search_results(query_text=query_text, prompt_params={"schema": NEO4J_SCHEMA, "vector_search_results": vector_search_results})
-
-                if results.records:
+                cypher, parameters, result_records, truncated = answer_question(driver, query_text, trace)
+                if result_records:
                     st.success(translations["success_message"])
-                    cypher = results.metadata["cypher"]
-                    nodes, edges, config = prepare_graph_data(results.records)
-                    st.session_state.graph_data = {"cypher": cypher, "nodes": nodes, "edges": edges, "config": config}
+                    with trace.stage("prepare_graph_data"):
+                        nodes, edges, config = prepare_graph_data(result_records)
+                    trace.count("nodes", len(nodes))
+                    trace.count("edges", len(edges))
+                    st.session_state.graph_data = {"cypher": cypher, "parameters": parameters, "nodes": nodes, "edges": edges, "config": config, "truncated": truncated}
+                    new_graph = True
                 else:
-                    st.code(results.metadata["cypher"])
+                    st.code(cypher)
+                    if parameters:
+                        st.json(parameters)
                     st.warning(translations["no_results_message"])
             except Exception as e:
+                trace.error = str(e)
                 st.error(translations["error_message"].format(e))
 
 # Render the graph if data is available
 if st.session_state.graph_data:
+    from streamlit_agraph import agraph
     st.code(st.session_state.graph_data["cypher"], language="cypher")
-    agraph(
-        nodes=st.session_state.graph_data["nodes"],
-        edges=st.session_state.graph_data["edges"],
-        config=st.session_state.graph_data["config"]
-    )
+    if st.session_state.graph_data["parameters"]:
+        st.json(st.session_state.graph_data["parameters"])
+    if st.session_state.graph_data["truncated"]:
+        st.warning(translations["truncated_message"])
+    with trace.stage("render") if new_graph else nullcontext():
+        agraph(
+            nodes=st.session_state.graph_data["nodes"],
+            edges=st.session_state.graph_data["edges"],
+            config=st.session_state.graph_data["config"]
+        )
+
+if trace is not None:
+    trace.finish()
+    st.session_state.last_trace = trace.as_dict()
+    metrics = get_query_metrics()
+    if metrics is not None:
+        metrics.record(trace)
+
+# Stage timings and counters of the last question of this session
+if st.sidebar.checkbox(translations["debug_panel_label"]) and st.session_state.get("last_trace"):
+    last_trace = st.session_state.last_trace
+    st.sidebar.caption(translations["debug_panel_summary"].format(last_trace["path"], last_trace["total_seconds"] * 1000))
+    st.sidebar.table([{"stage": name, "ms": round(seconds * 1000, 1)} for name, seconds in last_trace["stages"].items()])
+    st.sidebar.json(last_trace["counts"])
+    # Process-wide hit rates of the intent parser and the Cypher cache
+    st.sidebar.caption(translations["debug_panel_hit_rates"])
+    st.sidebar.json({"intent_parser": get_intent_parser().stats(), "cypher_cache": get_cypher_cache().stats()})
 
 st.markdown(
 """
@@ -0,0 +1,166 @@
+import json
+import os
+import sqlite3
+import threading
+
+
+class SeenIdStore:
+    """
+    Set of entity IDs already written to Neo4j, optionally mirrored to a SQLite file.
+
+    IDs are added in memory right away but only persisted by `commit()`, which the
+    handler calls once the rows for those IDs have been committed to Neo4j.
+    The store may be shared by crawl workers running in different threads.
+    """
+    def __init__(self, path: str = None):
+        self.ids = set()
+        self.uncommitted = []
+        self.connection = None
+        self.lock = threading.Lock()
+        if path:
+            if os.path.dirname(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.connection = sqlite3.connect(path, check_same_thread=False)
+            self.connection.execute("CREATE TABLE IF NOT EXISTS seen_ids (id TEXT PRIMARY KEY)")
+            self.ids.update(id for id, in self.connection.execute("SELECT id FROM seen_ids"))
+
+    def __contains__(self, id: str) -> bool:
+        return id in self.ids
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def add(self, id: str) -> None:
+        with self.lock:
+            if id not in self.ids:
+                self.ids.add(id)
+                self.uncommitted.append(id)
+
+    def take_uncommitted(self) -> list[str]:
+        """
+        The IDs added since the last commit, handed over to the caller to `commit` once their
+        rows are written, or to `restore` if writing them fails.
+        """
+        with self.lock:
+            ids, self.uncommitted = self.uncommitted, []
+            return ids
+
+    def restore(self, ids: list[str]) -> None:
+        with self.lock:
+            self.uncommitted[:0] = ids
+
+    def commit(self, ids: list[str] = None) -> None:
+        """
+        Persist `ids`, by default every ID added since the last commit.
+        """
+        with self.lock:
+            if ids is None:
+                ids, self.uncommitted = self.uncommitted, []
+            if self.connection is not None and ids:
+                self.connection.executemany("INSERT OR IGNORE INTO seen_ids (id) VALUES (?)", ((id,) for id in ids))
+                self.connection.commit()
+
+    def clear(self) -> None:
+        with self.lock:
+            self.ids.clear()
+            self.uncommitted.clear()
+            if self.connection is not None:
+                self.connection.execute("DELETE FROM seen_ids")
+                self.connection.commit()
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+
+
+class CrawlCheckpoint:
+    """
+    Progress of a crawl: the completed seeds and, for every seed in progress, the last
+    completed depth, the frontier to expand next and the works seen so far. Seeds crawled
+    by parallel workers are tracked independently.
+
+    The file is an append-only log of JSON lines, one per completed level or seed, so that
+    saving costs the size of the change rather than of the whole crawl: a level line holds
+    the new frontier and only the works first seen at that level. On opening, the log is
+    replayed and compacted into a single snapshot line.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.completed_seeds = []
+        # Lookup set for `completed_seeds`, which can hold tens of thousands of seeds
+        self.completed = set()
+        self.in_progress = {}
+        self.lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                lines = f.read().splitlines()
+            for i, line in enumerate(lines):
+                try:
+                    self.apply(json.loads(line))
+                except json.JSONDecodeError:
+                    # Only the last line can be cut short, by a crash while appending it
+                    if i != len(lines) - 1:
+                        raise
+            if len(lines) > 1:
+                self.save()
+
+    def apply(self, event: dict) -> None:
+        if "completed_seeds" in event:
+            self.completed_seeds = event["completed_seeds"]
+            self.completed = set(self.completed_seeds)
+            self.in_progress = event["in_progress"]
+        elif "completed" in event:
+            if event["completed"] not in self.completed:
+                self.completed_seeds.append(event["completed"])
+                self.completed.add(event["completed"])
+            self.in_progress.pop(event["completed"], None)
+        elif "level" in event:
+            level = event["level"]
+            previous = self.in_progress.get(level["seed"])
+            seen_works = (previous["seen_works"] if previous else []) + level["new_seen_works"]
+            self.in_progress[level["seed"]] = {"seed": level["seed"], "depth": level["depth"], "frontier": level["frontier"], "seen_works": seen_works}
+
+    def save(self) -> None:
+        """
+        Rewrite the log as one snapshot line.
+        """
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"completed_seeds": self.completed_seeds, "in_progress": self.in_progress}) + "\n")
+        os.replace(temporary_path, self.path)
+
+    def append(self, event: dict) -> None:
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(event) + "\n")
+
+    def is_completed(self, seed: str) -> bool:
+        return seed in self.completed
+
+    def level_state(self, seed: str) -> dict | None:
+        return self.in_progress.get(seed)
+
+    def save_level(self, seed: str, depth: int, frontier: list[str], seen_works: set[str]) -> None:
+        with self.lock:
+            previous = self.in_progress.get(seed)
+            new_seen_works = seen_works.difference(previous["seen_works"]) if previous else seen_works
+            event = {"level": {"seed": seed, "depth": depth, "frontier": frontier, "new_seen_works": sorted(new_seen_works)}}
+            self.apply(event)
+            self.append(event)
+
+    def complete_seed(self, seed: str) -> None:
+        event = {"completed": seed}
+        with self.lock:
+            self.apply(event)
+            self.append(event)
+
+    def reset(self) -> None:
+        with self.lock:
+            self.completed_seeds = []
+            self.completed = set()
+            self.in_progress = {}
+            if os.path.exists(self.path):
+                os.remove(self.path)
@@ -1,7 +1,43 @@
+import os
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+# Size of the title and question vectors; text-embedding-3 models can return shortened ones.
+# Stored as float64 lists, or as float32 arrays (half the size) with EMBEDDING_STORAGE=float32
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", "1536"))
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "float64")
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", ".cache/embeddings.sqlite3")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "200000"))
+OPENALEX_CACHE_PATH = os.getenv("OPENALEX_CACHE_PATH", ".cache/openalex.sqlite3")
+OPENALEX_CACHE_TTL_DAYS = float(os.getenv("OPENALEX_CACHE_TTL_DAYS", "30"))
+CRAWL_STATE_DIR = os.getenv("CRAWL_STATE_DIR", ".cache/crawl")
+CYPHER_CACHE_MAX_ENTRIES = int(os.getenv("CYPHER_CACHE_MAX_ENTRIES", "1000"))
+CYPHER_CACHE_TTL_SECONDS = float(os.getenv("CYPHER_CACHE_TTL_SECONDS", "3600"))
+# Minimum cosine similarity for a new question to reuse the Cypher of a cached one
+CYPHER_CACHE_SIMILARITY = float(os.getenv("CYPHER_CACHE_SIMILARITY", "0.95"))
+# Number of EXAMPLES, the most similar to the question, put into each Text2Cypher prompt
+FEW_SHOT_EXAMPLES = int(os.getenv("FEW_SHOT_EXAMPLES", "3"))
+# Bounds on the Cypher the app runs: hops of variable-length patterns, rows, server-side
+# transaction time, and the nodes/relationships read before the result is cut off
+QUERY_MAX_HOPS = int(os.getenv("QUERY_MAX_HOPS", "6"))
+QUERY_LIMIT = int(os.getenv("QUERY_LIMIT", "200"))
+QUERY_TIMEOUT_SECONDS = float(os.getenv("QUERY_TIMEOUT_SECONDS", "10"))
+QUERY_MAX_NODES = int(os.getenv("QUERY_MAX_NODES", "500"))
+QUERY_MAX_EDGES = int(os.getenv("QUERY_MAX_EDGES", "1000"))
+# Connection questions are answered from an in-memory copy of the graph, reloaded this often
+GRAPH_SNAPSHOT_TTL_SECONDS = float(os.getenv("GRAPH_SNAPSHOT_TTL_SECONDS", "600"))
+CONNECTION_PATHS = int(os.getenv("CONNECTION_PATHS", "1"))
+# Directory of the optional local copy of the Work vectors searched by the app instead of
+# the Neo4j vector index; empty to disable. Rows are stored as float32 or int8.
+LOCAL_VECTOR_INDEX_DIR = os.getenv("LOCAL_VECTOR_INDEX_DIR", "")
+LOCAL_VECTOR_INDEX_DTYPE = os.getenv("LOCAL_VECTOR_INDEX_DTYPE", "float32")
+# File the app writes each question's stage timings to: JSON lines, or the Prometheus
+# text format when it ends in .prom; empty to disable
+QUERY_METRICS_PATH = os.getenv("QUERY_METRICS_PATH", "")
+
 NEO4J_SCHEMA = """
 Node properties:
-Work {id: STRING, title: STRING}
-Author {id: STRING, display_name: STRING}
+Work {id: STRING, title: STRING, citation_count: INTEGER, pagerank: FLOAT}
+Author {id: STRING, display_name: STRING, work_count: INTEGER, coauthor_count: INTEGER}
 Institution {id: STRING, display_name: STRING}
 Relationship properties:
 REFERENCED {}
@@ -0,0 +1,197 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+from neo4j_graphrag.embeddings import OpenAIEmbeddings
+from config import EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, EMBEDDING_CACHE_PATH, EMBEDDING_CACHE_MAX_ENTRIES
+
+# Full size of the vectors each model returns
+MODEL_DIMENSIONS = {"text-embedding-3-small": 1536, "text-embedding-3-large": 3072, "text-embedding-ada-002": 1536}
+
+
+class OpenAIBatchEmbeddings(OpenAIEmbeddings):
+    """
+    `OpenAIEmbeddings` that can also embed many texts in a single request, and that asks
+    text-embedding-3 models for shortened vectors of `dimensions` when that is less than
+    the model's full size.
+    """
+    def __init__(self, model: str = EMBEDDING_MODEL, dimensions: int = None, **kwargs: Any):
+        super().__init__(model=model, **kwargs)
+        self.dimensions = dimensions if dimensions and dimensions != MODEL_DIMENSIONS.get(model) else None
+
+    def request_options(self, kwargs: dict) -> dict:
+        if self.dimensions:
+            return {"dimensions": self.dimensions, **kwargs}
+        return kwargs
+
+    def embed_query(self, text: str, **kwargs: Any) -> list[float]:
+        return super().embed_query(text, **self.request_options(kwargs))
+
+    def embed_documents(self, texts: list[str], **kwargs: Any) -> list[list[float]]:
+        response = self.client.embeddings.create(input=texts, model=self.model, **self.request_options(kwargs))
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+
+
+def embed_documents(embedder, texts: list[str]) -> list[list[float]]:
+    if hasattr(embedder, "embed_documents"):
+        return embedder.embed_documents(texts)
+    return [embedder.embed_query(text) for text in texts]
+
+
+class BatchEmbedder:
+    """
+    Embeds texts in batches of `batch_size`, with at most `max_in_flight` requests running at once.
+
+    Any embedder works: `embed_documents(texts)` is used when it exists, otherwise
+    `embed_query(text)` is called once per text.
+    """
+    def __init__(self, embedder, batch_size: int = 100, max_in_flight: int = 4):
+        self.embedder = embedder
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.requests = 0
+        self.texts = 0
+
+    def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        return embed_documents(self.embedder, texts)
+
+    def embed(self, texts: list[str]) -> list[list[float]]:
+        unique_texts = list(dict.fromkeys(texts))
+        batches = [unique_texts[i:i + self.batch_size] for i in range(0, len(unique_texts), self.batch_size)]
+        if not batches:
+            return []
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+            results = list(pool.map(self.embed_batch, batches))
+        self.requests += len(batches) if hasattr(self.embedder, "embed_documents") else len(unique_texts)
+        self.texts += len(unique_texts)
+        vectors = {}
+        for batch, batch_vectors in zip(batches, results):
+            vectors.update(zip(batch, batch_vectors))
+        return [vectors[text] for text in texts]
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(normalize_text(text).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding store keyed by (model, dimensions, SHA-256 of the normalized text).
+
+    Vectors are stored as float32 blobs in SQLite. Once more than `max_entries` vectors
+    are stored, the least recently used ones are evicted.
+    """
+    def __init__(self, path: str, model: str, dimensions: int = None, max_entries: int = 100_000):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.model = model
+        self.dimensions = dimensions or 0
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT, dimensions INTEGER, text_hash TEXT, vector BLOB, last_used INTEGER, "
+            "PRIMARY KEY (model, dimensions, text_hash))"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+        self.connection.commit()
+
+    def get_many(self, texts: list[str]) -> list[list[float] | None]:
+        hashes = [text_hash(text) for text in texts]
+        found = {}
+        with self.lock:
+            for i in range(0, len(hashes), 500):
+                chunk = list(set(hashes[i:i + 500]))
+                rows = self.connection.execute(
+                    "SELECT text_hash, vector FROM embeddings WHERE model = ? AND dimensions = ? "
+                    f"AND text_hash IN ({','.join('?' * len(chunk))})",
+                    [self.model, self.dimensions, *chunk],
+                ).fetchall()
+                found.update((key, array("f", vector).tolist()) for key, vector in rows)
+            if found:
+                self.connection.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND dimensions = ? AND text_hash = ?",
+                    [(time.time_ns(), self.model, self.dimensions, key) for key in found],
+                )
+                self.connection.commit()
+            vectors = [found.get(key) for key in hashes]
+            hits = sum(vector is not None for vector in vectors)
+            self.hits += hits
+            self.misses += len(vectors) - hits
+        return vectors
+
+    def get(self, text: str) -> list[float] | None:
+        return self.get_many([text])[0]
+
+    def put_many(self, texts: list[str], vectors: list[list[float]]) -> None:
+        now = time.time_ns()
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, dimensions, text_hash, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (self.model, self.dimensions, text_hash(text), array("f", vector).tobytes(), now)
+                    for text, vector in zip(texts, vectors)
+                ],
+            )
+            excess = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self.connection.execute(
+                    "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                    (excess,),
+                )
+            self.connection.commit()
+
+    def put(self, text: str, vector: list[float]) -> None:
+        self.put_many([text], [vector])
+
+    def stats(self) -> dict:
+        with self.lock:
+            entries = self.connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class CachedEmbedder:
+    """
+    Wraps an embedder so that only texts missing from `cache` are sent to it.
+    """
+    def __init__(self, embedder, cache: EmbeddingCache):
+        self.embedder = embedder
+        self.cache = cache
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        vectors = self.cache.get_many(texts)
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        if missing:
+            new_vectors = embed_documents(self.embedder, missing)
+            self.cache.put_many(missing, new_vectors)
+            embedded = dict(zip(missing, new_vectors))
+            vectors = [embedded[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        return vectors
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+def create_embedder(model: str = EMBEDDING_MODEL, cache_path: str = EMBEDDING_CACHE_PATH, dimensions: int = EMBEDDING_DIMENSIONS):
+    """
+    OpenAI embedder shared by the ingestion script and the app, cached on disk unless `cache_path` is empty.
+    """
+    embedder = OpenAIBatchEmbeddings(model=model, dimensions=dimensions)
+    if cache_path:
+        embedder = CachedEmbedder(embedder, EmbeddingCache(cache_path, model, embedder.dimensions, max_entries=EMBEDDING_CACHE_MAX_ENTRIES))
+    return embedder
@@ -0,0 +1,95 @@
+import re
+import unicodedata
+
+# Full-text indexes created by setup_database.py over the normalized properties
+WORK_TITLE_INDEX = "work_title_fulltext"
+AUTHOR_NAME_INDEX = "author_name_fulltext"
+INSTITUTION_NAME_INDEX = "institution_name_fulltext"
+
+QUOTED = re.compile(r"[\"“「『]([^\"”」』]+)[\"”」』]")
+
+
+def normalize_name(text: str | None) -> str | None:
+    """
+    Titles and names as stored in `title_normalized` / `name_normalized`: NFKC, case-folded,
+    with whitespace collapsed. Exact lookups compare against this form.
+    """
+    if text is None:
+        return None
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+def fulltext_query(text: str) -> str:
+    """
+    Lucene query matching every word of `text`, allowing one typo in words of five letters or more.
+    Words with characters outside ASCII, such as Japanese, are matched as phrases.
+    """
+    terms = []
+    for word in re.findall(r"\w+", normalize_name(text)):
+        if not word.isascii():
+            terms.append(f'"{word}"')
+        elif len(word) >= 5:
+            terms.append(f"{word}~1")
+        else:
+            terms.append(word)
+    return " AND ".join(terms)
+
+
+def quoted_mentions(text: str) -> list[str]:
+    """
+    Titles quoted in a question with "...", “...”, 「...」 or 『...』.
+    """
+    return [mention.strip() for mention in QUOTED.findall(unicodedata.normalize("NFKC", text))]
+
+
+class EntityResolver:
+    """
+    Maps titles and names mentioned in a question to node IDs: an exact match on the
+    normalized property first (a range index seek), then a fuzzy full-text match.
+    Full-text matches scoring under `min_relative_score` of the best one are dropped.
+    """
+    # Parameter name of a mention -> (label, normalized property, full-text index)
+    MENTIONS = {
+        "title": ("Work", "title_normalized", WORK_TITLE_INDEX),
+        "other_title": ("Work", "title_normalized", WORK_TITLE_INDEX),
+        "author": ("Author", "name_normalized", AUTHOR_NAME_INDEX),
+        "institution": ("Institution", "name_normalized", INSTITUTION_NAME_INDEX),
+    }
+
+    def __init__(self, driver, limit: int = 5, min_relative_score: float = 0.5):
+        self.driver = driver
+        self.limit = limit
+        self.min_relative_score = min_relative_score
+
+    def resolve(self, label: str, property: str, index: str, text: str) -> list[str]:
+        records, _, _ = self.driver.execute_query(
+            f"MATCH (n:{label}) WHERE n.{property} = $text RETURN n.id AS id LIMIT $limit",
+            parameters_={"text": normalize_name(text), "limit": self.limit},
+            routing_="r",
+        )
+        if records:
+            return [record["id"] for record in records]
+        query = fulltext_query(text)
+        if not query:
+            return []
+        records, _, _ = self.driver.execute_query(
+            "CALL db.index.fulltext.queryNodes($index, $query, {limit: $limit}) YIELD node, score RETURN node.id AS id, score",
+            parameters_={"index": index, "query": query, "limit": self.limit},
+            routing_="r",
+        )
+        if not records:
+            return []
+        best = records[0]["score"]
+        return [record["id"] for record in records if record["score"] >= best * self.min_relative_score]
+
+    def resolve_works(self, title: str) -> list[str]:
+        return self.resolve("Work", "title_normalized", WORK_TITLE_INDEX, title)
+
+    def resolve_authors(self, name: str) -> list[str]:
+        return self.resolve("Author", "name_normalized", AUTHOR_NAME_INDEX, name)
+
+    def resolve_mentions(self, mentions: dict) -> dict:
+        """
+        `{"title": "Attention Is All You Need"}` -> `{"title_ids": ["W2626778328"]}`
+        """
+        return {f"{key}_ids": self.resolve(*self.MENTIONS[key], text) for key, text in mentions.items()}
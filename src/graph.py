@@ -0,0 +1,168 @@
+from itertools import islice
+import numpy as np
+import neo4j
+
+LABELS = ("Work", "Author", "Institution")
+RELATIONSHIPS = ("REFERENCED", "AUTHORED", "AFFILIATED_WITH")
+
+
+class GraphSnapshot:
+    """
+    In-memory copy of the graph's structure for path questions: Work, Author and
+    Institution nodes as int32 indexes, with undirected adjacency in CSR form
+    (`indptr`, `indices`). `ids` and `index` map between indexes and OpenAlex IDs,
+    `labels` holds each node's position in LABELS and `scores` the works' precomputed
+    PageRank (zero elsewhere), which orders paths of equal length.
+    """
+    def __init__(self, ids: list[str], labels: np.ndarray, indptr: np.ndarray, indices: np.ndarray, scores: np.ndarray = None):
+        self.ids = ids
+        self.index = {node_id: i for i, node_id in enumerate(ids)}
+        self.labels = labels
+        self.indptr = indptr
+        self.indices = indices
+        self.scores = scores if scores is not None else np.zeros(len(ids), dtype=np.float32)
+
+    @classmethod
+    def from_edges(cls, ids: list[str], labels, sources, targets, scores=None) -> "GraphSnapshot":
+        """
+        Snapshot of the relationships `sources[i] -> targets[i]`, given as node indexes.
+        Direction, duplicates and self-loops are dropped.
+        """
+        n = len(ids)
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        keep = sources != targets
+        # Both directions of every relationship, sorted and deduplicated as source * n + target
+        keys = np.unique(np.concatenate([sources[keep] * n + targets[keep], targets[keep] * n + sources[keep]]))
+        indptr = np.zeros(n + 1, dtype=np.int32)
+        np.cumsum(np.bincount(keys // n, minlength=n), out=indptr[1:])
+        scores = np.asarray(scores, dtype=np.float32) if scores is not None else None
+        return cls(list(ids), np.asarray(labels, dtype=np.int8), indptr, (keys % n).astype(np.int32), scores)
+
+    @classmethod
+    def load(cls, driver) -> "GraphSnapshot":
+        """
+        Reads every Work, Author and Institution and the relationships between them.
+        """
+        ids, labels, scores, index = [], [], [], {}
+        sources, targets = [], []
+        with driver.session(default_access_mode=neo4j.READ_ACCESS) as session:
+            for label_index, label in enumerate(LABELS):
+                for record in session.run(f"MATCH (n:{label}) RETURN n.id AS id, n.pagerank AS score"):
+                    index[record["id"]] = len(ids)
+                    ids.append(record["id"])
+                    labels.append(label_index)
+                    scores.append(record["score"] or 0.0)
+            result = session.run(f"MATCH (a)-[:{'|'.join(RELATIONSHIPS)}]->(b) RETURN a.id AS source, b.id AS target")
+            for source, target in result.values("source", "target"):
+                if source in index and target in index:
+                    sources.append(index[source])
+                    targets.append(index[target])
+        return cls.from_edges(ids, labels, sources, targets, scores)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.indices) // 2
+
+    def neighbors(self, i: int) -> np.ndarray:
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
+
+    def neighbor_ids(self, node_id: str) -> list[str]:
+        if node_id not in self.index:
+            return []
+        return [self.ids[i] for i in self.neighbors(self.index[node_id])]
+
+    def expand(self, frontier: np.ndarray) -> np.ndarray:
+        """
+        Neighbors of every node in `frontier`, concatenated, gathered without a Python loop.
+        """
+        starts = self.indptr[frontier].astype(np.int64)
+        lengths = self.indptr[frontier + 1] - starts
+        ends = np.cumsum(lengths)
+        offsets = np.repeat(starts - (ends - lengths), lengths) + np.arange(ends[-1] if len(ends) else 0)
+        return self.indices[offsets]
+
+    def walk_back(self, node: int, distance: np.ndarray):
+        """
+        Shortest paths from a node at distance 0 to `node`, each step one closer,
+        through the highest-scored nodes first.
+        """
+        if distance[node] == 0:
+            yield [node]
+            return
+        previous = self.neighbors(node)
+        previous = previous[distance[previous] == distance[node] - 1]
+        for step in previous[np.argsort(-self.scores[previous], kind="stable")]:
+            for path in self.walk_back(step, distance):
+                yield path + [node]
+
+    def shortest_paths(self, sources: list[str], targets: list[str], k: int = 1, max_hops: int = None, avoid: list[str] = ()) -> list[list[str]]:
+        """
+        Up to `k` of the shortest paths, ignoring direction, from any of `sources` to any of
+        `targets`, as lists of IDs, those through higher-scored works first. Breadth-first
+        search runs from both ends, always expanding the smaller frontier, until the two
+        searches meet. No path goes through the nodes of `avoid`.
+        """
+        sources = np.unique(np.array([self.index[i] for i in sources if i in self.index], dtype=np.int32))
+        targets = np.unique(np.array([self.index[i] for i in targets if i in self.index], dtype=np.int32))
+        if not len(sources) or not len(targets):
+            return []
+        common = np.intersect1d(sources, targets)
+        if len(common):
+            return [[self.ids[i]] for i in common[:k]]
+
+        forward = np.full(len(self.ids), -1, dtype=np.int32)
+        backward = np.full(len(self.ids), -1, dtype=np.int32)
+        blocked = np.zeros(len(self.ids), dtype=bool)
+        blocked[[self.index[i] for i in avoid if i in self.index]] = True
+        forward[sources] = 0
+        backward[targets] = 0
+        frontiers = {"forward": sources, "backward": targets}
+        radius = {"forward": 0, "backward": 0}
+        while len(frontiers["forward"]) and len(frontiers["backward"]):
+            if max_hops is not None and radius["forward"] + radius["backward"] >= max_hops:
+                return []
+            side = "forward" if len(frontiers["forward"]) <= len(frontiers["backward"]) else "backward"
+            distance, other = (forward, backward) if side == "forward" else (backward, forward)
+            reached = self.expand(frontiers[side])
+            reached = np.unique(reached[(distance[reached] < 0) & ~blocked[reached]])
+            radius[side] += 1
+            distance[reached] = radius[side]
+            frontiers[side] = reached
+            met = reached[other[reached] >= 0]
+            if len(met):
+                # Every shortest path crosses the new frontier exactly once, at one of these nodes
+                length = int((distance[met] + other[met]).min())
+                middle = met[other[met] == length - radius[side]]
+                return [[self.ids[i] for i in path] for path in islice(self.join(middle, forward, backward), k)]
+        return []
+
+    def author_paths(self, author_ids: list[str], work_ids: list[str], targets: list[str], k: int = 1, max_hops: int = None) -> list[list[str]]:
+        """
+        Up to `k` shortest paths from one of the works of `work_ids` authored by one of
+        `author_ids` to one of `targets`, with the author put in front, as in CONNECTION_QUERY.
+        `max_hops` bounds the path from the work; the AUTHORED hop comes on top of it.
+        """
+        authors = set(author_ids)
+        starts = [work for work in work_ids if authors.intersection(self.neighbor_ids(work))]
+        # Without the authors, a path cannot double back from the work through its author
+        paths = self.shortest_paths(starts, targets, k=k, max_hops=max_hops, avoid=sorted(authors))
+        return [[next(author for author in self.neighbor_ids(path[0]) if author in authors)] + path for path in paths]
+
+    def join(self, middle: np.ndarray, forward: np.ndarray, backward: np.ndarray):
+        for node in middle[np.argsort(-self.scores[middle], kind="stable")]:
+            for head in self.walk_back(node, forward):
+                for tail in self.walk_back(node, backward):
+                    yield head + tail[::-1][1:]
+
+    def path_query(self, paths: list[list[str]]) -> tuple[str, dict]:
+        """
+        Cypher returning the nodes and relationships of `paths` for display, anchored on
+        the IDs of each path's nodes so that it only touches those nodes.
+        """
+        queries, parameters = [], {}
+        for p, path in enumerate(paths):
+            pattern = "-[]-".join(f"(:{LABELS[self.labels[self.index[node_id]]]} {{id: $path{p}[{j}]}})" for j, node_id in enumerate(path))
+            queries.append(f"MATCH p = {pattern} RETURN p LIMIT 1")
+            parameters[f"path{p}"] = path
+        return " UNION ALL ".join(queries), parameters
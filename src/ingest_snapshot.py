@@ -0,0 +1,214 @@
+import argparse
+import csv
+import glob
+import gzip
+import json
+import os
+import time
+from typing import Iterable, Iterator
+from embedding import BatchEmbedder, create_embedder, text_hash
+from entity_resolution import normalize_name
+from setup_database import Neo4jHandler
+
+
+def clean_openalex_id(full_id: str) -> str:
+    return full_id.replace("https://openalex.org/", "")
+
+
+def snapshot_files(snapshot_dir: str, entity_type: str) -> list[str]:
+    """
+    The `.gz` parts of one entity type, e.g. `<snapshot_dir>/works/updated_date=2024-01-01/part_000.gz`.
+    """
+    return sorted(glob.glob(os.path.join(snapshot_dir, entity_type, "**", "*.gz"), recursive=True))
+
+
+def read_records(paths: Iterable[str]) -> Iterator[dict]:
+    for path in paths:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def filter_ids(records: Iterable[dict], ids: set[str] | None) -> Iterator[dict]:
+    for record in records:
+        if ids is None or clean_openalex_id(record["id"]) in ids:
+            yield record
+
+
+def filter_concept(works: Iterable[dict], concept_id: str | None) -> Iterator[dict]:
+    for work in works:
+        if concept_id is None or any(clean_openalex_id(concept["id"]) == concept_id for concept in work.get("concepts") or []):
+            yield work
+
+
+class CsvSink:
+    """
+    Writes the graph as CSV files for `neo4j-admin database import`, with the same methods
+    as `Neo4jHandler` so that the snapshot pipeline can feed either of them.
+
+    Import with:
+        neo4j-admin database import full --array-delimiter=";" --skip-bad-relationships
+            --nodes=Work=works.csv --nodes=Author=authors.csv --nodes=Institution=institutions.csv
+            --relationships=REFERENCED=referenced.csv --relationships=AUTHORED=authored.csv
+            --relationships=AFFILIATED_WITH=affiliated_with.csv
+    """
+    HEADERS = {
+        "works": ["id:ID(Work)", "title", "title_normalized", "vectorProperty:float[]", "title_hash", "updated_date"],
+        "authors": ["id:ID(Author)", "display_name", "name_normalized", "updated_date"],
+        "institutions": ["id:ID(Institution)", "display_name", "name_normalized", "updated_date"],
+        "referenced": [":START_ID(Work)", ":END_ID(Work)"],
+        "authored": [":START_ID(Author)", ":END_ID(Work)"],
+        "affiliated_with": [":START_ID(Author)", ":END_ID(Institution)"],
+    }
+
+    def __init__(self, output_dir: str, embedder=None, embedding_batch_size: int = 100):
+        os.makedirs(output_dir, exist_ok=True)
+        self.files = {name: open(os.path.join(output_dir, f"{name}.csv"), "w", newline="", encoding="utf-8") for name in self.HEADERS}
+        self.writers = {name: csv.writer(f) for name, f in self.files.items()}
+        for name, header in self.HEADERS.items():
+            self.writers[name].writerow(header)
+        self.batch_embedder = BatchEmbedder(embedder, embedding_batch_size) if embedder else None
+        self.embedding_batch_size = embedding_batch_size
+        self.pending_works = []
+
+    def add_work(self, work: dict) -> None:
+        self.pending_works.append((clean_openalex_id(work["id"]), work["title"], work.get("updated_date")))
+        if len(self.pending_works) >= self.embedding_batch_size:
+            self.write_pending_works()
+
+    def write_pending_works(self) -> None:
+        vectors = [None] * len(self.pending_works)
+        if self.batch_embedder:
+            titled = [i for i, (_, title, _) in enumerate(self.pending_works) if title]
+            for i, vector in zip(titled, self.batch_embedder.embed([self.pending_works[i][1] for i in titled])):
+                vectors[i] = vector
+        for (id, title, updated_date), vector in zip(self.pending_works, vectors):
+            self.writers["works"].writerow([
+                id,
+                title or "",
+                normalize_name(title) or "",
+                ";".join(map(str, vector)) if vector else "",
+                text_hash(title) if title else "",
+                updated_date or "",
+            ])
+        self.pending_works.clear()
+
+    def add_author(self, author: dict) -> None:
+        self.writers["authors"].writerow([clean_openalex_id(author["id"]), author["display_name"], normalize_name(author["display_name"]) or "", author.get("updated_date") or ""])
+
+    def add_institution(self, institution: dict) -> None:
+        self.writers["institutions"].writerow([clean_openalex_id(institution["id"]), institution["display_name"], normalize_name(institution["display_name"]) or "", institution.get("updated_date") or ""])
+
+    def add_referenced(self, work1: dict, work2: dict) -> None:
+        self.writers["referenced"].writerow([clean_openalex_id(work1["id"]), clean_openalex_id(work2["id"])])
+
+    def add_authored(self, author: dict, work: dict) -> None:
+        self.writers["authored"].writerow([clean_openalex_id(author["id"]), clean_openalex_id(work["id"])])
+
+    def add_affiliated_with(self, author: dict, institution: dict) -> None:
+        self.writers["affiliated_with"].writerow([clean_openalex_id(author["id"]), clean_openalex_id(institution["id"])])
+
+    def flush(self) -> None:
+        self.write_pending_works()
+        for f in self.files.values():
+            f.flush()
+
+    def close(self) -> None:
+        self.flush()
+        for f in self.files.values():
+            f.close()
+
+
+def ingest_snapshot(
+    snapshot_dir: str,
+    sink,
+    work_ids: set[str] | None = None,
+    concept_id: str | None = None,
+) -> dict:
+    """
+    Stream the works, authors and institutions of an OpenAlex snapshot into `sink`
+    (a `Neo4jHandler` or a `CsvSink`), keeping only the works in `work_ids` and/or
+    tagged with `concept_id`, and the authors and institutions they lead to.
+
+    Nodes of every type are written before any relationship, so the works and authors
+    files are each read twice. Memory stays flat apart from the selected author and
+    institution IDs; `Neo4jHandler` flushes its bounded buffer by itself.
+    Returns record counts and the overall records per second.
+    """
+    start = time.perf_counter()
+    counts = {"works": 0, "authors": 0, "institutions": 0, "relationships": 0}
+
+    def selected_works():
+        return filter_concept(filter_ids(read_records(snapshot_files(snapshot_dir, "works")), work_ids), concept_id)
+
+    filtered = work_ids is not None or concept_id is not None
+    selected_work_ids = set() if filtered else None
+    author_ids = set() if filtered else None
+    for work in selected_works():
+        sink.add_work(work)
+        counts["works"] += 1
+        if filtered:
+            selected_work_ids.add(clean_openalex_id(work["id"]))
+            author_ids.update(clean_openalex_id(authorship["author"]["id"]) for authorship in work["authorships"] if authorship["author"].get("id"))
+
+    institution_ids = set() if filtered else None
+    for author in filter_ids(read_records(snapshot_files(snapshot_dir, "authors")), author_ids):
+        sink.add_author(author)
+        counts["authors"] += 1
+        if filtered:
+            institution_ids.update(clean_openalex_id(affiliation["institution"]["id"]) for affiliation in author.get("affiliations") or [] if affiliation["institution"].get("id"))
+
+    for institution in filter_ids(read_records(snapshot_files(snapshot_dir, "institutions")), institution_ids):
+        sink.add_institution(institution)
+        counts["institutions"] += 1
+
+    for work in filter_ids(selected_works(), selected_work_ids):
+        for referenced_work in work["referenced_works"]:
+            if selected_work_ids is None or clean_openalex_id(referenced_work) in selected_work_ids:
+                sink.add_referenced(work, {"id": referenced_work})
+                counts["relationships"] += 1
+        for authorship in work["authorships"]:
+            if authorship["author"].get("id"):
+                sink.add_authored(authorship["author"], work)
+                counts["relationships"] += 1
+
+    for author in filter_ids(read_records(snapshot_files(snapshot_dir, "authors")), author_ids):
+        for affiliation in author.get("affiliations") or []:
+            if affiliation["institution"].get("id"):
+                sink.add_affiliated_with(author, affiliation["institution"])
+                counts["relationships"] += 1
+
+    sink.flush()
+    elapsed = time.perf_counter() - start
+    records = counts["works"] + counts["authors"] + counts["institutions"]
+    return {**counts, "seconds": elapsed, "records_per_second": records / elapsed if elapsed else 0.0}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load an OpenAlex snapshot into Neo4j or into neo4j-admin import CSVs.")
+    parser.add_argument("snapshot_dir", help="directory containing works/, authors/ and institutions/ with .gz parts")
+    parser.add_argument("--ids", help="file with one OpenAlex work ID per line to keep")
+    parser.add_argument("--concept", help="keep only works tagged with this OpenAlex concept ID, e.g. C41008148")
+    parser.add_argument("--csv", metavar="OUTPUT_DIR", help="write neo4j-admin import CSVs instead of writing to Neo4j")
+    args = parser.parse_args()
+
+    work_ids = None
+    if args.ids:
+        with open(args.ids, encoding="utf-8") as f:
+            work_ids = {clean_openalex_id(line.strip()) for line in f if line.strip()}
+
+    if args.csv:
+        sink = CsvSink(args.csv, embedder=create_embedder())
+    else:
+        sink = Neo4jHandler(
+            uri=os.getenv("NEO4J_URI"),
+            username=os.getenv("NEO4J_USERNAME"),
+            password=os.getenv("NEO4J_PASSWORD"),
+            embedder=create_embedder(),
+        )
+        sink.create_indexes()
+
+    summary = ingest_snapshot(args.snapshot_dir, sink, work_ids=work_ids, concept_id=args.concept)
+    sink.close()
+    print(json.dumps(summary))
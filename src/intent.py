@@ -0,0 +1,78 @@
+import re
+import threading
+import unicodedata
+from collections import Counter
+from typing import NamedTuple
+
+# The mentioned titles and names are resolved to node IDs (see EntityResolver.resolve_mentions)
+# so that these queries start from index seeks rather than CONTAINS scans
+AUTHORS_OF_WORK_QUERY = (
+    "MATCH (a:Author)-[r:AUTHORED]->(w:Work) "
+    "WHERE w.id IN $title_ids "
+    "RETURN a, r, w"
+)
+CONNECTION_QUERY = (
+    "MATCH p = SHORTEST 1 (a:Author)-[r1:AUTHORED]->(w1:Work)-[*]-(w2:Work) "
+    "WHERE a.id IN $author_ids AND w1.id IN $title_ids AND w2.id IN $other_title_ids "
+    "RETURN p"
+)
+
+# Quoted titles: "...", “...”, 「...」 or 『...』
+TITLE = r"[\"“「『](?P<{name}>[^\"”」』]+)[\"”」』]"
+END = r"\s*[?？]?\s*$"
+
+
+def title(name: str = "title") -> str:
+    return TITLE.format(name=name)
+
+
+class Intent(NamedTuple):
+    name: str
+    cypher: str
+    parameters: dict
+
+
+class IntentParser:
+    """
+    Recognizes the common question shapes in English and Japanese and turns them into
+    parameterized Cypher without calling the LLM. The intent's parameters are the titles
+    and names mentioned; the Cypher expects them resolved to IDs. `parse` returns None
+    for anything else, which is left to the Text2Cypher retriever.
+    """
+    PATTERNS = [
+        ("authors_of_work", AUTHORS_OF_WORK_QUERY, re.compile(
+            r"^\s*who\s+(?:wrote|authored)\s+(?:the\s+paper\s+)?" + title() + END, re.IGNORECASE)),
+        ("authors_of_work", AUTHORS_OF_WORK_QUERY, re.compile(
+            r"^\s*(?:who\s+(?:are|is)\s+)?(?:the\s+)?authors?\s+of\s+(?:the\s+paper\s+)?" + title() + END, re.IGNORECASE)),
+        ("authors_of_work", AUTHORS_OF_WORK_QUERY, re.compile(
+            r"^\s*" + title() + r"\s*(?:の論文)?\s*(?:を書いたのは|の著者は)誰(?:ですか)?" + END)),
+        ("connection", CONNECTION_QUERY, re.compile(
+            r"^\s*how\s+is\s+(?P<author>.+?)['’]s\s+" + title() + r"\s*(?:paper\s+)?connected\s+to\s+(?:the\s+)?"
+            + title("other_title") + r"\s*(?:paper)?" + END, re.IGNORECASE)),
+        ("connection", CONNECTION_QUERY, re.compile(
+            r"^\s*(?P<author>.+?)\s*の\s*" + title() + r"\s*の論文は[、,]?\s*" + title("other_title")
+            + r"\s*の論文と(?:どのように|どう)(?:つながって|繋がって)いますか" + END)),
+    ]
+
+    def __init__(self):
+        self.hits = Counter()
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def parse(self, question: str) -> Intent | None:
+        # NFKC turns full-width ？ and spaces into their ASCII forms; the quote characters are kept
+        question = unicodedata.normalize("NFKC", question)
+        for name, cypher, pattern in self.PATTERNS:
+            match = pattern.match(question)
+            if match:
+                with self.lock:
+                    self.hits[name] += 1
+                return Intent(name, cypher, {key: value.strip() for key, value in match.groupdict().items()})
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def stats(self) -> dict:
+        with self.lock:
+            total = sum(self.hits.values()) + self.misses
+            return {"hits": dict(self.hits), "misses": self.misses, "hit_rate": sum(self.hits.values()) / total if total else 0.0}
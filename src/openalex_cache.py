@@ -0,0 +1,70 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+
+class EntityCache:
+    """
+    Local store of OpenAlex records as zlib-compressed JSON in SQLite, keyed by entity type and ID.
+
+    Records older than `ttl` seconds are treated as missing; `ttl=None` keeps them forever.
+    `oldest_hit` is the fetch time of the oldest record served so far.
+    """
+    def __init__(self, path: str, ttl: float = None):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.oldest_hit = None
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS entities ("
+            "entity_type TEXT, id TEXT, data BLOB, fetched_at REAL, "
+            "PRIMARY KEY (entity_type, id))"
+        )
+        self.connection.commit()
+
+    def get_many(self, entity_type: str, ids: list[str]) -> dict[str, dict]:
+        oldest = time.time() - self.ttl if self.ttl is not None else float("-inf")
+        ids = list(dict.fromkeys(ids))
+        found = {}
+        with self.lock:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                rows = self.connection.execute(
+                    "SELECT id, data, fetched_at FROM entities WHERE entity_type = ? AND fetched_at >= ? "
+                    f"AND id IN ({','.join('?' * len(chunk))})",
+                    [entity_type, oldest, *chunk],
+                ).fetchall()
+                found.update((id, json.loads(zlib.decompress(data))) for id, data, _ in rows)
+                if rows:
+                    fetched_at = min(fetched_at for _, _, fetched_at in rows)
+                    self.oldest_hit = fetched_at if self.oldest_hit is None else min(self.oldest_hit, fetched_at)
+            self.hits += len(found)
+            self.misses += len(ids) - len(found)
+        return found
+
+    def put_many(self, entity_type: str, entities: dict[str, dict]) -> None:
+        now = time.time()
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO entities (entity_type, id, data, fetched_at) VALUES (?, ?, ?, ?)",
+                [
+                    (entity_type, id, zlib.compress(json.dumps(entity, separators=(",", ":")).encode("utf-8")), now)
+                    for id, entity in entities.items()
+                ],
+            )
+            self.connection.commit()
+
+    def stats(self) -> dict:
+        with self.lock:
+            entries = self.connection.execute("SELECT COUNT(*) FROM entities").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+    def close(self) -> None:
+        self.connection.close()
@@ -0,0 +1,88 @@
+import threading
+import numpy as np
+from neo4j_graphrag.exceptions import LLMGenerationError
+from neo4j_graphrag.generation.prompts import Text2CypherTemplate
+from neo4j_graphrag.llm import LLMResponse, OpenAILLM
+from embedding import embed_documents
+
+
+def example_question(example: str) -> str:
+    """
+    The "USER INPUT" part of a Text2Cypher example, which incoming questions are compared with.
+    """
+    question = example.split(" QUERY:")[0].split(" VECTOR SEARCH RESULTS:")[0]
+    return question.replace("USER INPUT:", "", 1).strip()
+
+
+def generate_cypher(retriever, query_text: str, prompt_params: dict) -> str:
+    """
+    The Cypher `Text2CypherRetriever.get_search_results` would generate, without running it,
+    so that it can be run through the query guard instead.
+    """
+    prompt = Text2CypherTemplate(template=retriever.custom_prompt).format(query_text=query_text, **prompt_params)
+    return retriever.llm.invoke(prompt).content.strip()
+
+
+class ExampleSelector:
+    """
+    Picks the `k` examples whose questions are closest to the incoming question, so that
+    the prompt stays the same size however many examples there are.
+    The example questions are embedded once, when the selector is built.
+    """
+    def __init__(self, embedder, examples: list[str], k: int = 3):
+        self.examples = list(examples)
+        self.k = k
+        self.matrix = None
+        if len(self.examples) > k:
+            vectors = np.array(embed_documents(embedder, [example_question(example) for example in self.examples]), dtype=np.float32)
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            self.matrix = vectors / np.where(norms == 0, 1.0, norms)
+
+    def select(self, vector: list[float]) -> list[str]:
+        """
+        The `k` most similar examples, most similar first.
+        """
+        if self.matrix is None:
+            return self.examples
+        query = np.array(vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        scores = self.matrix @ query
+        top = np.argpartition(-scores, self.k - 1)[:self.k]
+        return [self.examples[i] for i in top[np.argsort(-scores[top])]]
+
+
+class TokenCountingOpenAILLM(OpenAILLM):
+    """
+    `OpenAILLM` that records the token usage OpenAI reports, in total and for the last
+    request made from the current thread (one Streamlit script run).
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def invoke(self, input: str) -> LLMResponse:
+        try:
+            response = self.client.chat.completions.create(
+                messages=self.get_messages(input),
+                model=self.model_name,
+                **self.model_params,
+            )
+        except self.openai.OpenAIError as e:
+            raise LLMGenerationError(e)
+        usage = {
+            "prompt_tokens": response.usage.prompt_tokens if response.usage else 0,
+            "completion_tokens": response.usage.completion_tokens if response.usage else 0,
+        }
+        with self.lock:
+            self.requests += 1
+            self.prompt_tokens += usage["prompt_tokens"]
+            self.completion_tokens += usage["completion_tokens"]
+        self.local.usage = usage
+        return LLMResponse(content=response.choices[0].message.content or "")
+
+    def last_usage(self) -> dict | None:
+        return getattr(self.local, "usage", None)
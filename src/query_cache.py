@@ -0,0 +1,127 @@
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+from entity_resolution import normalize_name, quoted_mentions
+
+
+def normalize_question(question: str) -> str:
+    """
+    Case, width and spacing variants of a question, and its trailing question mark, map to one key.
+    """
+    return " ".join(unicodedata.normalize("NFKC", question).casefold().split()).rstrip("?").rstrip()
+
+
+def schema_fingerprint(*parts) -> str:
+    return hashlib.sha256("\n".join(map(str, parts)).encode("utf-8")).hexdigest()
+
+
+class CypherCache:
+    """
+    Process-wide cache from natural-language questions to the Cypher generated for them.
+
+    Questions are looked up by their normalized text first and then, given the question's
+    embedding, by the most similar cached question whose cosine similarity is at least
+    `similarity_threshold` and which quotes the same titles. The cached Cypher has the
+    titles of its question written in, so questions that differ only in the quoted title
+    embed alike but never share it. Entries expire after `ttl` seconds, and beyond `max_entries`
+    the least recently used ones are evicted. Every entry belongs to the schema it was
+    generated for; `set_schema` with a different fingerprint empties the cache.
+    """
+    def __init__(self, schema: str = None, max_entries: int = 1000, ttl: float = 3600, similarity_threshold: float = 0.95):
+        self.schema = schema
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        # normalized question -> (cypher, unit vector or None, quoted titles, created at)
+        self.entries = OrderedDict()
+        self.matrix = None
+        self.matrix_keys = []
+        self.matrix_mentions = []
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def set_schema(self, schema: str) -> None:
+        with self.lock:
+            if schema != self.schema:
+                self.schema = schema
+                self.entries.clear()
+                self.matrix = None
+
+    def expire(self) -> None:
+        oldest = time.monotonic() - self.ttl
+        expired = [key for key, (_, _, _, created_at) in self.entries.items() if created_at < oldest]
+        for key in expired:
+            del self.entries[key]
+        if expired:
+            self.matrix = None
+
+    def get_exact(self, question: str) -> str | None:
+        key = normalize_question(question)
+        with self.lock:
+            self.expire()
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.exact_hits += 1
+                return self.entries[key][0]
+        return None
+
+    @staticmethod
+    def mentions(question: str) -> tuple:
+        return tuple(normalize_name(mention) for mention in quoted_mentions(question))
+
+    def get_similar(self, question: str, vector: list[float]) -> str | None:
+        """
+        Cypher of the cached question most similar to `vector` among those quoting the same
+        titles as `question`, if similar enough. Counts a miss otherwise, so call it after `get_exact`.
+        """
+        query = np.array(vector, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        mentions = self.mentions(question)
+        with self.lock:
+            self.expire()
+            if self.matrix is None:
+                self.matrix_keys = [key for key, (_, unit, _, _) in self.entries.items() if unit is not None]
+                self.matrix_mentions = [self.entries[key][2] for key in self.matrix_keys]
+                self.matrix = np.stack([self.entries[key][1] for key in self.matrix_keys]) if self.matrix_keys else np.empty((0, len(query)), dtype=np.float32)
+            if len(self.matrix_keys):
+                same_mentions = np.array([entry_mentions == mentions for entry_mentions in self.matrix_mentions])
+                similarities = np.where(same_mentions, self.matrix @ query, -np.inf)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= self.similarity_threshold:
+                    key = self.matrix_keys[best]
+                    self.entries.move_to_end(key)
+                    self.semantic_hits += 1
+                    return self.entries[key][0]
+            self.misses += 1
+        return None
+
+    def get(self, question: str, vector: list[float] = None) -> str | None:
+        cypher = self.get_exact(question)
+        if cypher is None and vector is not None:
+            cypher = self.get_similar(question, vector)
+        elif cypher is None:
+            with self.lock:
+                self.misses += 1
+        return cypher
+
+    def put(self, question: str, cypher: str, vector: list[float] = None) -> None:
+        unit = None
+        if vector is not None:
+            unit = np.array(vector, dtype=np.float32)
+            unit /= np.linalg.norm(unit) or 1.0
+        key = normalize_question(question)
+        with self.lock:
+            self.entries[key] = (cypher, unit, self.mentions(question), time.monotonic())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self.matrix = None
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"exact_hits": self.exact_hits, "semantic_hits": self.semantic_hits, "misses": self.misses, "entries": len(self.entries)}
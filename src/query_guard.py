@@ -0,0 +1,141 @@
+import re
+from typing import NamedTuple
+import neo4j
+from neo4j.exceptions import ClientError
+
+# Variable-length relationships: -[*]-, -[r*2..]->, -[:REFERENCED*..10]-, ...
+VARIABLE_LENGTH = re.compile(r"(-\s*\[[^\[\]*]*)\*\s*(\d*)\s*(\.\.)?\s*(\d*)(?=\s*(?:\{[^{}]*\}\s*)?\])")
+# Quantified path patterns with explicit bounds: ((a)-->(b)){1,}, ((a)-->(b)){,5}
+QUANTIFIER = re.compile(r"\)\s*\{\s*(\d*)\s*,\s*(\d*)\s*\}")
+FINAL_LIMIT = re.compile(r"\bLIMIT\s+(\S+)\s*$", re.IGNORECASE)
+# String literals, quoted names and comments, scanned left to right so that `//` inside a string is not a comment
+LITERALS_AND_COMMENTS = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|`[^`]*`|//[^\n]*|/\*.*?\*/", re.DOTALL)
+
+
+def bound_variable_length(cypher: str, max_hops: int) -> str:
+    """
+    Caps the upper bound of every variable-length relationship and bounded quantified
+    path pattern at `max_hops`. Quantifiers written as `+` or `*` after a parenthesized
+    path are left as they are and only stopped by the transaction timeout.
+    """
+    def relationship(match: re.Match) -> str:
+        prefix, low, dots, high = match.groups()
+        if not dots:
+            return f"{prefix}*{min(int(low), max_hops)}" if low else f"{prefix}*1..{max_hops}"
+        high = min(int(high), max_hops) if high else max_hops
+        low = min(int(low), high) if low else ""
+        return f"{prefix}*{low}..{high}"
+
+    def quantifier(match: re.Match) -> str:
+        low, high = match.groups()
+        high = min(int(high), max_hops) if high else max_hops
+        low = min(int(low), high) if low else 0
+        return f"){{{low},{high}}}"
+
+    return QUANTIFIER.sub(quantifier, VARIABLE_LENGTH.sub(relationship, cypher))
+
+
+def strip_comments(cypher: str) -> str:
+    return LITERALS_AND_COMMENTS.sub(lambda match: " " if match.group().startswith("/") else match.group(), cypher)
+
+
+def mask_literals(cypher: str) -> str:
+    """
+    `cypher` with the contents of its string literals and quoted names blanked out, at the
+    same offsets, so that keywords are only searched for in the query itself.
+    """
+    return LITERALS_AND_COMMENTS.sub(lambda match: match.group()[0] + "_" * (len(match.group()) - 2) + match.group()[-1], cypher)
+
+
+def ensure_limit(cypher: str, limit: int) -> str:
+    """
+    Makes the final RETURN return at most `limit` rows, by appending a LIMIT or lowering
+    a larger one. Statements without RETURN are left unchanged. Comments are removed.
+    """
+    cypher = strip_comments(cypher).strip().rstrip(";").rstrip()
+    masked = mask_literals(cypher)
+    if not re.search(r"\bRETURN\b", masked, re.IGNORECASE):
+        return cypher
+    if re.search(r"\bUNION\b", masked, re.IGNORECASE):
+        return f"CALL {{ {cypher} }} RETURN * LIMIT {limit}"
+    match = FINAL_LIMIT.search(masked)
+    if match is None:
+        return f"{cypher} LIMIT {limit}"
+    if match.group(1).isdigit() and int(match.group(1)) <= limit:
+        return cypher
+    return f"{cypher[:match.start(1)]}{limit}"
+
+
+def graph_ids(value, nodes: set, edges: set) -> None:
+    """
+    Adds the element IDs of the nodes and relationships in a record value, as the graph
+    view draws them: a relationship brings its start and end nodes.
+    """
+    if isinstance(value, neo4j.graph.Node):
+        nodes.add(value.element_id)
+    elif isinstance(value, neo4j.graph.Relationship):
+        edges.add(value.element_id)
+        nodes.update(node.element_id for node in value.nodes if node is not None)
+    elif isinstance(value, neo4j.graph.Path):
+        nodes.update(node.element_id for node in value.nodes)
+        edges.update(relationship.element_id for relationship in value.relationships)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            graph_ids(item, nodes, edges)
+    elif isinstance(value, dict):
+        for item in value.values():
+            graph_ids(item, nodes, edges)
+
+
+class GuardedResult(NamedTuple):
+    cypher: str
+    records: list
+    truncated: bool
+
+
+class QueryGuard:
+    """
+    Runs Cypher that did not come from this codebase, such as the LLM's, within bounds:
+    variable-length patterns are capped at `max_hops`, the result at `limit` rows, the
+    transaction at `timeout` seconds on the server, and records stop being read once
+    they would draw more than `max_nodes` nodes or `max_edges` relationships.
+    """
+    def __init__(self, driver, max_hops: int = 6, limit: int = 200, timeout: float = 10.0, max_nodes: int = 500, max_edges: int = 1000):
+        self.driver = driver
+        self.max_hops = max_hops
+        self.limit = limit
+        self.timeout = timeout
+        self.max_nodes = max_nodes
+        self.max_edges = max_edges
+
+    def prepare(self, cypher: str) -> str:
+        # One row more than `limit`: it arrives only when the result was cut off
+        return ensure_limit(bound_variable_length(cypher, self.max_hops), self.limit + 1)
+
+    def run(self, cypher: str, parameters: dict = None) -> GuardedResult:
+        cypher = self.prepare(cypher)
+
+        @neo4j.unit_of_work(timeout=self.timeout)
+        def read(tx):
+            records, nodes, edges = [], set(), set()
+            for record in tx.run(cypher, parameters or {}):
+                if len(records) == self.limit:
+                    return records, True
+                record_nodes, record_edges = set(), set()
+                graph_ids(list(record), record_nodes, record_edges)
+                if len(nodes | record_nodes) > self.max_nodes or len(edges | record_edges) > self.max_edges:
+                    # The rest of the stream is discarded when the transaction closes
+                    return records, True
+                nodes |= record_nodes
+                edges |= record_edges
+                records.append(record)
+            return records, False
+
+        try:
+            with self.driver.session(default_access_mode=neo4j.READ_ACCESS) as session:
+                records, truncated = session.execute_read(read)
+        except ClientError as e:
+            if "TransactionTimedOut" in (e.code or ""):
+                raise RuntimeError(f"Query exceeded the {self.timeout:g}s timeout: {e.message}")
+            raise
+        return GuardedResult(cypher, records, truncated)
@@ -0,0 +1,92 @@
+import sys
+from typing import NamedTuple
+
+# Fields requested from OpenAlex with `select`: only those the graph is built from
+WORK_FIELDS = ["id", "title", "authorships", "referenced_works", "cited_by_count", "updated_date"]
+AUTHOR_FIELDS = ["id", "display_name", "affiliations", "updated_date"]
+INSTITUTION_FIELDS = ["id", "display_name", "updated_date"]
+
+
+def intern_id(id: str | None) -> str | None:
+    """
+    The same ID shows up in many records (references, authorships), so keep a single copy of it.
+    """
+    return sys.intern(id) if id else id
+
+
+def field_or_item(record: tuple, key):
+    if isinstance(key, str):
+        try:
+            return getattr(record, key)
+        except AttributeError:
+            raise KeyError(key) from None
+    return tuple.__getitem__(record, key)
+
+
+def field_or_default(record: tuple, key: str, default=None):
+    return getattr(record, key, default)
+
+
+class WorkRecord(NamedTuple):
+    """
+    The parts of an OpenAlex work used by the crawl. Fields can also be read as keys,
+    e.g. `work["title"]` or `work.get("updated_date")`, like the raw OpenAlex dicts.
+    """
+    id: str
+    title: str | None
+    author_ids: tuple[str, ...]
+    referenced_works: tuple[str, ...]
+    cited_by_count: int
+    updated_date: str | None
+
+    __getitem__ = field_or_item
+    get = field_or_default
+
+    @classmethod
+    def from_openalex(cls, work: dict) -> "WorkRecord":
+        return cls(
+            intern_id(work["id"]),
+            work.get("title"),
+            tuple(intern_id(authorship["author"]["id"]) for authorship in work.get("authorships") or [] if authorship["author"].get("id")),
+            tuple(intern_id(id) for id in work.get("referenced_works") or []),
+            work.get("cited_by_count") or 0,
+            work.get("updated_date"),
+        )
+
+
+class AuthorRecord(NamedTuple):
+    """
+    The parts of an OpenAlex author used by the crawl.
+    """
+    id: str
+    display_name: str | None
+    institution_ids: tuple[str, ...]
+    updated_date: str | None
+
+    __getitem__ = field_or_item
+    get = field_or_default
+
+    @classmethod
+    def from_openalex(cls, author: dict) -> "AuthorRecord":
+        return cls(
+            intern_id(author["id"]),
+            author.get("display_name"),
+            tuple(intern_id(affiliation["institution"]["id"]) for affiliation in author.get("affiliations") or [] if affiliation["institution"].get("id")),
+            author.get("updated_date"),
+        )
+
+
+class InstitutionRecord(NamedTuple):
+    """
+    The parts of an OpenAlex institution used by the crawl.
+    """
+    id: str
+    display_name: str | None
+    updated_date: str | None
+
+    __getitem__ = field_or_item
+    get = field_or_default
+
+    @classmethod
+    def from_openalex(cls, institution: dict) -> "InstitutionRecord":
+        return cls(intern_id(institution["id"]), institution.get("display_name"), institution.get("updated_date"))
@@ -1,15 +1,125 @@
+import argparse
+import datetime
+import heapq
+import itertools
+import json
 import os
+import threading
 import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 import pyalex
+import requests
 from pyalex import Works, Authors, Institutions
 from neo4j import GraphDatabase
 from neo4j.exceptions import ServiceUnavailable
 from neo4j_graphrag.indexes import create_vector_index
-from neo4j_graphrag.embeddings import OpenAIEmbeddings
+from embedding import BatchEmbedder, CachedEmbedder, OpenAIBatchEmbeddings, create_embedder, text_hash
+from openalex_cache import EntityCache
+from checkpoint import CrawlCheckpoint, SeenIdStore
+from analytics import GraphAnalytics
+from vector_index import LocalVectorIndex
+from entity_resolution import normalize_name, WORK_TITLE_INDEX, AUTHOR_NAME_INDEX, INSTITUTION_NAME_INDEX
+from telemetry import IngestMetrics, ProgressReporter
+from records import WorkRecord, AuthorRecord, InstitutionRecord, WORK_FIELDS, AUTHOR_FIELDS, INSTITUTION_FIELDS
+from config import EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, EMBEDDING_STORAGE, OPENALEX_CACHE_PATH, OPENALEX_CACHE_TTL_DAYS, CRAWL_STATE_DIR, LOCAL_VECTOR_INDEX_DIR, LOCAL_VECTOR_INDEX_DTYPE
+
+
+WORK_QUERY = "MERGE (n:Work {id: $id}) ON CREATE SET n.title = $title, n.title_normalized = $title_normalized, n.vectorProperty = $vectorProperty, n.title_hash = $title_hash, n.updated_date = $updated_date ON MATCH SET n.title = $title, n.title_normalized = $title_normalized, n.vectorProperty = coalesce($vectorProperty, n.vectorProperty), n.title_hash = $title_hash, n.updated_date = $updated_date"
+AUTHOR_QUERY = "MERGE (n:Author {id: $id}) ON CREATE SET n.display_name = $display_name, n.name_normalized = $name_normalized, n.updated_date = $updated_date ON MATCH SET n.display_name = $display_name, n.name_normalized = $name_normalized, n.updated_date = $updated_date"
+INSTITUTION_QUERY = "MERGE (n:Institution {id: $id}) ON CREATE SET n.display_name = $display_name, n.name_normalized = $name_normalized, n.updated_date = $updated_date ON MATCH SET n.display_name = $display_name, n.name_normalized = $name_normalized, n.updated_date = $updated_date"
+# Used by the incremental refresh for works whose title, and so vector, did not change
+WORK_UPDATED_DATE_QUERY = "MATCH (n:Work {id: $id}) SET n.updated_date = $updated_date"
+REFERENCED_QUERY = (
+    "MATCH (n1:Work {id: $id1}), (n2:Work {id: $id2})"
+    "MERGE (n1)-[r:REFERENCED]->(n2)"
+    "RETURN r"
+)
+AUTHORED_QUERY = (
+    "MATCH (n1:Author {id: $id1}), (n2:Work {id: $id2})"
+    "MERGE (n1)-[r:AUTHORED]->(n2)"
+    "RETURN r"
+)
+AFFILIATED_WITH_QUERY = (
+    "MATCH (n1:Author {id: $id1}), (n2:Institution {id: $id2})"
+    "MERGE (n1)-[r:AFFILIATED_WITH]->(n2)"
+    "RETURN r"
+)
+
+# Single-row statements and their UNWIND counterparts. Nodes come before
+# relationships so that the MATCH clauses find every endpoint.
+BULK_QUERIES = {
+    WORK_QUERY: "UNWIND $rows AS row MERGE (n:Work {id: row.id}) ON CREATE SET n.title = row.title, n.title_normalized = row.title_normalized, n.vectorProperty = row.vectorProperty, n.title_hash = row.title_hash, n.updated_date = row.updated_date ON MATCH SET n.title = row.title, n.title_normalized = row.title_normalized, n.vectorProperty = coalesce(row.vectorProperty, n.vectorProperty), n.title_hash = row.title_hash, n.updated_date = row.updated_date",
+    AUTHOR_QUERY: "UNWIND $rows AS row MERGE (n:Author {id: row.id}) ON CREATE SET n.display_name = row.display_name, n.name_normalized = row.name_normalized, n.updated_date = row.updated_date ON MATCH SET n.display_name = row.display_name, n.name_normalized = row.name_normalized, n.updated_date = row.updated_date",
+    INSTITUTION_QUERY: "UNWIND $rows AS row MERGE (n:Institution {id: row.id}) ON CREATE SET n.display_name = row.display_name, n.name_normalized = row.name_normalized, n.updated_date = row.updated_date ON MATCH SET n.display_name = row.display_name, n.name_normalized = row.name_normalized, n.updated_date = row.updated_date",
+    WORK_UPDATED_DATE_QUERY: "UNWIND $rows AS row MATCH (n:Work {id: row.id}) SET n.updated_date = row.updated_date",
+    REFERENCED_QUERY: "UNWIND $rows AS row MATCH (n1:Work {id: row.id1}), (n2:Work {id: row.id2}) MERGE (n1)-[r:REFERENCED]->(n2)",
+    AUTHORED_QUERY: "UNWIND $rows AS row MATCH (n1:Author {id: row.id1}), (n2:Work {id: row.id2}) MERGE (n1)-[r:AUTHORED]->(n2)",
+    AFFILIATED_WITH_QUERY: "UNWIND $rows AS row MATCH (n1:Author {id: row.id1}), (n2:Institution {id: row.id2}) MERGE (n1)-[r:AFFILIATED_WITH]->(n2)",
+}
+
+# Vectors set as Cypher lists are stored as float64; setNodeVectorProperty stores float32 arrays
+VECTOR_STORAGES = ("float64", "float32")
+FLOAT32_WORK_BULK_QUERY = (
+    "UNWIND $rows AS row MERGE (n:Work {id: row.id}) ON CREATE SET n.title = row.title, n.title_normalized = row.title_normalized, n.title_hash = row.title_hash, n.updated_date = row.updated_date "
+    "ON MATCH SET n.title = row.title, n.title_normalized = row.title_normalized, n.title_hash = row.title_hash, n.updated_date = row.updated_date "
+    "WITH n, row WHERE row.vectorProperty IS NOT NULL CALL db.create.setNodeVectorProperty(n, 'vectorProperty', row.vectorProperty)"
+)
+VECTOR_QUERIES = {
+    "float64": "UNWIND $rows AS row MATCH (n:Work {id: row.id}) SET n.vectorProperty = row.vector",
+    "float32": "UNWIND $rows AS row MATCH (n:Work {id: row.id}) CALL db.create.setNodeVectorProperty(n, 'vectorProperty', row.vector)",
+}
+
+
+class CrawlBudget:
+    """
+    Hard limits of a best-first crawl from one seed; `None` leaves a limit open.
+    `priority` decides which works are expanded first: "cited_by_count", or "references"
+    for the number of crawled works that reference a work.
+    """
+    PRIORITIES = ("cited_by_count", "references")
+
+    def __init__(self, max_works: int = None, max_api_calls: int = None, max_seconds: float = None, priority: str = "cited_by_count"):
+        if priority not in self.PRIORITIES:
+            raise ValueError(f"Unknown crawl priority {priority!r}, expected one of {', '.join(self.PRIORITIES)}")
+        self.max_works = max_works
+        self.max_api_calls = max_api_calls
+        self.max_seconds = max_seconds
+        self.priority = priority
+
+    def exceeded(self, works: int, api_calls: int, seconds: float) -> str | None:
+        """
+        Name of the first limit reached, or None.
+        """
+        if self.max_works is not None and works >= self.max_works:
+            return "max_works"
+        if self.max_api_calls is not None and api_calls >= self.max_api_calls:
+            return "max_api_calls"
+        if self.max_seconds is not None and seconds >= self.max_seconds:
+            return "max_seconds"
+        return None
 
 
 class Neo4jHandler:
-    def __init__(self, uri: str, username: str, password: str):
+    def __init__(
+        self,
+        uri: str,
+        username: str,
+        password: str,
+        rows_per_statement: int = 1000,
+        embedder=None,
+        embedding_batch_size: int = 100,
+        max_in_flight_batches: int = 4,
+        max_buffer_rows: int = 10_000,
+        max_buffer_bytes: int = 64 * 1024 * 1024,
+        seen_ids: SeenIdStore = None,
+        checkpoint: CrawlCheckpoint = None,
+        embedding_dimensions: int = EMBEDDING_DIMENSIONS,
+        vector_storage: str = EMBEDDING_STORAGE,
+        metrics: IngestMetrics = None,
+    ):
+        if vector_storage not in VECTOR_STORAGES:
+            raise ValueError(f"vector_storage must be one of {', '.join(VECTOR_STORAGES)}")
         try:
             self.driver = GraphDatabase.driver(uri, auth=(username, password))
             self.driver.verify_connectivity()
@@ -20,8 +130,34 @@ class Neo4jHandler:
         except Exception as e:
             raise RuntimeError(f"Failed to connect to Neo4j: {e}")
         self.query_buffer = []
-        self.id_histoty = []
-        self.embedder = OpenAIEmbeddings(model="text-embedding-3-small")
+        self.rows_per_statement = rows_per_statement
+        # The buffer is flushed in its own transaction once it reaches either limit
+        self.max_buffer_rows = max_buffer_rows
+        self.max_buffer_bytes = max_buffer_bytes
+        self.buffer_bytes = 0
+        self.peak_buffer_rows = 0
+        self.peak_buffer_bytes = 0
+        self.flushes = 0
+        # IDs of every entity written so far; persisted when backed by a file
+        self.id_histoty = seen_ids if seen_ids is not None else SeenIdStore()
+        self.checkpoint = checkpoint
+        self.embedder = embedder or OpenAIBatchEmbeddings(model=EMBEDDING_MODEL, dimensions=embedding_dimensions)
+        self.embedding_dimensions = embedding_dimensions
+        self.vector_storage = vector_storage
+        self.bulk_queries = {**BULK_QUERIES, WORK_QUERY: FLOAT32_WORK_BULK_QUERY} if vector_storage == "float32" else BULK_QUERIES
+        self.embedding_batch_size = embedding_batch_size
+        self.max_in_flight_batches = max_in_flight_batches
+        self.pending_embeddings = []
+        self.embedding_requests = 0
+        # Shared with OpenAlexFetcher by default, so that one summary covers the whole run
+        self.metrics = metrics if metrics is not None else OpenAlexFetcher.metrics
+        # Guards the buffer and `id_histoty` when several seeds are crawled in parallel
+        self.lock = threading.RLock()
+        # Held by one flush at a time, so that buffers are written in the order they were
+        # filled and relationships never reach Neo4j before their nodes
+        self.write_lock = threading.Lock()
+        # IDs being fetched by some crawl worker, each with an event set once its node is buffered
+        self.in_flight = {}
 
     def close(self):
         self.driver.close()
@@ -34,7 +170,24 @@ class Neo4jHandler:
         except Exception as e:
             raise RuntimeError(f"An error occurred while executing query: {e}")
 
+    def read_query(self, query, **parameters) -> list:
+        try:
+            records, _, _ = self.driver.execute_query(query, parameters_=parameters, routing_="r")
+            return records
+        except ServiceUnavailable as e:
+            raise RuntimeError(f"Service unavailable while executing query: {e}")
+        except Exception as e:
+            raise RuntimeError(f"An error occurred while executing query: {e}")
+
     def create_vector_index(self, index_name: str, label: str, embedding_property: str, dimensions: int, similarity_fn: str = "euclidean"):
+        existing = self.read_query("SHOW VECTOR INDEXES YIELD name, options WHERE name = $name RETURN options", name=index_name)
+        if existing:
+            existing_dimensions = existing[0]["options"]["indexConfig"]["vector.dimensions"]
+            if existing_dimensions != dimensions:
+                raise RuntimeError(
+                    f"Vector index {index_name} has {existing_dimensions} dimensions but EMBEDDING_DIMENSIONS is {dimensions}; "
+                    "run with --reembed to drop it and re-embed every work"
+                )
         try:
             create_vector_index(
                 self.driver,
@@ -47,53 +200,234 @@ class Neo4jHandler:
         except Exception as e:
             raise RuntimeError(f"Failed to create vector index: {e}")
 
+    def create_indexes(self) -> None:
+        # Create vector index
+        self.create_vector_index(
+            index_name="work-vector-index",
+            label="Work",
+            embedding_property="vectorProperty",
+            dimensions=self.embedding_dimensions,
+            similarity_fn="euclidean",
+        )
+
+        self.execute_query(
+            "CREATE TEXT INDEX node_text_index_id IF NOT EXISTS FOR (n:Work) ON (n.id)"
+        )
+
+        self.execute_query(
+            "CREATE CONSTRAINT constraint_unique_work_id IF NOT EXISTS FOR (n:Work) REQUIRE n.id IS UNIQUE"
+        )
+
+        self.execute_query(
+            "CREATE CONSTRAINT constraint_unique_author_id IF NOT EXISTS FOR (n:Author) REQUIRE n.id IS UNIQUE"
+        )
+
+        self.execute_query(
+            "CREATE CONSTRAINT constraint_unique_institution_id IF NOT EXISTS FOR (n:Institution) REQUIRE n.id IS UNIQUE"
+        )
+
+        # Title and name lookups: exact matches seek the range indexes, fuzzy ones use the full-text indexes
+        self.execute_query(
+            "CREATE INDEX work_title_normalized IF NOT EXISTS FOR (n:Work) ON (n.title_normalized)"
+        )
+
+        self.execute_query(
+            "CREATE INDEX author_name_normalized IF NOT EXISTS FOR (n:Author) ON (n.name_normalized)"
+        )
+
+        self.execute_query(
+            "CREATE INDEX institution_name_normalized IF NOT EXISTS FOR (n:Institution) ON (n.name_normalized)"
+        )
+
+        self.execute_query(
+            f"CREATE FULLTEXT INDEX {WORK_TITLE_INDEX} IF NOT EXISTS FOR (n:Work) ON EACH [n.title_normalized]"
+        )
+
+        self.execute_query(
+            f"CREATE FULLTEXT INDEX {AUTHOR_NAME_INDEX} IF NOT EXISTS FOR (n:Author) ON EACH [n.name_normalized]"
+        )
+
+        self.execute_query(
+            f"CREATE FULLTEXT INDEX {INSTITUTION_NAME_INDEX} IF NOT EXISTS FOR (n:Institution) ON EACH [n.name_normalized]"
+        )
+
+        # Graphs built before titles and names were normalized are covered by the indexes above only once backfilled
+        updated = self.backfill_normalized_names()
+        if updated:
+            print(f"Normalized titles and names of {updated} existing nodes")
+
+    @staticmethod
+    def estimate_row_bytes(parameters: dict) -> int:
+        size = 64
+        for value in parameters.values():
+            if isinstance(value, str):
+                size += 49 + len(value)
+            elif isinstance(value, list):
+                size += 56 + 32 * len(value)
+            else:
+                size += 16
+        return size
+
+    def buffer_row(self, query: str, parameters: dict) -> bool:
+        """
+        Append a row to the buffer and return whether the buffer is due to be flushed.
+        Callers flush after releasing `lock`, so that other crawl workers keep buffering
+        while the rows are embedded and written.
+        """
+        with self.lock:
+            self.query_buffer.append((query, parameters))
+            self.metrics.count("buffered_rows")
+            self.buffer_bytes += self.estimate_row_bytes(parameters)
+            self.peak_buffer_rows = max(self.peak_buffer_rows, len(self.query_buffer))
+            self.peak_buffer_bytes = max(self.peak_buffer_bytes, self.buffer_bytes)
+            return len(self.query_buffer) >= self.max_buffer_rows or self.buffer_bytes >= self.max_buffer_bytes
+
     def add_to_batch(self, query: str, parameters: dict = None) -> None:
-        self.query_buffer.append((query, parameters or {}))
+        if self.buffer_row(query, parameters or {}):
+            self.flush()
 
-    def flush(self):
-        if not self.query_buffer:
+    def group_statements(self, buffer: list[tuple[str, dict]]) -> list[tuple[str, dict]]:
+        """
+        Turn buffered single-row statements into `UNWIND $rows` statements of at most
+        `rows_per_statement` rows each. Queries without a bulk form are kept as they are
+        and run after the bulk statements, in the order they were buffered.
+        """
+        rows_by_query = {query: [] for query in self.bulk_queries}
+        others = []
+        for query, params in buffer:
+            if query in rows_by_query:
+                rows_by_query[query].append(params)
+            else:
+                others.append((query, params))
+        statements = []
+        for query, rows in rows_by_query.items():
+            for chunk in OpenAlexFetcher.chunk_list(rows, self.rows_per_statement):
+                statements.append((self.bulk_queries[query], {"rows": chunk}))
+        return statements + others
+
+    def embed_pending(self, pending: list[dict] = None) -> None:
+        """
+        Attach vectors to the Work rows queued by `add_work`, many titles per embeddings request.
+        `pending` defaults to the rows queued since the last flush, and is emptied on success.
+        """
+        if pending is None:
+            pending = self.pending_embeddings
+        if not pending:
             return
+        batch_embedder = BatchEmbedder(self.embedder, self.embedding_batch_size, self.max_in_flight_batches)
         try:
-            with self.driver.session() as session:
-                session.execute_write(
-                    lambda tx: [tx.run(query, **params) for query, params in self.query_buffer]
-                )
-            self.query_buffer.clear()
-            self.id_histoty.clear()
+            with self.metrics.timed("embedding"):
+                vectors = batch_embedder.embed([params["title"] for params in pending])
         except Exception as e:
-            raise RuntimeError(f"An error occurred while flushing queries: {e}")
+            raise RuntimeError(f"An error occurred while embedding work titles: {e}")
+        self.embedding_requests += batch_embedder.requests
+        self.metrics.count("embedding_requests", batch_embedder.requests)
+        self.metrics.count("embedded_texts", batch_embedder.texts)
+        for params, vector in zip(pending, vectors):
+            params["vectorProperty"] = vector
+        pending.clear()
+
+    def flush(self):
+        """
+        Write the buffered rows in a single transaction. The buffer is swapped out under
+        `lock` and embedded and written outside it, so crawl workers only wait on each other
+        to append rows. Rows already written are not rolled back if a later flush fails; the
+        rows of the failed flush go back to the front of the buffer, and `id_histoty` is kept
+        so later rows are still deduplicated.
+        """
+        with self.write_lock:
+            with self.lock:
+                if not self.query_buffer:
+                    return
+                buffer, self.query_buffer = self.query_buffer, []
+                pending, self.pending_embeddings = self.pending_embeddings, []
+                buffer_bytes, self.buffer_bytes = self.buffer_bytes, 0
+                seen_ids = self.id_histoty.take_uncommitted()
+            try:
+                self.embed_pending(pending)
+                statements = self.group_statements(buffer)
+                with self.metrics.timed("flush"), self.driver.session() as session:
+                    session.execute_write(
+                        lambda tx: [tx.run(query, **params) for query, params in statements]
+                    )
+            except Exception as e:
+                with self.lock:
+                    self.query_buffer[:0] = buffer
+                    self.pending_embeddings[:0] = pending
+                    self.buffer_bytes += buffer_bytes
+                    self.id_histoty.restore(seen_ids)
+                raise RuntimeError(f"An error occurred while flushing queries: {e}")
+            self.metrics.count("flushes")
+            self.metrics.count("flushed_rows", len(buffer))
+            self.metrics.count("flushed_statements", len(statements))
+            self.id_histoty.commit(seen_ids)
+            with self.lock:
+                self.flushes += 1
 
     def clean_openalex_id(self, full_id: str) -> str:
         return full_id.replace("https://openalex.org/", "")
 
+    def buffer_work(self, work: Works) -> bool:
+        """
+        Buffer the row of `work`, to be embedded at the next flush, and return whether
+        the buffer is due to be flushed.
+        """
+        params = {
+            "id": self.clean_openalex_id(work["id"]),
+            "title": work["title"],
+            "title_normalized": normalize_name(work["title"]),
+            "vectorProperty": None,
+            "title_hash": text_hash(work["title"]) if work["title"] else None,
+            "updated_date": work.get("updated_date"),
+        }
+        with self.lock:
+            # Queued for embedding first, so that an automatic flush triggered by
+            # this very row embeds it too
+            if work["title"]:
+                self.pending_embeddings.append(params)
+            return self.buffer_row(WORK_QUERY, params)
+
+    def queue_work(self, work: Works) -> None:
+        if self.buffer_work(work):
+            self.flush()
+
     def add_work(self, work: Works) -> None:
         id = self.clean_openalex_id(work["id"])
-        if id not in self.id_histoty:
-            vector = self.embedder.embed_query(text=work["title"])
-            self.add_to_batch(
-                # "MERGE (n:Work {id: $id, title: $title, vectorProperty: $vectorProperty})",
-                "MERGE (n:Work {id: $id}) ON CREATE SET n.title = $title, n.vectorProperty = $vectorProperty ON MATCH SET n.title = $title, n.vectorProperty = $vectorProperty",
-                {"id": id, "title": work["title"], "vectorProperty": vector}
-            )
-            self.id_histoty.append(id)
+        # The row and its ID enter the buffer and `id_histoty` together, so that a flush
+        # never commits the ID of a row it does not write
+        with self.lock:
+            if id in self.id_histoty:
+                return
+            full = self.buffer_work(work)
+            self.id_histoty.add(id)
+        if full:
+            self.flush()
 
     def add_author(self, author: Authors) -> None:
         id = self.clean_openalex_id(author["id"])
-        if id not in self.id_histoty:
-            self.add_to_batch(
-                "MERGE (n:Author {id: $id}) ON CREATE SET n.display_name = $display_name ON MATCH SET n.display_name = $display_name",
-                {"id": id, "display_name": author["display_name"]}
+        with self.lock:
+            if id in self.id_histoty:
+                return
+            full = self.buffer_row(
+                AUTHOR_QUERY,
+                {"id": id, "display_name": author["display_name"], "name_normalized": normalize_name(author["display_name"]), "updated_date": author.get("updated_date")}
             )
-            self.id_histoty.append(id)
+            self.id_histoty.add(id)
+        if full:
+            self.flush()
 
     def add_institution(self, institution: Institutions) -> None:
         id = self.clean_openalex_id(institution["id"])
-        if id not in self.id_histoty:
-            self.add_to_batch(
-                "MERGE (n:Institution {id: $id}) ON CREATE SET n.display_name = $display_name ON MATCH SET n.display_name = $display_name",
-                {"id": id, "display_name": institution["display_name"]}
+        with self.lock:
+            if id in self.id_histoty:
+                return
+            full = self.buffer_row(
+                INSTITUTION_QUERY,
+                {"id": id, "display_name": institution["display_name"], "name_normalized": normalize_name(institution["display_name"]), "updated_date": institution.get("updated_date")}
             )
-            self.id_histoty.append(id)
+            self.id_histoty.add(id)
+        if full:
+            self.flush()
 
     def add_referenced(self, work1: Works, work2: Works) -> None:
         """
@@ -102,9 +436,7 @@ class Neo4jHandler:
         id1 = self.clean_openalex_id(work1["id"])
         id2 = self.clean_openalex_id(work2["id"])
         self.add_to_batch(
-            "MATCH (n1:Work {id: $id1}), (n2:Work {id: $id2})"
-            "MERGE (n1)-[r:REFERENCED]->(n2)"
-            "RETURN r",
+            REFERENCED_QUERY,
             {"id1": id1, "id2": id2}
         )
 
@@ -112,9 +444,7 @@ class Neo4jHandler:
         id1 = self.clean_openalex_id(author["id"])
         id2 = self.clean_openalex_id(work["id"])
         self.add_to_batch(
-            "MATCH (n1:Author {id: $id1}), (n2:Work {id: $id2})"
-            "MERGE (n1)-[r:AUTHORED]->(n2)"
-            "RETURN r",
+            AUTHORED_QUERY,
             {"id1": id1, "id2": id2}
         )
 
@@ -122,120 +452,659 @@ class Neo4jHandler:
         id1 = self.clean_openalex_id(author["id"])
         id2 = self.clean_openalex_id(institution["id"])
         self.add_to_batch(
-            "MATCH (n1:Author {id: $id1}), (n2:Institution {id: $id2})"
-            "MERGE (n1)-[r:AFFILIATED_WITH]->(n2)"
-            "RETURN r",
+            AFFILIATED_WITH_QUERY,
             {"id1": id1, "id2": id2}
         )
 
-    def traverse_and_add_works(self, initial_work: Works, depth: int = 1) -> None:
-        self.add_work(initial_work)
-        author_ids = [self.clean_openalex_id(authorship["author"]["id"]) for authorship in initial_work["authorships"]]
+    def author_ids_of(self, work: Works) -> list[str]:
+        if hasattr(work, "author_ids"):
+            return [self.clean_openalex_id(id) for id in work.author_ids]
+        return [self.clean_openalex_id(authorship["author"]["id"]) for authorship in work["authorships"] if authorship["author"].get("id")]
+
+    def institution_ids_of(self, author: Authors) -> list[str]:
+        if hasattr(author, "institution_ids"):
+            return [self.clean_openalex_id(id) for id in author.institution_ids]
+        return [self.clean_openalex_id(affiliation["institution"]["id"]) for affiliation in author.get("affiliations") or [] if affiliation["institution"].get("id")]
+
+    def fetch_once(self, fetch, ids: list[str], add) -> tuple[list, list[str]]:
+        """
+        Fetch and `add` the entities among `ids` that are neither in `id_histoty` nor being
+        fetched by another crawl worker, then wait for the other workers' fetches of `ids`.
+        On return every entity of `ids` that could be fetched is in `id_histoty` and its node
+        is in the buffer or already written. Returns the fetched entities and the IDs claimed.
+        """
+        with self.lock:
+            claimed = [id for id in dict.fromkeys(ids) if id not in self.id_histoty and id not in self.in_flight]
+            waiting = [self.in_flight[id] for id in dict.fromkeys(ids) if id in self.in_flight]
+            for id in claimed:
+                self.in_flight[id] = threading.Event()
+        try:
+            entities = fetch(claimed)
+            for entity in entities:
+                add(entity)
+        finally:
+            with self.lock:
+                for id in claimed:
+                    self.in_flight.pop(id).set()
+        for event in waiting:
+            event.wait()
+        return entities, claimed
+
+    def add_level(self, works: list[Works]) -> None:
+        """
+        Add `works` with their authors and institutions. Authors and institutions not already
+        in `id_histoty` are fetched once for the whole level, in full 100-ID chunks, and only
+        by one of the crawl workers sharing this handler.
+        """
+        for work in works:
+            self.add_work(work)
+
+        author_ids = [id for work in works for id in self.author_ids_of(work)]
+        authors, _ = self.fetch_once(OpenAlexFetcher.fetch_authors, author_ids, self.add_author)
+        for work in works:
+            for author_id in self.author_ids_of(work):
+                if author_id in self.id_histoty:
+                    self.add_authored({"id": author_id}, work)
+
+        institution_ids = [id for author in authors for id in self.institution_ids_of(author)]
+        self.fetch_once(OpenAlexFetcher.fetch_institutions, institution_ids, self.add_institution)
+        for author in authors:
+            for institution_id in self.institution_ids_of(author):
+                if institution_id in self.id_histoty:
+                    self.add_affiliated_with(author, {"id": institution_id})
+
+    def relink_affiliations(self, author_ids: list[str]) -> None:
+        """
+        Add the affiliations of authors already in `id_histoty` again. A crawl interrupted
+        mid-level may have flushed an author while its AFFILIATED_WITH rows were still
+        buffered, and known authors are not fetched again by `add_level`.
+        """
+        if not author_ids:
+            return
         authors = OpenAlexFetcher.fetch_authors(author_ids)
+        institution_ids = [id for author in authors for id in self.institution_ids_of(author)]
+        self.fetch_once(OpenAlexFetcher.fetch_institutions, institution_ids, self.add_institution)
         for author in authors:
-            self.add_author(author)
-            self.add_authored(author, initial_work)
-            institution_ids = [self.clean_openalex_id(affiliation["institution"]["id"]) for affiliation in author["affiliations"]]
-            institutions = OpenAlexFetcher.fetch_institutions(institution_ids)
-            for institution in institutions:
-                self.add_institution(institution)
-                self.add_affiliated_with(author, institution)
-        if depth > 0:
-            referenced_work_ids = [self.clean_openalex_id(referenced_work) for referenced_work in initial_work["referenced_works"]]
-            works = OpenAlexFetcher.fetch_works(referenced_work_ids)
+            for institution_id in self.institution_ids_of(author):
+                if institution_id in self.id_histoty:
+                    self.add_affiliated_with(author, {"id": institution_id})
+
+    def traverse_and_add_works(self, initial_work: Works, depth: int = 1) -> None:
+        """
+        Breadth-first crawl from `initial_work` following `referenced_works` up to `depth` levels.
+
+        Each level is handled as a whole: the referenced works of the entire frontier are
+        deduplicated and fetched together, and so are their authors and institutions.
+        Works claimed by another crawl worker are awaited and then read from the cache.
+        With a `checkpoint`, every completed level is flushed and recorded, and a crawl of
+        the same seed resumes after the last recorded level, linking the authors it had
+        already written to their institutions again.
+        """
+        seed = self.clean_openalex_id(initial_work["id"])
+        state = self.checkpoint.level_state(seed) if self.checkpoint is not None else None
+        if state is not None:
+            start_depth = state["depth"]
+            seen_works = set(state["seen_works"])
+            frontier = OpenAlexFetcher.fetch_works(state["frontier"])
+        else:
+            start_depth = 0
+            seen_works = {seed}
+            frontier = [initial_work]
+            self.metrics.start_level(0, 1)
+            self.metrics.fetched("works", 1)
+            self.add_level(frontier)
+            self.save_checkpoint(seed, 0, frontier, seen_works)
+            self.metrics.end_level()
+        for level in range(start_depth, depth):
+            referenced_ids = dict.fromkeys(
+                self.clean_openalex_id(referenced_work) for work in frontier for referenced_work in work["referenced_works"]
+            )
+            new_ids = [id for id in referenced_ids if id not in seen_works]
+            self.metrics.start_level(level + 1, len(new_ids))
+            works, claimed = self.fetch_once(OpenAlexFetcher.fetch_works, new_ids, self.add_work)
+            resuming = state is not None and level == start_depth
+            # Works written by an earlier seed or another worker still have to be expanded,
+            # except at the last level, unless their authors are to be relinked on resuming
+            claimed = set(claimed)
+            known_ids = [id for id in new_ids if id not in claimed]
+            if known_ids and (level + 1 < depth or resuming):
+                works += OpenAlexFetcher.fetch_works(known_ids)
+            seen_works.update(self.clean_openalex_id(work["id"]) for work in works)
+            if resuming:
+                known_authors = [id for id in dict.fromkeys(id for work in frontier + works for id in self.author_ids_of(work)) if id in self.id_histoty]
+            # Nodes go into the buffer before the relationships that MATCH them, so an
+            # automatic flush never writes a relationship ahead of its endpoints.
+            self.add_level(works)
+            if resuming:
+                self.relink_affiliations(known_authors)
+            for work in frontier:
+                for referenced_work in dict.fromkeys(work["referenced_works"]):
+                    if self.clean_openalex_id(referenced_work) in self.id_histoty:
+                        self.add_referenced(work, {"id": referenced_work})
+            frontier = works
+            self.save_checkpoint(seed, level + 1, frontier, seen_works)
+            self.metrics.end_level()
+
+    def crawl_best_first(self, initial_work: Works, budget: CrawlBudget) -> dict:
+        """
+        Crawl from `initial_work` following `referenced_works` in priority order until the
+        frontier is exhausted or a limit of `budget` is reached, without a depth limit.
+
+        Fetched works wait in a heap ordered by `budget.priority`. The best works are expanded
+        together until their unseen references fill one 100-ID request; when `max_works`
+        leaves room for only part of them, the references cited by most crawled works win.
+        Limits are checked before every such request, so a crawl stops within one request
+        of its budget. Only the API calls sent for this crawl count towards `max_api_calls`,
+        even when other seeds are crawled at the same time.
+        Returns the works crawled, API calls, seconds and the limit that stopped the crawl.
+        """
+        start = time.monotonic()
+        api_calls = OpenAlexFetcher.count_crawl_requests()
+        seed = self.clean_openalex_id(initial_work["id"])
+        fetched = {seed: initial_work}
+        requested = {seed}
+        expanded = set()
+        # Number of crawled works referencing each work
+        in_references = Counter()
+        heap = []
+        order = itertools.count()
+
+        def push(work):
+            if budget.priority == "references":
+                priority = in_references[self.clean_openalex_id(work["id"])]
+            else:
+                priority = work.get("cited_by_count") or 0
+            heapq.heappush(heap, (-priority, next(order), work))
+
+        self.add_level([initial_work])
+        push(initial_work)
+        stopped_by = None
+        while heap:
+            stopped_by = budget.exceeded(len(fetched), api_calls["requests"], time.monotonic() - start)
+            if stopped_by:
+                break
+            batch = []
+            new_ids = {}
+            while heap and len(new_ids) < 100:
+                _, _, work = heapq.heappop(heap)
+                id = self.clean_openalex_id(work["id"])
+                if id in expanded:
+                    # A stale entry left behind when the work's priority went up
+                    continue
+                expanded.add(id)
+                batch.append(work)
+                for referenced_id in dict.fromkeys(self.clean_openalex_id(referenced_work) for referenced_work in work["referenced_works"]):
+                    in_references[referenced_id] += 1
+                    if referenced_id not in requested:
+                        new_ids[referenced_id] = None
+                    elif budget.priority == "references" and referenced_id not in expanded and referenced_id in fetched:
+                        # Requested IDs that OpenAlex did not return are never pushed
+                        push(fetched[referenced_id])
+            new_ids = sorted(new_ids, key=lambda id: -in_references[id])
+            if budget.max_works is not None:
+                new_ids = new_ids[:budget.max_works - len(fetched)]
+            requested.update(new_ids)
+
+            works, claimed = self.fetch_once(OpenAlexFetcher.fetch_works, new_ids, self.add_work)
+            claimed = set(claimed)
+            known_ids = [id for id in new_ids if id not in claimed]
+            if known_ids:
+                works += OpenAlexFetcher.fetch_works(known_ids)
+            self.add_level(works)
+            for work in batch:
+                for referenced_work in dict.fromkeys(work["referenced_works"]):
+                    if self.clean_openalex_id(referenced_work) in self.id_histoty:
+                        self.add_referenced(work, {"id": referenced_work})
             for work in works:
-                self.traverse_and_add_works(work, depth - 1)
-                self.add_referenced(initial_work, work)
+                fetched[self.clean_openalex_id(work["id"])] = work
+                push(work)
+
+        return {
+            "works": len(fetched),
+            "api_calls": api_calls["requests"],
+            "seconds": time.monotonic() - start,
+            "stopped_by": stopped_by or "exhausted",
+        }
+
+    def save_checkpoint(self, seed: str, depth: int, frontier: list[Works], seen_works: set[str]) -> None:
+        if self.checkpoint is None:
+            return
+        self.flush()
+        self.checkpoint.save_level(seed, depth, [self.clean_openalex_id(work["id"]) for work in frontier], seen_works)
 
-    def build_graph_from_work(self, initial_work: Works, depth: int = 1) -> None:
-        self.traverse_and_add_works(initial_work, depth)
+    def build_graph_from_work(self, initial_work: Works, depth: int = 1, budget: CrawlBudget = None) -> None:
+        """
+        Crawl breadth-first up to `depth`, or best-first within `budget` when one is given.
+        """
+        if budget is not None:
+            self.crawl_best_first(initial_work, budget)
+        else:
+            self.traverse_and_add_works(initial_work, depth)
         self.flush()
+        if self.checkpoint is not None:
+            self.checkpoint.complete_seed(self.clean_openalex_id(initial_work["id"]))
+
+    def build_graph_from_seeds(self, seeds: list[str], depth: int = 1, workers: int = 8, budget: CrawlBudget = None) -> None:
+        """
+        Build the graph from many seed DOIs or OpenAlex IDs, crawling up to `workers` seeds
+        at once. The workers share this handler's buffer and `id_histoty`, and the class-wide
+        `OpenAlexFetcher.rate_limiter`, so an entity reached from several seeds is fetched
+        and written once. Seeds already completed in the `checkpoint` are skipped.
+        With a `budget`, every seed is crawled best-first within it instead of up to `depth`.
+        """
+        def build(seed):
+            if self.checkpoint is not None and self.checkpoint.is_completed(self.clean_openalex_id(seed)):
+                return
+            try:
+                work = OpenAlexFetcher.fetch_work(seed)
+            except Exception as e:
+                print(f"Skipping {seed}: {e}")
+                return
+            if self.checkpoint is not None and self.checkpoint.is_completed(self.clean_openalex_id(work["id"])):
+                return
+            self.build_graph_from_work(work, depth, budget)
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(build, seeds))
+        self.flush()
+
+    def refresh(self, since: str) -> dict:
+        """
+        Bring the entities already in the graph up to date with OpenAlex, keeping only the
+        records updated on or after `since` (YYYY-MM-DD). A work is rewritten and re-embedded
+        only when its title hash changed; otherwise just its `updated_date` is set.
+        References, authorships and affiliations are linked only to nodes already in the graph.
+        """
+        work_title_hashes = {record["id"]: record["title_hash"] for record in self.read_query("MATCH (n:Work) RETURN n.id AS id, n.title_hash AS title_hash")}
+        author_ids = {record["id"] for record in self.read_query("MATCH (n:Author) RETURN n.id AS id")}
+        institution_ids = {record["id"] for record in self.read_query("MATCH (n:Institution) RETURN n.id AS id")}
+        counts = {"works": 0, "reembedded_works": 0, "authors": 0, "institutions": 0}
+
+        for institution in OpenAlexFetcher.fetch_institutions(list(institution_ids), since):
+            self.add_to_batch(INSTITUTION_QUERY, {"id": self.clean_openalex_id(institution["id"]), "display_name": institution["display_name"], "name_normalized": normalize_name(institution["display_name"]), "updated_date": institution.get("updated_date")})
+            counts["institutions"] += 1
+
+        for author in OpenAlexFetcher.fetch_authors(list(author_ids), since):
+            self.add_to_batch(AUTHOR_QUERY, {"id": self.clean_openalex_id(author["id"]), "display_name": author["display_name"], "name_normalized": normalize_name(author["display_name"]), "updated_date": author.get("updated_date")})
+            counts["authors"] += 1
+            for institution_id in self.institution_ids_of(author):
+                if institution_id in institution_ids:
+                    self.add_affiliated_with(author, {"id": institution_id})
+
+        for work in OpenAlexFetcher.fetch_works(list(work_title_hashes), since):
+            id = self.clean_openalex_id(work["id"])
+            counts["works"] += 1
+            if work["title"] and text_hash(work["title"]) == work_title_hashes[id]:
+                self.add_to_batch(WORK_UPDATED_DATE_QUERY, {"id": id, "updated_date": work.get("updated_date")})
+            else:
+                self.queue_work(work)
+                counts["reembedded_works"] += 1
+            for referenced_work in dict.fromkeys(work["referenced_works"]):
+                if self.clean_openalex_id(referenced_work) in work_title_hashes:
+                    self.add_referenced(work, {"id": referenced_work})
+            for author_id in self.author_ids_of(work):
+                if author_id in author_ids:
+                    self.add_authored({"id": author_id}, work)
+
+        self.flush()
+        return counts
+
+    def backfill_normalized_names(self) -> int:
+        """
+        Set `title_normalized` / `name_normalized` on nodes written before those properties
+        existed, so that the title and name indexes cover the whole graph. Returns the nodes updated.
+        """
+        updated = 0
+        for label, source, target in [("Work", "title", "title_normalized"), ("Author", "display_name", "name_normalized"), ("Institution", "display_name", "name_normalized")]:
+            records = self.read_query(f"MATCH (n:{label}) WHERE n.{target} IS NULL AND n.{source} IS NOT NULL RETURN n.id AS id, n.{source} AS text")
+            rows = [{"id": record["id"], "value": normalize_name(record["text"])} for record in records]
+            for i in range(0, len(rows), self.rows_per_statement):
+                self.execute_query(f"UNWIND $rows AS row MATCH (n:{label} {{id: row.id}}) SET n.{target} = row.value", rows=rows[i:i + self.rows_per_statement])
+            updated += len(rows)
+        return updated
+
+    def reembed_works(self) -> int:
+        """
+        Embed every work title again, at the current dimensions and storage, after the
+        vector index was dropped. Returns the works embedded.
+        """
+        records = self.read_query("MATCH (n:Work) WHERE n.title IS NOT NULL RETURN n.id AS id, n.title AS title")
+        batch_embedder = BatchEmbedder(self.embedder, self.embedding_batch_size, self.max_in_flight_batches)
+        for chunk in OpenAlexFetcher.chunk_list(records, self.rows_per_statement):
+            with self.metrics.timed("embedding"):
+                vectors = batch_embedder.embed([record["title"] for record in chunk])
+            with self.metrics.timed("flush"):
+                self.execute_query(VECTOR_QUERIES[self.vector_storage], rows=[{"id": record["id"], "vector": vector} for record, vector in zip(chunk, vectors)])
+        self.embedding_requests += batch_embedder.requests
+        self.metrics.count("embedding_requests", batch_embedder.requests)
+        self.metrics.count("embedded_texts", batch_embedder.texts)
+        return len(records)
+
+    def last_synced(self) -> str | None:
+        records = self.read_query("MATCH (s:SyncState {id: 'openalex'}) RETURN s.last_synced AS last_synced")
+        return records[0]["last_synced"] if records else None
+
+    def mark_synced(self, date: str) -> None:
+        self.execute_query("MERGE (s:SyncState {id: 'openalex'}) SET s.last_synced = $date", date=date)
+
+    def buffer_stats(self) -> dict:
+        return {"flushes": self.flushes, "peak_buffer_rows": self.peak_buffer_rows, "peak_buffer_bytes": self.peak_buffer_bytes}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` requests per second on average, bursts of up to `capacity`.
+    """
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
 
 
 class OpenAlexFetcher:
+    # OpenAlex polite pool: at most 10 requests per second
+    rate_limiter = TokenBucket(rate=10, capacity=10)
+    max_workers = 4
+    max_retries = 3
+    retry_backoff = 0.5
+    retry_status_codes = (429, 500, 502, 503, 504)
+    # IDs whose chunk could not be fetched, by entity type
+    failed_ids = {"works": set(), "authors": set(), "institutions": set()}
+    # Optional EntityCache; only IDs missing from it are requested from OpenAlex
+    cache = None
+    # Serve from the cache only, never from the network
+    offline = False
+    # Requests sent to OpenAlex so far, retries included
+    request_count = 0
+    request_count_lock = threading.Lock()
+    # Per-thread Counter of the requests sent by the crawl running on that thread
+    local = threading.local()
+    # Requests, bytes, waits and entities fetched, for the progress line and run summary
+    metrics = IngestMetrics()
+
     @staticmethod
     def chunk_list(lst: list, chunk_size: int):
         for i in range(0, len(lst), chunk_size):
             yield lst[i:i + chunk_size]
 
     @staticmethod
-    def fetch_works(work_ids: list[str]):
-        works = []
-        for chunk in OpenAlexFetcher.chunk_list(work_ids, 100):
-            try:
-                works += Works().filter(openalex_id="|".join(chunk)).get(per_page=100)
-                time.sleep(0.1)
-            except Exception as e:
-                print(f"Error fetching works: {e}")
-        return works
+    def count_request() -> None:
+        with OpenAlexFetcher.request_count_lock:
+            OpenAlexFetcher.request_count += 1
+            crawl_requests = getattr(OpenAlexFetcher.local, "crawl_requests", None)
+            if crawl_requests is not None:
+                crawl_requests["requests"] += 1
+        OpenAlexFetcher.metrics.count("openalex_requests")
 
     @staticmethod
-    def fetch_authors(author_ids: list[str]):
-        authors = []
-        for chunk in OpenAlexFetcher.chunk_list(author_ids, 100):
+    def count_crawl_requests() -> Counter:
+        """
+        Start counting the requests sent on behalf of this thread, including the chunk
+        requests `fetch_entities` runs on pool threads, in the returned Counter's "requests".
+        """
+        OpenAlexFetcher.local.crawl_requests = Counter()
+        return OpenAlexFetcher.local.crawl_requests
+
+    @staticmethod
+    def count_response_bytes(response, *args, **kwargs) -> None:
+        """
+        `requests` response hook: counts the size of an OpenAlex response body, as sent
+        when the server gives its Content-Length, otherwise as received.
+        """
+        length = response.headers.get("Content-Length")
+        OpenAlexFetcher.metrics.count("openalex_bytes", int(length) if length and length.isdigit() else len(response.content))
+
+    @staticmethod
+    def fetch_chunk(endpoint, chunk: list[str], fields: list[str] = None) -> list:
+        filters = {"openalex_id": "|".join(chunk)}
+        metrics = OpenAlexFetcher.metrics
+        for attempt in range(OpenAlexFetcher.max_retries + 1):
+            with metrics.timed("openalex_wait"):
+                OpenAlexFetcher.rate_limiter.acquire()
+            OpenAlexFetcher.count_request()
             try:
-                authors += Authors().filter(openalex_id="|".join(chunk)).get(per_page=100)
-                time.sleep(0.1)
-            except Exception as e:
-                print(f"Error fetching authors: {e}")
-        return authors
+                query = endpoint().select(fields) if fields else endpoint()
+                with metrics.timed("openalex"):
+                    results = query.filter(**filters).get(per_page=100)
+                return results
+            except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+                response = getattr(e, "response", None)
+                status_code = response.status_code if response is not None else None
+                retryable = status_code is None or status_code in OpenAlexFetcher.retry_status_codes
+                if not retryable or attempt == OpenAlexFetcher.max_retries:
+                    raise
+                metrics.count("openalex_retries")
+                retry_after = response.headers.get("Retry-After") if response is not None else None
+                delay = OpenAlexFetcher.retry_backoff * 2 ** attempt
+                time.sleep(float(retry_after) if retry_after and retry_after.isdigit() else delay)
 
     @staticmethod
-    def fetch_institutions(institution_ids: list[str]):
-        institutions = []
-        for chunk in OpenAlexFetcher.chunk_list(institution_ids, 100):
+    def fetch_entities(endpoint, entity_ids: list[str], entity_type: str, since: str = None, fields: list[str] = None) -> list:
+        """
+        Fetch `entity_ids` in chunks of 100, running up to `max_workers` chunk requests at once.
+        Chunks that still fail after retrying are reported in `failed_ids[entity_type]`.
+        With `fields`, OpenAlex returns only those top-level fields of each record.
+
+        With a `cache`, only IDs missing from it are requested and the responses are stored in it.
+        With `since` (YYYY-MM-DD), every record is fetched fresh from OpenAlex and only those
+        whose `updated_date` is on or after that date are returned. The date is compared here
+        because OpenAlex accepts its `from_updated_date` filter only with a Premium API key.
+        """
+        cached = []
+        if OpenAlexFetcher.cache is not None and since is None:
+            found = OpenAlexFetcher.cache.get_many(entity_type, entity_ids)
+            cached = [found[id] for id in dict.fromkeys(entity_ids) if id in found]
+            entity_ids = [id for id in entity_ids if id not in found]
+            OpenAlexFetcher.metrics.fetched(entity_type, len(cached), cached=True)
+        if OpenAlexFetcher.offline:
+            return cached
+        chunks = list(OpenAlexFetcher.chunk_list(entity_ids, 100))
+        # Chunks run on pool threads but count towards the depth level of the calling crawl thread
+        depth = OpenAlexFetcher.metrics.current_depth()
+        crawl_requests = getattr(OpenAlexFetcher.local, "crawl_requests", None)
+
+        def fetch(chunk):
+            OpenAlexFetcher.local.crawl_requests = crawl_requests
             try:
-                institutions += Institutions().filter(openalex_id="|".join(chunk)).get(per_page=100)
-                time.sleep(0.1)
+                results = OpenAlexFetcher.fetch_chunk(endpoint, chunk, fields=fields)
+                OpenAlexFetcher.metrics.fetched(entity_type, len(results), depth=depth)
+                return results
             except Exception as e:
-                print(f"Error fetching institutions: {e}")
-        return institutions
+                print(f"Error fetching {entity_type}: {e}")
+                OpenAlexFetcher.metrics.count("openalex_errors")
+                OpenAlexFetcher.failed_ids[entity_type].update(chunk)
+                return []
+
+        if len(chunks) <= 1:
+            results = [fetch(chunk) for chunk in chunks]
+        else:
+            with ThreadPoolExecutor(max_workers=OpenAlexFetcher.max_workers) as pool:
+                results = list(pool.map(fetch, chunks))
+        fetched = [entity for result in results for entity in result]
+        if OpenAlexFetcher.cache is not None and fetched:
+            OpenAlexFetcher.cache.put_many(entity_type, {entity["id"].replace("https://openalex.org/", ""): entity for entity in fetched})
+        if since is not None:
+            fetched = [entity for entity in fetched if (entity.get("updated_date") or "")[:10] >= since]
+        return cached + fetched
+
+    @staticmethod
+    def fetch_work(key: str) -> WorkRecord:
+        """
+        Fetch a single work by OpenAlex ID or DOI, going through the cache like `fetch_works`.
+        """
+        if OpenAlexFetcher.cache is not None:
+            cached = OpenAlexFetcher.cache.get_many("works", [key])
+            if cached:
+                return WorkRecord.from_openalex(cached[key])
+        if OpenAlexFetcher.offline:
+            raise KeyError(f"{key} is not in the OpenAlex cache")
+        with OpenAlexFetcher.metrics.timed("openalex_wait"):
+            OpenAlexFetcher.rate_limiter.acquire()
+        OpenAlexFetcher.count_request()
+        with OpenAlexFetcher.metrics.timed("openalex"):
+            work = Works()[key]
+        if OpenAlexFetcher.cache is not None:
+            OpenAlexFetcher.cache.put_many("works", {key: work, work["id"].replace("https://openalex.org/", ""): work})
+        return WorkRecord.from_openalex(work)
+
+    # The fetchers below request only the fields the graph needs and return compact
+    # records, so a crawl level holds tuples of interned IDs rather than full OpenAlex dicts.
+    @staticmethod
+    def fetch_works(work_ids: list[str], since: str = None) -> list[WorkRecord]:
+        return [WorkRecord.from_openalex(work) for work in OpenAlexFetcher.fetch_entities(Works, work_ids, "works", since, WORK_FIELDS)]
+
+    @staticmethod
+    def fetch_authors(author_ids: list[str], since: str = None) -> list[AuthorRecord]:
+        return [AuthorRecord.from_openalex(author) for author in OpenAlexFetcher.fetch_entities(Authors, author_ids, "authors", since, AUTHOR_FIELDS)]
+
+    @staticmethod
+    def fetch_institutions(institution_ids: list[str], since: str = None) -> list[InstitutionRecord]:
+        return [InstitutionRecord.from_openalex(institution) for institution in OpenAlexFetcher.fetch_entities(Institutions, institution_ids, "institutions", since, INSTITUTION_FIELDS)]
+
+    @staticmethod
+    def sync_date(started_on: str) -> str | None:
+        """
+        Date up to which this run saw OpenAlex's data, for later `--refresh` runs to start
+        from: the start of the run, or the day of the oldest cached record it used. None when
+        the run was offline or some entities could not be fetched.
+        """
+        if OpenAlexFetcher.offline or any(OpenAlexFetcher.failed_ids.values()):
+            return None
+        cache = OpenAlexFetcher.cache
+        if cache is not None and cache.oldest_hit is not None:
+            return min(started_on, datetime.date.fromtimestamp(cache.oldest_hit).isoformat())
+        return started_on
+
+    @staticmethod
+    def report_failures() -> None:
+        for entity_type, ids in OpenAlexFetcher.failed_ids.items():
+            if ids:
+                print(f"Failed to fetch {len(ids)} {entity_type}: {' '.join(sorted(ids))}")
+
+
+def install_openalex_session() -> None:
+    """
+    Make pyalex count the bytes of OpenAlex responses in `OpenAlexFetcher.metrics`.
+    pyalex 0.15 opens a `requests` session per request through its private
+    `_get_requests_session`; the sessions it opens from now on get a response hook.
+    """
+    create_session = pyalex.api._get_requests_session
+
+    def openalex_session():
+        session = create_session()
+        session.hooks["response"].append(OpenAlexFetcher.count_response_bytes)
+        return session
+
+    pyalex.api._get_requests_session = openalex_session
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the PaperChainExplorer graph from OpenAlex.")
+    parser.add_argument("--offline", action="store_true", help="build only from the local OpenAlex cache")
+    parser.add_argument("--resume", action="store_true", help="continue an interrupted crawl from its last checkpoint")
+    parser.add_argument("--refresh", action="store_true", help="only update entities changed in OpenAlex since the last sync")
+    parser.add_argument("--seeds", metavar="FILE", help="file with one seed DOI or OpenAlex work ID per line")
+    parser.add_argument("--workers", type=int, default=8, help="number of seeds crawled in parallel (default: 8)")
+    parser.add_argument("--depth", type=int, default=1, help="levels of references to follow from each seed (default: 1)")
+    parser.add_argument("--max-works", type=int, help="crawl best-first and stop each seed after this many works")
+    parser.add_argument("--max-api-calls", type=int, help="crawl best-first and stop each seed after this many OpenAlex requests")
+    parser.add_argument("--max-seconds", type=float, help="crawl best-first and stop each seed after this many seconds")
+    parser.add_argument("--reembed", action="store_true", help="drop the vector index and re-embed every work at EMBEDDING_DIMENSIONS")
+    parser.add_argument("--analytics", action="store_true", help="compute citation counts, PageRank and co-author counts after the build")
+    parser.add_argument("--progress-interval", type=float, default=10.0, help="seconds between progress lines; 0 to disable (default: 10)")
+    parser.add_argument("--metrics", metavar="FILE", help="also write the ingestion summary to this JSON file")
+    parser.add_argument("--priority", choices=CrawlBudget.PRIORITIES, default="cited_by_count", help="order of a best-first crawl (default: cited_by_count)")
+    args = parser.parse_args()
+    started_on = datetime.date.today().isoformat()
+
     pyalex.config.email = os.getenv("OPENALEX_EMAIL")
+    install_openalex_session()
+    if OPENALEX_CACHE_PATH:
+        OpenAlexFetcher.cache = EntityCache(OPENALEX_CACHE_PATH, ttl=OPENALEX_CACHE_TTL_DAYS * 24 * 60 * 60)
+    OpenAlexFetcher.offline = args.offline
 
+    seen_ids = SeenIdStore(os.path.join(CRAWL_STATE_DIR, "seen_ids.sqlite3"))
+    checkpoint = CrawlCheckpoint(os.path.join(CRAWL_STATE_DIR, "checkpoint.json"))
+    if not args.resume and not args.refresh:
+        seen_ids.clear()
+        checkpoint.reset()
+
+    embedder = create_embedder()
     neo4j_handler = Neo4jHandler(
         uri=os.getenv("NEO4J_URI"),
         username=os.getenv("NEO4J_USERNAME"),
-        password=os.getenv("NEO4J_PASSWORD")
-    )
-
-    # Create vector index
-    neo4j_handler.create_vector_index(
-        index_name="work-vector-index",
-        label="Work",
-        embedding_property="vectorProperty",
-        dimensions=1536,
-        similarity_fn="euclidean",
+        password=os.getenv("NEO4J_PASSWORD"),
+        embedder=embedder,
+        seen_ids=seen_ids,
+        checkpoint=checkpoint,
     )
 
-    neo4j_handler.execute_query(
-        "CREATE TEXT INDEX node_text_index_id IF NOT EXISTS FOR (n:Work) ON (n.id)"
-    )
+    progress = ProgressReporter(OpenAlexFetcher.metrics, args.progress_interval).start()
+    if args.reembed:
+        neo4j_handler.execute_query("DROP INDEX `work-vector-index` IF EXISTS")
+    neo4j_handler.create_indexes()
+    if args.reembed:
+        print(f"Re-embedded {neo4j_handler.reembed_works()} works at {EMBEDDING_DIMENSIONS} dimensions")
 
-    neo4j_handler.execute_query(
-        "CREATE CONSTRAINT constraint_unique_work_id IF NOT EXISTS FOR (n:Work) REQUIRE n.id IS UNIQUE"
-    )
+    if args.refresh:
+        since = neo4j_handler.last_synced()
+        if since is None:
+            parser.error("the graph has no sync date yet; run a full build first")
+        print(f"Refreshed since {since}: {neo4j_handler.refresh(since)}")
+    else:
+        dois = [
+            "https://doi.org/10.1007/s11548-019-01929-x",
+            "https://dx.doi.org/10.3748/wjg.v29.i9.1427",
+            "https://doi.org/10.48550/arXiv.1706.03762",
+            "https://doi.org/10.48550/arXiv.1810.04805",
+            "https://doi.org/10.48550/arXiv.2005.14165",
+        ]
+        if args.seeds:
+            with open(args.seeds, encoding="utf-8") as f:
+                dois = list(dict.fromkeys(line.strip() for line in f if line.strip()))
 
-    neo4j_handler.execute_query(
-        "CREATE CONSTRAINT constraint_unique_author_id IF NOT EXISTS FOR (n:Author) REQUIRE n.id IS UNIQUE"
-    )
+        budget = None
+        if args.max_works is not None or args.max_api_calls is not None or args.max_seconds is not None:
+            budget = CrawlBudget(args.max_works, args.max_api_calls, args.max_seconds, args.priority)
+        neo4j_handler.build_graph_from_seeds(dois, depth=args.depth, workers=args.workers, budget=budget)
 
-    neo4j_handler.execute_query(
-        "CREATE CONSTRAINT constraint_unique_institution_id IF NOT EXISTS FOR (n:Institution) REQUIRE n.id IS UNIQUE"
-    )
+    synced_on = OpenAlexFetcher.sync_date(started_on)
+    if synced_on is not None:
+        neo4j_handler.mark_synced(synced_on)
+    else:
+        print("Sync date not updated: the run was offline or some entities could not be fetched")
+    progress.stop()
 
-    dois = [
-        "https://doi.org/10.1007/s11548-019-01929-x",
-        "https://dx.doi.org/10.3748/wjg.v29.i9.1427",
-        "https://doi.org/10.48550/arXiv.1706.03762",
-        "https://doi.org/10.48550/arXiv.1810.04805",
-        "https://doi.org/10.48550/arXiv.2005.14165",
-    ]
+    if args.analytics:
+        print(f"Graph analytics: {GraphAnalytics(neo4j_handler.driver).run()}")
+    if LOCAL_VECTOR_INDEX_DIR:
+        print(f"Local vector index: {LocalVectorIndex(LOCAL_VECTOR_INDEX_DIR, LOCAL_VECTOR_INDEX_DTYPE).refresh(neo4j_handler.driver, rebuild=args.reembed)}")
 
-    for doi in dois:
-        work = Works()[doi]
-        neo4j_handler.build_graph_from_work(work, 1)
+    print(f"Write buffer: {neo4j_handler.buffer_stats()}")
+    OpenAlexFetcher.report_failures()
+    if OpenAlexFetcher.cache is not None:
+        print(f"OpenAlex cache: {OpenAlexFetcher.cache.stats()}")
+    if isinstance(embedder, CachedEmbedder):
+        print(f"Embedding cache: {embedder.cache.stats()}")
+    summary = OpenAlexFetcher.metrics.summary()
+    print(f"Ingestion summary: {json.dumps(summary)}")
+    if args.metrics:
+        with open(args.metrics, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
 
-    neo4j_handler.close()
\ No newline at end of file
+    neo4j_handler.close()
+    seen_ids.close()
\ No newline at end of file
@@ -0,0 +1,277 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+# Upper bounds of the buckets of the per-question latency histogram, in seconds
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class QueryTrace:
+    """
+    Seconds spent in each stage of answering one question, in the order the stages first
+    ran, and counters such as records, nodes, edges and prompt tokens. `path` names how
+    the question was answered: intent, graph, cache or llm.
+
+    `total_seconds` is the wall-clock time from the trace's creation to `finish`, so it
+    includes the time between stages; `stage_seconds` is the sum of the stages.
+    """
+    def __init__(self, question: str = "", clock=time.perf_counter):
+        self.question = question
+        self.path = None
+        self.error = None
+        self.started_at = time.time()
+        self.clock = clock
+        self.start = clock()
+        self.finished_at = None
+        self.stages = {}
+        self.counts = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + self.clock() - start
+
+    def finish(self) -> None:
+        if self.finished_at is None:
+            self.finished_at = self.clock()
+
+    def count(self, name: str, value: int = 1) -> None:
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    @property
+    def total_seconds(self) -> float:
+        end = self.finished_at if self.finished_at is not None else self.clock()
+        return end - self.start
+
+    @property
+    def stage_seconds(self) -> float:
+        return sum(self.stages.values())
+
+    def as_dict(self) -> dict:
+        return {
+            "timestamp": self.started_at,
+            "question": self.question,
+            "path": self.path,
+            "error": self.error,
+            "total_seconds": self.total_seconds,
+            "stage_seconds": self.stage_seconds,
+            "stages": dict(self.stages),
+            "counts": dict(self.counts),
+        }
+
+
+class QueryMetrics:
+    """
+    Process-wide sink for finished traces. A path ending in `.prom` is rewritten after each
+    question with this process's running totals in the Prometheus text format, for the
+    node_exporter textfile collector; any other path gets each trace appended as a line of JSON.
+    """
+    def __init__(self, path: str, prefix: str = "paper_chain_query"):
+        self.path = path
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.questions = Counter()
+        self.errors = 0
+        self.stage_seconds = Counter()
+        self.stage_runs = Counter()
+        self.counts = Counter()
+        self.latency_buckets = Counter()
+        self.latency_sum = 0.0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    def record(self, trace: QueryTrace) -> None:
+        trace.finish()
+        with self.lock:
+            self.questions[trace.path or "none"] += 1
+            self.errors += trace.error is not None
+            for name, seconds in trace.stages.items():
+                self.stage_seconds[name] += seconds
+                self.stage_runs[name] += 1
+            self.counts.update(trace.counts)
+            total = trace.total_seconds
+            self.latency_sum += total
+            for bound in LATENCY_BUCKETS:
+                self.latency_buckets[bound] += total <= bound
+            if self.path.endswith(".prom"):
+                with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                    f.write(self.prometheus_text())
+                os.replace(self.path + ".tmp", self.path)
+            else:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(trace.as_dict(), ensure_ascii=False) + "\n")
+
+    def prometheus_text(self) -> str:
+        p = self.prefix
+        lines = [f"# HELP {p}_questions_total Questions answered, by how they were answered.", f"# TYPE {p}_questions_total counter"]
+        lines += [f'{p}_questions_total{{path="{path}"}} {n}' for path, n in sorted(self.questions.items())]
+        lines += [f"# HELP {p}_errors_total Questions that failed.", f"# TYPE {p}_errors_total counter", f"{p}_errors_total {self.errors}"]
+        lines += [f"# HELP {p}_stage_seconds Time spent in each stage of answering a question.", f"# TYPE {p}_stage_seconds summary"]
+        for name in sorted(self.stage_seconds):
+            lines.append(f'{p}_stage_seconds_sum{{stage="{name}"}} {self.stage_seconds[name]:.6f}')
+            lines.append(f'{p}_stage_seconds_count{{stage="{name}"}} {self.stage_runs[name]}')
+        lines += [f"# HELP {p}_seconds Wall-clock time to answer a question.", f"# TYPE {p}_seconds histogram"]
+        lines += [f'{p}_seconds_bucket{{le="{bound}"}} {self.latency_buckets[bound]}' for bound in LATENCY_BUCKETS]
+        lines += [f'{p}_seconds_bucket{{le="+Inf"}} {sum(self.questions.values())}', f"{p}_seconds_sum {self.latency_sum:.6f}", f"{p}_seconds_count {sum(self.questions.values())}"]
+        for name in sorted(self.counts):
+            lines += [f"# TYPE {p}_{name}_total counter", f"{p}_{name}_total {self.counts[name]}"]
+        return "\n".join(lines) + "\n"
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds // 60 % 60:02d}m"
+    return f"{seconds // 60}m{seconds % 60:02d}s"
+
+
+class IngestMetrics:
+    """
+    Counters and busy time of an ingestion run, shared by the OpenAlex fetcher and the Neo4j
+    writer across crawl threads: OpenAlex requests, bytes and rate-limit waits, embedding
+    requests, buffered rows, flushes and their transaction time.
+
+    Breadth-first crawls also report each depth level: the works planned and fetched, the
+    entities fetched per second and the time left. Fetches are counted towards the level
+    their thread last started, so a level spans all the seeds crawling it at once.
+    """
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.started_at = clock()
+        self.counts = Counter()
+        self.seconds = Counter()
+        self.max_seconds = Counter()
+        self.levels = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def count(self, name: str, value: int = 1) -> None:
+        with self.lock:
+            self.counts[name] += value
+
+    @contextmanager
+    def timed(self, name: str):
+        start = self.clock()
+        try:
+            yield
+        finally:
+            elapsed = self.clock() - start
+            with self.lock:
+                self.seconds[name] += elapsed
+                self.max_seconds[name] = max(self.max_seconds[name], elapsed)
+
+    def start_level(self, depth: int, planned: int) -> None:
+        with self.lock:
+            level = self.levels.setdefault(depth, {"planned": 0, "works": 0, "entities": 0, "active": 0, "started_at": self.clock(), "finished_at": None})
+            level["planned"] += planned
+            level["active"] += 1
+        self.local.depth = depth
+
+    def end_level(self) -> None:
+        depth = self.current_depth()
+        if depth is None:
+            return
+        with self.lock:
+            level = self.levels[depth]
+            level["active"] -= 1
+            level["finished_at"] = self.clock()
+        self.local.depth = None
+
+    def current_depth(self) -> int | None:
+        return getattr(self.local, "depth", None)
+
+    def fetched(self, entity_type: str, n: int, cached: bool = False, depth: int = None) -> None:
+        """
+        Counts `n` entities fetched, or served from the cache, towards `depth`, by default
+        the level this thread last started.
+        """
+        if depth is None:
+            depth = self.current_depth()
+        with self.lock:
+            self.counts[f"{entity_type}_{'cached' if cached else 'fetched'}"] += n
+            if depth is not None:
+                self.levels[depth]["entities"] += n
+                if entity_type == "works":
+                    self.levels[depth]["works"] += n
+
+    def level_report(self, depth: int) -> dict:
+        level = self.levels[depth]
+        end = self.clock() if level["active"] or level["finished_at"] is None else level["finished_at"]
+        seconds = end - level["started_at"]
+        works_per_second = level["works"] / seconds if seconds > 0 else 0.0
+        remaining = max(level["planned"] - level["works"], 0)
+        return {
+            "planned_works": level["planned"],
+            "works": level["works"],
+            "entities": level["entities"],
+            "seconds": round(seconds, 3),
+            "entities_per_second": round(level["entities"] / seconds, 2) if seconds > 0 else 0.0,
+            "eta_seconds": round(remaining / works_per_second, 1) if level["active"] and works_per_second > 0 else None,
+        }
+
+    def bound_by(self) -> str | None:
+        """
+        Stage with the most busy time summed over threads: OpenAlex requests, waits for the
+        OpenAlex rate limit, embedding requests or Neo4j write transactions.
+        """
+        busy = {"openalex": self.seconds["openalex"], "openalex_rate_limit": self.seconds["openalex_wait"], "embedding": self.seconds["embedding"], "neo4j": self.seconds["flush"]}
+        stage = max(busy, key=busy.get)
+        return stage if busy[stage] > 0 else None
+
+    def progress_line(self) -> str:
+        with self.lock:
+            parts = [format_duration(self.clock() - self.started_at)]
+            for depth in sorted(depth for depth, level in self.levels.items() if level["active"]):
+                report = self.level_report(depth)
+                eta = format_duration(report["eta_seconds"]) if report["eta_seconds"] is not None else "?"
+                parts.append(f"depth {depth}: {report['works']}/{report['planned_works']} works, {report['entities_per_second']:.1f} entities/s, ETA {eta}")
+            parts.append(f"OpenAlex {self.counts['openalex_requests']} requests, {self.counts['openalex_bytes'] / 2**20:.1f} MiB")
+            parts.append(f"embeddings {self.counts['embedding_requests']} requests")
+            parts.append(f"{self.counts['buffered_rows']} rows buffered, {self.counts['flushes']} flushes in {self.seconds['flush']:.1f}s")
+            return " | ".join(parts)
+
+    def summary(self) -> dict:
+        with self.lock:
+            return {
+                "seconds": round(self.clock() - self.started_at, 3),
+                "bound_by": self.bound_by(),
+                "counts": dict(sorted(self.counts.items())),
+                "busy_seconds": {name: round(seconds, 3) for name, seconds in sorted(self.seconds.items())},
+                "max_seconds": {name: round(seconds, 3) for name, seconds in sorted(self.max_seconds.items())},
+                "levels": {str(depth): self.level_report(depth) for depth in sorted(self.levels)},
+            }
+
+
+class ProgressReporter:
+    """
+    Prints `metrics.progress_line()` every `interval` seconds from a background thread
+    between `start` and `stop`. An interval of 0 prints nothing.
+    """
+    def __init__(self, metrics: IngestMetrics, interval: float = 10.0, file=None):
+        self.metrics = metrics
+        self.interval = interval
+        self.file = file
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self) -> "ProgressReporter":
+        if self.interval > 0:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+        return self
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            print(self.metrics.progress_line(), file=self.file or sys.stdout, flush=True)
+
+    def stop(self) -> None:
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
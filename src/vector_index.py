@@ -0,0 +1,199 @@
+import json
+import os
+import threading
+import time
+from typing import NamedTuple
+import numpy as np
+
+DTYPES = ("float32", "int8")
+EXPORT_QUERY = (
+    "UNWIND $ids AS id MATCH (w:Work {id: id}) "
+    "RETURN w.id AS id, w.title AS title, w.title_hash AS title_hash, w.vectorProperty AS vector"
+)
+DIMENSIONS_QUERY = "MATCH (w:Work) WHERE w.vectorProperty IS NOT NULL RETURN size(w.vectorProperty) AS dimensions LIMIT 1"
+
+
+class IndexState(NamedTuple):
+    ids: list
+    titles: list
+    title_hashes: list
+    matrix: np.ndarray
+    scales: np.ndarray | None
+
+
+def unit_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def quantize(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Symmetric int8 quantization with one scale per row.
+    """
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    return np.round(vectors / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+class LocalVectorIndex:
+    """
+    Copy of the Work title vectors in a directory: unit vectors in a memory-mapped `.npy`
+    matrix, float32 or int8 with per-row scales, and `works.json` with the ID, title and
+    title hash of every row. Searches are exact top-k by cosine similarity, computed over
+    blocks of `block_rows` rows for a whole batch of queries at once.
+
+    `refresh` rewrites the files under a new generation and swaps `works.json` last, so
+    that processes reading the index, each with its own read-only mmap of the same files,
+    pick up the new generation with `reload_if_changed`.
+    """
+    def __init__(self, path: str, dtype: str = "float32", block_rows: int = 1024):
+        if dtype not in DTYPES:
+            raise ValueError(f"dtype must be one of {', '.join(DTYPES)}")
+        self.path = path
+        self.dtype = dtype
+        self.block_rows = block_rows
+        self.state = IndexState([], [], [], np.empty((0, 0), dtype=np.float32), None)
+        self.version = None
+        self.lock = threading.Lock()
+        self.reload_if_changed()
+
+    def __len__(self) -> int:
+        return len(self.state.ids)
+
+    def file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def reload_if_changed(self) -> bool:
+        try:
+            stat = os.stat(self.file("works.json"))
+            # `refresh` replaces the file, so a new generation also has a new inode
+            version = (stat.st_ino, stat.st_mtime_ns)
+        except FileNotFoundError:
+            return False
+        with self.lock:
+            if version == self.version:
+                return False
+            with open(self.file("works.json"), encoding="utf-8") as f:
+                table = json.load(f)
+            # Works deleted while the index was written leave unused rows at the end
+            rows = len(table["ids"])
+            matrix = np.load(self.file(table["vectors"]), mmap_mode="r")[:rows]
+            scales = np.load(self.file(table["scales"]), mmap_mode="r")[:rows] if table["scales"] else None
+            self.state = IndexState(table["ids"], table["titles"], table["title_hashes"], matrix, scales)
+            self.version = version
+        return True
+
+    def search(self, vectors, k: int = 3) -> list[list[tuple[str, str, float]]]:
+        """
+        For each query vector, the `k` most similar works as (ID, title, cosine similarity).
+        """
+        state = self.state
+        queries = unit_rows(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+        n = len(state.ids)
+        k = min(k, n)
+        if k == 0:
+            return [[] for _ in queries]
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        # int8 blocks are widened into one reused, cache-sized buffer
+        buffer = np.empty((self.block_rows, state.matrix.shape[1]), dtype=np.float32) if state.scales is not None else None
+        for start in range(0, n, self.block_rows):
+            block = state.matrix[start:start + self.block_rows]
+            if buffer is not None:
+                np.copyto(buffer[:len(block)], block, casting="unsafe")
+                block = buffer[:len(block)]
+            scores = queries @ block.T
+            if state.scales is not None:
+                scores *= state.scales[start:start + self.block_rows]
+            # Keep the running top-k: this block's candidates merged with the best so far
+            rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, start + len(block)), scores.shape)], axis=1)
+            scores = np.concatenate([best_scores, scores], axis=1)
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            best_rows = np.take_along_axis(rows, top, axis=1)
+            best_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-best_scores, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        return [
+            [(state.ids[row], state.titles[row], float(score)) for row, score in zip(rows, scores)]
+            for rows, scores in zip(best_rows, best_scores)
+        ]
+
+    def refresh(self, driver, batch_size: int = 1000, rebuild: bool = False) -> dict:
+        """
+        Brings the index up to date with the Work vectors in Neo4j. Rows whose title hash is
+        unchanged are copied over; only new or retitled works are read from the database,
+        `batch_size` at a time, and written straight into the new matrix. Every work is read
+        again with `rebuild`, or when the vectors in Neo4j have other dimensions than the index.
+        """
+        records, _, _ = driver.execute_query(
+            "MATCH (w:Work) WHERE w.vectorProperty IS NOT NULL RETURN w.id AS id, w.title_hash AS title_hash",
+            routing_="r",
+        )
+        current = {record["id"]: record["title_hash"] for record in records}
+        state = self.state
+        sizes, _, _ = driver.execute_query(DIMENSIONS_QUERY, routing_="r")
+        dimensions = sizes[0]["dimensions"] if sizes else state.matrix.shape[1]
+        reusable = not rebuild and ("int8" if state.scales is not None else "float32") == self.dtype and state.matrix.shape[1] == dimensions
+        kept = [row for row, (work_id, title_hash) in enumerate(zip(state.ids, state.title_hashes)) if reusable and current.get(work_id) == title_hash]
+        kept_ids = {state.ids[row] for row in kept}
+        missing = [work_id for work_id in current if work_id not in kept_ids]
+        os.makedirs(self.path, exist_ok=True)
+        generation = time.time_ns()
+        vectors_name = f"vectors-{generation}.npy"
+        scales_name = f"scales-{generation}.npy" if self.dtype == "int8" else None
+        rows = len(kept) + len(missing)
+        matrix = np.lib.format.open_memmap(self.file(vectors_name), mode="w+", dtype=self.dtype, shape=(rows, dimensions))
+        scales = np.lib.format.open_memmap(self.file(scales_name), mode="w+", dtype=np.float32, shape=(rows,)) if scales_name else None
+        for start in range(0, len(kept), self.block_rows):
+            block = kept[start:start + self.block_rows]
+            matrix[start:start + len(block)] = state.matrix[block]
+            if scales is not None:
+                scales[start:start + len(block)] = state.scales[block]
+        table = {
+            "vectors": vectors_name,
+            "scales": scales_name,
+            "ids": [state.ids[row] for row in kept],
+            "titles": [state.titles[row] for row in kept],
+            "title_hashes": [state.title_hashes[row] for row in kept],
+        }
+        for i in range(0, len(missing), batch_size):
+            records = self.export(driver, missing[i:i + batch_size])
+            if not records:
+                continue
+            start = len(table["ids"])
+            vectors = unit_rows(np.array([record["vector"] for record in records], dtype=np.float32))
+            if scales is not None:
+                vectors, scales[start:start + len(records)] = quantize(vectors)
+            matrix[start:start + len(records)] = vectors
+            for record in records:
+                table["ids"].append(record["id"])
+                table["titles"].append(record["title"])
+                table["title_hashes"].append(record["title_hash"])
+        matrix.flush()
+        if scales is not None:
+            scales.flush()
+        del matrix, scales
+
+        with open(self.file("works.json.tmp"), "w", encoding="utf-8") as f:
+            json.dump(table, f, ensure_ascii=False)
+        os.replace(self.file("works.json.tmp"), self.file("works.json"))
+        self.reload_if_changed()
+        self.remove_old_generations(vectors_name, scales_name)
+        return {"kept": len(kept), "exported": len(table["ids"]) - len(kept), "removed": len(state.ids) - len(kept)}
+
+    @staticmethod
+    def export(driver, ids: list[str]) -> list:
+        if not ids:
+            return []
+        records, _, _ = driver.execute_query(EXPORT_QUERY, parameters_={"ids": ids}, routing_="r")
+        return records
+
+    def remove_old_generations(self, *current: str) -> None:
+        for name in os.listdir(self.path):
+            if name.endswith(".npy") and name not in current:
+                try:
+                    os.remove(self.file(name))
+                except OSError:
+                    # Still mapped by a reader on a platform that does not allow removing it
+                    pass
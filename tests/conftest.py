@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The application modules import each other by their bare names, the way they
+# run under `streamlit run src/app.py` and `python src/setup_database.py`.
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
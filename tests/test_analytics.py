@@ -0,0 +1,59 @@
+from unittest.mock import MagicMock
+import numpy as np
+import pytest
+from src.analytics import AUTHOR_SCORES_QUERY, WORK_SCORES_QUERY, GraphAnalytics, citation_counts, coauthor_counts, pagerank
+
+
+def test_citation_counts():
+    assert citation_counts(4, np.array([1, 1, 2])).tolist() == [0, 2, 1, 0]
+
+
+def test_pagerank_matches_dense_power_iteration():
+    sources = np.array([0, 0, 1, 2, 3, 3])
+    targets = np.array([1, 2, 2, 0, 2, 1])
+    n, damping = 5, 0.85
+    # Column-stochastic matrix with the dangling node 4 linking everywhere
+    matrix = np.zeros((n, n))
+    for s, t in zip(sources, targets):
+        matrix[t, s] += 1 / np.sum(sources == s)
+    matrix[:, 4] = 1 / n
+    expected = np.full(n, 1 / n)
+    for _ in range(200):
+        expected = (1 - damping) / n + damping * matrix @ expected
+
+    rank = pagerank(n, sources, targets, damping)
+
+    assert rank == pytest.approx(expected, abs=1e-8)
+    assert rank.sum() == pytest.approx(1.0)
+    assert int(np.argmax(rank)) == 2
+
+
+def test_coauthor_counts():
+    # Work 0: authors 0, 1, 2; work 1: authors 0, 1 again; work 2: author 3 alone
+    authors = np.array([0, 1, 2, 0, 1, 3])
+    works = np.array([0, 0, 0, 1, 1, 2])
+
+    assert coauthor_counts(5, authors, works).tolist() == [2, 2, 2, 0, 0]
+    assert coauthor_counts(5, authors, works, max_authors_per_work=2).tolist() == [1, 1, 0, 0, 0]
+
+
+def test_run_writes_scores_in_bulk():
+    driver = MagicMock()
+    session = driver.session.return_value.__enter__.return_value
+    references, authorships = MagicMock(), MagicMock()
+    references.values.return_value = [["W1", "W2"], ["W3", "W2"], ["W3", "Wunknown"]]
+    authorships.values.return_value = [["A1", "W1"], ["A2", "W1"], ["A1", "W3"]]
+    session.run.side_effect = [[{"id": "W1"}, {"id": "W2"}, {"id": "W3"}], [{"id": "A1"}, {"id": "A2"}], references, authorships]
+
+    summary = GraphAnalytics(driver, rows_per_statement=2).run()
+
+    assert (summary["works"], summary["authors"], summary["references"]) == (3, 2, 2)
+    calls = driver.execute_query.call_args_list
+    assert [call.args[0] for call in calls] == [WORK_SCORES_QUERY, WORK_SCORES_QUERY, AUTHOR_SCORES_QUERY]
+    work_rows = calls[0].kwargs["parameters_"]["rows"] + calls[1].kwargs["parameters_"]["rows"]
+    assert [row["citation_count"] for row in work_rows] == [0, 2, 0]
+    assert max(work_rows, key=lambda row: row["pagerank"])["id"] == "W2"
+    assert calls[2].kwargs["parameters_"]["rows"] == [
+        {"id": "A1", "work_count": 2, "coauthor_count": 1},
+        {"id": "A2", "work_count": 1, "coauthor_count": 1},
+    ]
@@ -0,0 +1,73 @@
+import json
+from src.checkpoint import CrawlCheckpoint, SeenIdStore
+
+
+def test_seen_id_store_persists_committed_ids(tmp_path):
+    path = str(tmp_path / "seen_ids.sqlite3")
+    store = SeenIdStore(path)
+    store.add("W1")
+    store.commit()
+    store.add("W2")
+    assert "W2" in store
+    store.close()
+
+    reopened = SeenIdStore(path)
+    assert "W1" in reopened
+    assert "W2" not in reopened
+    assert len(reopened) == 1
+
+
+def test_seen_id_store_clear(tmp_path):
+    path = str(tmp_path / "seen_ids.sqlite3")
+    store = SeenIdStore(path)
+    store.add("A1")
+    store.commit()
+    store.clear()
+
+    assert "A1" not in store
+    assert len(SeenIdStore(path)) == 0
+
+
+def test_seen_id_store_in_memory():
+    store = SeenIdStore()
+    store.add("I1")
+    store.commit()
+    assert "I1" in store
+
+
+def test_crawl_checkpoint_round_trip(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    checkpoint = CrawlCheckpoint(path)
+    checkpoint.complete_seed("W1")
+    checkpoint.save_level("W2", 1, ["W3", "W4"], {"W2", "W3", "W4"})
+
+    reopened = CrawlCheckpoint(path)
+    assert reopened.is_completed("W1")
+    assert not reopened.is_completed("W2")
+    assert reopened.level_state("W2") == {"seed": "W2", "depth": 1, "frontier": ["W3", "W4"], "seen_works": ["W2", "W3", "W4"]}
+    assert reopened.level_state("W1") is None
+
+    reopened.reset()
+    assert CrawlCheckpoint(path).completed_seeds == []
+
+
+def test_crawl_checkpoint_appends_and_compacts(tmp_path):
+    path = tmp_path / "checkpoint.json"
+    checkpoint = CrawlCheckpoint(str(path))
+    checkpoint.save_level("W1", 1, ["W2"], {"W1", "W2"})
+    checkpoint.save_level("W1", 2, ["W3"], {"W1", "W2", "W3"})
+    checkpoint.complete_seed("W1")
+    checkpoint.save_level("W4", 1, ["W5"], {"W4", "W5"})
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 4
+    # The second level appends only the work it saw first
+    assert json.loads(path.read_text(encoding="utf-8").splitlines()[1])["level"]["new_seen_works"] == ["W3"]
+
+    # A line torn by a crash while appending it is ignored
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"completed": "W')
+    reopened = CrawlCheckpoint(str(path))
+    assert reopened.completed_seeds == ["W1"]
+    assert reopened.level_state("W1") is None
+    assert reopened.level_state("W4")["frontier"] == ["W5"]
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 1
+
@@ -0,0 +1,101 @@
+from unittest.mock import MagicMock
+from src.embedding import BatchEmbedder, CachedEmbedder, EmbeddingCache, OpenAIBatchEmbeddings
+
+
+class FakeEmbedder:
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text))] for text in texts]
+
+
+class QueryOnlyEmbedder:
+    def __init__(self):
+        self.calls = 0
+
+    def embed_query(self, text):
+        self.calls += 1
+        return [float(len(text))]
+
+
+def test_batch_embedder_batches_and_deduplicates():
+    embedder = FakeEmbedder()
+    batch_embedder = BatchEmbedder(embedder, batch_size=2, max_in_flight=2)
+
+    vectors = batch_embedder.embed(["a", "bb", "a", "ccc", "dddd"])
+
+    assert vectors == [[1.0], [2.0], [1.0], [3.0], [4.0]]
+    assert sorted(embedder.calls) == [["a", "bb"], ["ccc", "dddd"]]
+    assert batch_embedder.requests == 2
+    assert batch_embedder.texts == 4
+
+
+def test_batch_embedder_falls_back_to_embed_query():
+    embedder = QueryOnlyEmbedder()
+    batch_embedder = BatchEmbedder(embedder, batch_size=10)
+
+    assert batch_embedder.embed(["a", "bb"]) == [[1.0], [2.0]]
+    assert embedder.calls == 2
+    assert batch_embedder.requests == 2
+
+
+def test_batch_embedder_empty():
+    assert BatchEmbedder(FakeEmbedder()).embed([]) == []
+
+
+def test_embedding_cache_round_trip(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"), "test-model")
+    cache.put("Attention Is All You Need", [0.5, 0.25])
+
+    assert cache.get("  Attention   Is All You Need ") == [0.5, 0.25]
+    assert cache.get("attention is all you need") is None
+    assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+
+def test_embedding_cache_keys_on_model_and_dimensions(tmp_path):
+    path = str(tmp_path / "embeddings.sqlite3")
+    EmbeddingCache(path, "test-model", dimensions=2).put("text", [1.0, 2.0])
+
+    assert EmbeddingCache(path, "test-model", dimensions=2).get("text") == [1.0, 2.0]
+    assert EmbeddingCache(path, "test-model", dimensions=4).get("text") is None
+    assert EmbeddingCache(path, "other-model", dimensions=2).get("text") is None
+
+
+def test_embedding_cache_evicts_least_recently_used(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "embeddings.sqlite3"), "test-model", max_entries=2)
+    cache.put("a", [1.0])
+    cache.put("b", [2.0])
+    cache.get("a")
+    cache.put("c", [3.0])
+
+    assert cache.get("a") == [1.0]
+    assert cache.get("b") is None
+    assert cache.get("c") == [3.0]
+
+
+def test_cached_embedder_only_embeds_misses(tmp_path):
+    embedder = FakeEmbedder()
+    cached = CachedEmbedder(embedder, EmbeddingCache(str(tmp_path / "embeddings.sqlite3"), "test-model"))
+
+    assert cached.embed_documents(["a", "bb"]) == [[1.0], [2.0]]
+    assert cached.embed_documents(["bb", "ccc", "ccc"]) == [[2.0], [3.0], [3.0]]
+    assert cached.embed_query("a") == [1.0]
+
+    assert embedder.calls == [["a", "bb"], ["ccc"]]
+    assert cached.cache.hits == 2
+    assert cached.cache.misses == 4
+
+
+def test_openai_batch_embeddings_only_requests_shortened_dimensions():
+    full = OpenAIBatchEmbeddings(model="text-embedding-3-small", dimensions=1536, api_key="x")
+    short = OpenAIBatchEmbeddings(model="text-embedding-3-small", dimensions=512, api_key="x")
+    for embedder in (full, short):
+        embedder.client = MagicMock()
+        embedder.client.embeddings.create.return_value.data = []
+        embedder.embed_documents(["a"])
+
+    assert full.dimensions is None
+    assert "dimensions" not in full.client.embeddings.create.call_args.kwargs
+    assert short.client.embeddings.create.call_args.kwargs["dimensions"] == 512
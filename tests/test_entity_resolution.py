@@ -0,0 +1,49 @@
+from unittest.mock import MagicMock
+from src.entity_resolution import EntityResolver, WORK_TITLE_INDEX, fulltext_query, normalize_name, quoted_mentions
+
+
+def test_normalize_name():
+    assert normalize_name("  Attention  Is All\tYou Need ") == "attention is all you need"
+    assert normalize_name("ＢＥＲＴ") == "bert"
+    assert normalize_name(None) is None
+
+
+def test_fulltext_query_allows_typos_in_long_words():
+    assert fulltext_query("Attention is all you need") == "attention~1 AND is AND all AND you AND need"
+    assert fulltext_query("肝臓 segmentation") == '"肝臓" AND segmentation~1'
+    assert fulltext_query("?!") == ""
+
+
+def test_quoted_mentions():
+    assert quoted_mentions('How is "Attention" connected to 「BERT」?') == ["Attention", "BERT"]
+    assert quoted_mentions("who wrote BERT?") == []
+
+
+def test_exact_match_skips_fulltext_search():
+    driver = MagicMock()
+    driver.execute_query.return_value = ([{"id": "W1"}], None, None)
+
+    assert EntityResolver(driver).resolve_works("Attention Is All You Need") == ["W1"]
+    driver.execute_query.assert_called_once()
+    assert driver.execute_query.call_args.kwargs["parameters_"]["text"] == "attention is all you need"
+
+
+def test_fulltext_fallback_drops_weak_matches():
+    driver = MagicMock()
+    driver.execute_query.side_effect = [
+        ([], None, None),
+        ([{"id": "W1", "score": 4.0}, {"id": "W2", "score": 2.5}, {"id": "W3", "score": 1.0}], None, None),
+    ]
+
+    assert EntityResolver(driver).resolve_works("Atention is all you need") == ["W1", "W2"]
+    parameters = driver.execute_query.call_args.kwargs["parameters_"]
+    assert parameters["index"] == WORK_TITLE_INDEX
+    assert parameters["query"] == "atention~1 AND is AND all AND you AND need"
+
+
+def test_resolve_mentions_names_id_parameters():
+    driver = MagicMock()
+    driver.execute_query.return_value = ([{"id": "X1"}], None, None)
+
+    assert EntityResolver(driver).resolve_mentions({"author": "Koyo", "title": "BERT"}) == {"author_ids": ["X1"], "title_ids": ["X1"]}
+    assert "MATCH (n:Author)" in driver.execute_query.call_args_list[0].args[0]
@@ -0,0 +1,93 @@
+from unittest.mock import MagicMock
+import pytest
+from src.graph import GraphSnapshot
+
+
+def snapshot():
+    #   A1 -AUTHORED-> W1 -REFERENCED-> W2 -REFERENCED-> W4
+    #                   \-REFERENCED-> W3 -REFERENCED-/
+    #   W5 is isolated; A1 -AFFILIATED_WITH-> I1
+    ids = ["W1", "W2", "W3", "W4", "W5", "A1", "I1"]
+    labels = [0, 0, 0, 0, 0, 1, 2]
+    edges = [(5, 0), (0, 1), (0, 2), (1, 3), (2, 3), (5, 6), (0, 1)]
+    return GraphSnapshot.from_edges(ids, labels, [s for s, _ in edges], [t for _, t in edges])
+
+
+def test_csr_is_undirected_and_deduplicated():
+    graph = snapshot()
+
+    assert graph.indptr.dtype.name == "int32" and graph.indices.dtype.name == "int32"
+    assert graph.edge_count == 6
+    assert sorted(graph.neighbor_ids("W1")) == ["A1", "W2", "W3"]
+    assert graph.neighbor_ids("W4") == ["W2", "W3"]
+    assert graph.neighbor_ids("W5") == []
+
+
+def test_shortest_paths_in_both_directions():
+    graph = snapshot()
+
+    assert graph.shortest_paths(["W1"], ["W4"], k=5) == [["W1", "W2", "W4"], ["W1", "W3", "W4"]]
+    assert graph.shortest_paths(["W4"], ["I1"]) == [["W4", "W2", "W1", "A1", "I1"]]
+    assert graph.shortest_paths(["W2"], ["W2"]) == [["W2"]]
+
+
+def test_equal_length_paths_through_higher_scored_works_first():
+    graph = snapshot()
+    graph.scores[2] = 0.9
+
+    assert graph.shortest_paths(["W1"], ["W4"], k=5) == [["W1", "W3", "W4"], ["W1", "W2", "W4"]]
+
+
+def test_no_path_or_too_many_hops():
+    graph = snapshot()
+
+    assert graph.shortest_paths(["W1"], ["W5"]) == []
+    assert graph.shortest_paths(["W1"], ["Wmissing"]) == []
+    assert graph.shortest_paths(["W4"], ["I1"], max_hops=3) == []
+    assert graph.shortest_paths(["W4"], ["I1"], max_hops=4) != []
+
+
+def test_shortest_paths_from_several_sources():
+    assert snapshot().shortest_paths(["W5", "W3", "A1"], ["W4"], k=3) == [["W3", "W4"]]
+
+
+def test_author_paths_start_at_the_author():
+    assert snapshot().author_paths(["A1"], ["W1"], ["W4"], k=5) == [["A1", "W1", "W2", "W4"], ["A1", "W1", "W3", "W4"]]
+    assert snapshot().author_paths(["A1"], ["W2"], ["W4"]) == []
+
+
+def test_author_paths_go_through_the_mentioned_work():
+    #   W1 <-AUTHORED- A1 -AUTHORED-> W3 -REFERENCED-> W2
+    #   W1 -REFERENCED-> W4 -REFERENCED-> W5 -REFERENCED-> W2
+    graph = GraphSnapshot.from_edges(["W1", "W2", "W3", "A1", "W4", "W5"], [0, 0, 0, 1, 0, 0], [3, 3, 2, 0, 4, 5], [0, 2, 1, 4, 5, 1])
+
+    paths = graph.author_paths(["A1"], ["W1"], ["W2"], k=5)
+    assert paths == [["A1", "W1", "W4", "W5", "W2"]]
+    assert all(path[:2] == ["A1", "W1"] for path in paths)
+    assert graph.author_paths(["A1"], ["W1"], ["W2"], max_hops=2) == []
+
+
+def test_path_query_anchors_on_labelled_ids():
+    cypher, parameters = snapshot().path_query([["A1", "W1"], ["W1", "W2"]])
+
+    assert cypher == (
+        "MATCH p = (:Author {id: $path0[0]})-[]-(:Work {id: $path0[1]}) RETURN p LIMIT 1 UNION ALL "
+        "MATCH p = (:Work {id: $path1[0]})-[]-(:Work {id: $path1[1]}) RETURN p LIMIT 1"
+    )
+    assert parameters == {"path0": ["A1", "W1"], "path1": ["W1", "W2"]}
+
+
+def test_load_from_neo4j():
+    driver = MagicMock()
+    session = driver.session.return_value.__enter__.return_value
+    relationships = MagicMock()
+    relationships.values.return_value = [["A1", "W1"], ["W1", "W2"], ["W1", "Wunknown"]]
+    session.run.side_effect = [[{"id": "W1", "score": 0.4}, {"id": "W2", "score": 0.6}], [{"id": "A1", "score": None}], [], relationships]
+
+    graph = GraphSnapshot.load(driver)
+
+    assert graph.ids == ["W1", "W2", "A1"]
+    assert list(graph.labels) == [0, 0, 1]
+    assert graph.edge_count == 2
+    assert graph.scores.tolist() == pytest.approx([0.4, 0.6, 0.0])
+    assert graph.shortest_paths(["A1"], ["W2"]) == [["A1", "W1", "W2"]]
@@ -0,0 +1,91 @@
+import csv
+import gzip
+import json
+import os
+from unittest.mock import MagicMock
+import pytest
+from src.embedding import text_hash
+from src.ingest_snapshot import CsvSink, filter_concept, ingest_snapshot, read_records
+
+
+def write_part(path, records):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with gzip.open(path, "wt", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+@pytest.fixture
+def synthetic_snapshot(tmp_path):
+    """
+    A snapshot with 2,000 works split over two parts, 200 authors and 20 institutions.
+    Even works are tagged with concept C1 and odd works with C2.
+    """
+    works = [
+        {
+            "id": f"https://openalex.org/W{i}",
+            "title": f"Work {i}",
+            "concepts": [{"id": f"https://openalex.org/C{1 + i % 2}"}],
+            "authorships": [{"author": {"id": f"https://openalex.org/A{i % 200}"}}],
+            "referenced_works": [f"https://openalex.org/W{j}" for j in range(max(0, i - 3), i)],
+        }
+        for i in range(2000)
+    ]
+    authors = [
+        {"id": f"https://openalex.org/A{i}", "display_name": f"Author {i}", "affiliations": [{"institution": {"id": f"https://openalex.org/I{i % 20}"}}]}
+        for i in range(200)
+    ]
+    institutions = [{"id": f"https://openalex.org/I{i}", "display_name": f"Institution {i}"} for i in range(20)]
+    write_part(str(tmp_path / "works" / "updated_date=2024-01-01" / "part_000.gz"), works[:1000])
+    write_part(str(tmp_path / "works" / "updated_date=2024-01-02" / "part_000.gz"), works[1000:])
+    write_part(str(tmp_path / "authors" / "updated_date=2024-01-01" / "part_000.gz"), authors)
+    write_part(str(tmp_path / "institutions" / "updated_date=2024-01-01" / "part_000.gz"), institutions)
+    return tmp_path
+
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+def test_read_records_streams_lines(synthetic_snapshot):
+    records = read_records([str(synthetic_snapshot / "institutions" / "updated_date=2024-01-01" / "part_000.gz")])
+    assert next(records)["display_name"] == "Institution 0"
+    assert len(list(records)) == 19
+
+
+def test_filter_concept():
+    works = [{"id": "W1", "concepts": [{"id": "https://openalex.org/C1"}]}, {"id": "W2", "concepts": []}]
+    assert [work["id"] for work in filter_concept(works, "C1")] == ["W1"]
+    assert len(list(filter_concept(works, None))) == 2
+
+
+def test_ingest_snapshot_to_csv(synthetic_snapshot, tmp_path):
+    output_dir = str(tmp_path / "import")
+    sink = CsvSink(output_dir)
+    summary = ingest_snapshot(str(synthetic_snapshot), sink)
+    sink.close()
+
+    assert summary["works"] == 2000
+    assert summary["authors"] == 200
+    assert summary["institutions"] == 20
+    works = read_csv(os.path.join(output_dir, "works.csv"))
+    assert works[0] == ["id:ID(Work)", "title", "title_normalized", "vectorProperty:float[]", "title_hash", "updated_date"]
+    assert works[1] == ["W0", "Work 0", "work 0", "", text_hash("Work 0"), ""]
+    assert len(read_csv(os.path.join(output_dir, "referenced.csv"))) == 1 + 3 * 2000 - 6
+    assert len(read_csv(os.path.join(output_dir, "authored.csv"))) == 1 + 2000
+    assert len(read_csv(os.path.join(output_dir, "affiliated_with.csv"))) == 1 + 200
+
+
+def test_ingest_snapshot_filters(synthetic_snapshot):
+    handler = MagicMock()
+
+    summary = ingest_snapshot(str(synthetic_snapshot), handler, work_ids={"W10", "W11", "W12"}, concept_id="C1")
+
+    assert [call.args[0]["id"] for call in handler.add_work.call_args_list] == ["https://openalex.org/W10", "https://openalex.org/W12"]
+    assert summary["authors"] == 2
+    assert summary["institutions"] == 2
+    assert [(call.args[0]["id"], call.args[1]["id"]) for call in handler.add_referenced.call_args_list] == [
+        ("https://openalex.org/W12", "https://openalex.org/W10"),
+    ]
+    handler.flush.assert_called_once()
@@ -0,0 +1,44 @@
+from src.config import EXAMPLES
+from src.intent import AUTHORS_OF_WORK_QUERY, CONNECTION_QUERY, IntentParser
+
+
+def example_questions():
+    return [example.split("USER INPUT: ")[1].split(" QUERY:")[0].split(" VECTOR SEARCH RESULTS:")[0] for example in EXAMPLES]
+
+
+def test_parses_every_templated_example():
+    parser = IntentParser()
+    intents = [parser.parse(question) for question in example_questions()]
+
+    assert [intent.name if intent else None for intent in intents] == [
+        "authors_of_work", "connection", "authors_of_work", None,
+        "authors_of_work", "connection", "authors_of_work", None,
+    ]
+    assert intents[0].cypher == AUTHORS_OF_WORK_QUERY
+    assert intents[0].parameters == {"title": "Attention Is All You Need"}
+    assert intents[5].cypher == CONNECTION_QUERY
+    assert intents[5].parameters == {"author": "Koyo", "title": "Liver segmentation", "other_title": "Attention Is All You Need"}
+
+
+def test_accepts_common_variants():
+    parser = IntentParser()
+
+    assert parser.parse("authors of “BERT”").parameters == {"title": "BERT"}
+    assert parser.parse("who authored the paper \"GPT-3\"").parameters == {"title": "GPT-3"}
+    assert parser.parse("『BERT』の論文の著者は誰？").parameters == {"title": "BERT"}
+    assert parser.parse("How is Ashish Vaswani’s \"Attention\" connected to the \"BERT\" paper?").parameters == {"author": "Ashish Vaswani", "title": "Attention", "other_title": "BERT"}
+
+
+def test_unquoted_titles_fall_back_to_the_llm():
+    parser = IntentParser()
+
+    assert parser.parse("who wrote attention is all you need") is None
+    assert parser.parse("Who wrote \"BERT\" and \"GPT-3\"?") is None
+
+
+def test_counts_hits_and_misses():
+    parser = IntentParser()
+    for question in example_questions():
+        parser.parse(question)
+
+    assert parser.stats() == {"hits": {"authors_of_work": 4, "connection": 2}, "misses": 2, "hit_rate": 0.75}
@@ -1,7 +1,9 @@
+import threading
 import pytest
 from unittest.mock import MagicMock, patch
 from neo4j.exceptions import ServiceUnavailable
-from src.setup_database import Neo4jHandler
+from src.embedding import text_hash
+from src.setup_database import Neo4jHandler, WORK_QUERY, WORK_UPDATED_DATE_QUERY, AUTHOR_QUERY, REFERENCED_QUERY, AUTHORED_QUERY, AFFILIATED_WITH_QUERY
 
 
 @pytest.fixture
@@ -81,28 +83,45 @@ def test_flush_success(mock_neo4j_handler):
 
 def test_add_work(mock_neo4j_handler):
     """
-    Test that add_work adds a valid query for creating a Work node.
+    Test that add_work adds a valid query for creating a Work node and embeds its title before the flush.
     """
     mock_work = {
         "id": "https://openalex.org/W0123456789",
         "title": "Test Work"
     }
 
-    # Mock the embed_query method in OpenAIEmbeddings
+    # Mock the embed_documents method in OpenAIBatchEmbeddings
     mock_embedder = MagicMock()
-    mock_embedder.embed_query.return_value = [0.1, 0.2, 0.3]
+    mock_embedder.embed_documents.return_value = [[0.1, 0.2, 0.3]]
     mock_neo4j_handler.embedder = mock_embedder
 
     mock_neo4j_handler.add_work(mock_work)
     assert len(mock_neo4j_handler.query_buffer) == 1
     query, params = mock_neo4j_handler.query_buffer[0]
-    assert query == "MERGE (n:Work {id: $id}) ON CREATE SET n.title = $title, n.vectorProperty = $vectorProperty ON MATCH SET n.title = $title, n.vectorProperty = $vectorProperty"
+    assert query == "MERGE (n:Work {id: $id}) ON CREATE SET n.title = $title, n.title_normalized = $title_normalized, n.vectorProperty = $vectorProperty, n.title_hash = $title_hash, n.updated_date = $updated_date ON MATCH SET n.title = $title, n.title_normalized = $title_normalized, n.vectorProperty = coalesce($vectorProperty, n.vectorProperty), n.title_hash = $title_hash, n.updated_date = $updated_date"
     assert params == {
         "id": "W0123456789",
         "title": "Test Work",
-        "vectorProperty": [0.1, 0.2, 0.3]
+        "title_normalized": "test work",
+        "vectorProperty": None,
+        "title_hash": text_hash("Test Work"),
+        "updated_date": None
     }
 
+    mock_neo4j_handler.embed_pending()
+    mock_embedder.embed_documents.assert_called_once_with(["Test Work"])
+    assert params["vectorProperty"] == [0.1, 0.2, 0.3]
+
+
+def test_untitled_work_keeps_existing_vector():
+    """
+    Test that rewriting a Work without a computed vector leaves its stored vector in place.
+    """
+    from src.setup_database import BULK_QUERIES
+    for query in (WORK_QUERY, BULK_QUERIES[WORK_QUERY]):
+        on_match = query.split("ON MATCH SET")[1]
+        assert "vectorProperty, n.vectorProperty)" in on_match
+        assert "n.vectorProperty = $vectorProperty" not in on_match and "n.vectorProperty = row.vectorProperty" not in on_match
 
 def test_add_author(mock_neo4j_handler):
     """
@@ -110,14 +129,15 @@ def test_add_author(mock_neo4j_handler):
     """
     mock_author = {
         "id": "https://openalex.org/A0123456789",
-        "display_name": "Test Author"
+        "display_name": "Test Author",
+        "updated_date": "2024-01-01T00:00:00"
     }
 
     mock_neo4j_handler.add_author(mock_author)
     assert len(mock_neo4j_handler.query_buffer) == 1
     query, params = mock_neo4j_handler.query_buffer[0]
-    assert query == "MERGE (n:Author {id: $id}) ON CREATE SET n.display_name = $display_name ON MATCH SET n.display_name = $display_name"
-    assert params == {"id": "A0123456789", "display_name": "Test Author"}
+    assert query == "MERGE (n:Author {id: $id}) ON CREATE SET n.display_name = $display_name, n.name_normalized = $name_normalized, n.updated_date = $updated_date ON MATCH SET n.display_name = $display_name, n.name_normalized = $name_normalized, n.updated_date = $updated_date"
+    assert params == {"id": "A0123456789", "display_name": "Test Author", "name_normalized": "test author", "updated_date": "2024-01-01T00:00:00"}
 
 
 def test_add_institution(mock_neo4j_handler):
@@ -132,8 +152,8 @@ def test_add_institution(mock_neo4j_handler):
     mock_neo4j_handler.add_institution(mock_institution)
     assert len(mock_neo4j_handler.query_buffer) == 1
     query, params = mock_neo4j_handler.query_buffer[0]
-    assert query == "MERGE (n:Institution {id: $id}) ON CREATE SET n.display_name = $display_name ON MATCH SET n.display_name = $display_name"
-    assert params == {"id": "I0123456789", "display_name": "Test Institution"}
+    assert query == "MERGE (n:Institution {id: $id}) ON CREATE SET n.display_name = $display_name, n.name_normalized = $name_normalized, n.updated_date = $updated_date ON MATCH SET n.display_name = $display_name, n.name_normalized = $name_normalized, n.updated_date = $updated_date"
+    assert params == {"id": "I0123456789", "display_name": "Test Institution", "name_normalized": "test institution", "updated_date": None}
 
 
 def test_add_referenced(mock_neo4j_handler):
@@ -193,4 +213,557 @@ def test_add_affiliated_with(mock_neo4j_handler):
     assert len(mock_neo4j_handler.query_buffer) == 1
     query, params = mock_neo4j_handler.query_buffer[0]
     assert query == "MATCH (n1:Author {id: $id1}), (n2:Institution {id: $id2})MERGE (n1)-[r:AFFILIATED_WITH]->(n2)RETURN r"
-    assert params == {"id1": "A0123456789", "id2": "I0123456789"}
\ No newline at end of file
+    assert params == {"id1": "A0123456789", "id2": "I0123456789"}
+
+def test_group_statements(mock_neo4j_handler):
+    """
+    Test that group_statements turns single-row statements into UNWIND statements per kind, nodes first.
+    """
+    mock_neo4j_handler.rows_per_statement = 2
+    for i in range(3):
+        mock_neo4j_handler.add_author({"id": f"https://openalex.org/A{i}", "display_name": f"Author {i}"})
+    mock_neo4j_handler.add_authored({"id": "https://openalex.org/A0"}, {"id": "https://openalex.org/W0"})
+    mock_neo4j_handler.add_to_batch("CREATE (n:Test {id: $id})", {"id": "T0"})
+
+    statements = mock_neo4j_handler.group_statements(mock_neo4j_handler.query_buffer)
+
+    assert [query.split(" ")[0] for query, _ in statements] == ["UNWIND", "UNWIND", "UNWIND", "CREATE"]
+    assert statements[0][1] == {"rows": [
+        {"id": "A0", "display_name": "Author 0", "name_normalized": "author 0", "updated_date": None},
+        {"id": "A1", "display_name": "Author 1", "name_normalized": "author 1", "updated_date": None},
+    ]}
+    assert statements[1][1] == {"rows": [{"id": "A2", "display_name": "Author 2", "name_normalized": "author 2", "updated_date": None}]}
+    assert "AUTHORED" in statements[2][0]
+    assert statements[2][1] == {"rows": [{"id1": "A0", "id2": "W0"}]}
+    assert statements[3] == ("CREATE (n:Test {id: $id})", {"id": "T0"})
+
+
+def test_flush_runs_bulk_statements(mock_neo4j_handler):
+    """
+    Test that flush sends one UNWIND statement per kind instead of one statement per row.
+    """
+    for i in range(5):
+        mock_neo4j_handler.add_institution({"id": f"https://openalex.org/I{i}", "display_name": f"Institution {i}"})
+
+    with patch.object(mock_neo4j_handler.driver, "session") as mock_session:
+        mock_tx = MagicMock()
+        mock_session.return_value.__enter__.return_value.execute_write.side_effect = lambda work: work(mock_tx)
+
+        mock_neo4j_handler.flush()
+
+    mock_tx.run.assert_called_once()
+    query, = mock_tx.run.call_args.args
+    assert query.startswith("UNWIND $rows AS row MERGE (n:Institution")
+    assert len(mock_tx.run.call_args.kwargs["rows"]) == 5
+
+
+def test_float32_storage_sets_vectors_with_procedure():
+    """
+    Test that float32 storage writes Work vectors through db.create.setNodeVectorProperty.
+    """
+    with patch("neo4j.GraphDatabase.driver"):
+        handler = Neo4jHandler(uri="bolt://localhost:7687", username="user", password="password", vector_storage="float32")
+    handler.embedder = MagicMock()
+    handler.embedder.embed_documents.side_effect = lambda texts: [[1.0, 0.0] for _ in texts]
+    handler.add_work({"id": "https://openalex.org/W0", "title": "Paper"})
+    handler.embed_pending()
+
+    (query, params), = handler.group_statements(handler.query_buffer)
+
+    assert "n.vectorProperty" not in query
+    assert query.endswith("CALL db.create.setNodeVectorProperty(n, 'vectorProperty', row.vectorProperty)")
+    assert params["rows"][0]["vectorProperty"] == [1.0, 0.0]
+    with pytest.raises(ValueError):
+        Neo4jHandler(uri="bolt://localhost:7687", username="user", password="password", vector_storage="int8")
+
+
+def test_embed_pending_batches_titles(mock_neo4j_handler):
+    """
+    Test that queued Work titles are embedded in batches of embedding_batch_size.
+    """
+    mock_embedder = MagicMock()
+    mock_embedder.embed_documents.side_effect = lambda texts: [[float(len(text))] for text in texts]
+    mock_neo4j_handler.embedder = mock_embedder
+    mock_neo4j_handler.embedding_batch_size = 2
+
+    for i in range(5):
+        mock_neo4j_handler.add_work({"id": f"https://openalex.org/W{i}", "title": "x" * (i + 1)})
+    mock_neo4j_handler.add_work({"id": "https://openalex.org/W5", "title": None})
+    mock_neo4j_handler.embed_pending()
+
+    assert mock_embedder.embed_documents.call_count == 3
+    assert mock_neo4j_handler.embedding_requests == 3
+    assert [params["vectorProperty"] for _, params in mock_neo4j_handler.query_buffer] == [[1.0], [2.0], [3.0], [4.0], [5.0], None]
+    assert mock_neo4j_handler.pending_embeddings == []
+
+
+def make_work(id, author_ids, referenced_ids=()):
+    return {
+        "id": f"https://openalex.org/{id}",
+        "title": f"Work {id}",
+        "authorships": [{"author": {"id": f"https://openalex.org/{author_id}"}} for author_id in author_ids],
+        "referenced_works": [f"https://openalex.org/{referenced_id}" for referenced_id in referenced_ids],
+    }
+
+
+def test_traverse_and_add_works_fetches_once_per_level(mock_neo4j_handler):
+    """
+    Test that the breadth-first crawl fetches each entity type once per level with deduplicated IDs.
+    """
+    works = {
+        "W1": make_work("W1", ["A1", "A2"], ["W0"]),
+        "W2": make_work("W2", ["A2", "A3"], ["W1"]),
+        "W3": make_work("W3", ["A1"]),
+    }
+    seed = make_work("W0", ["A1"], ["W1", "W2", "W3", "W2"])
+
+    def fetch(ids):
+        return [{"id": f"https://openalex.org/{id}", "display_name": id, "affiliations": [{"institution": {"id": "https://openalex.org/I1"}}]} for id in ids]
+
+    with patch("src.setup_database.OpenAlexFetcher.fetch_works", side_effect=lambda ids: [works[id] for id in ids]) as fetch_works, \
+            patch("src.setup_database.OpenAlexFetcher.fetch_authors", side_effect=fetch) as fetch_authors, \
+            patch("src.setup_database.OpenAlexFetcher.fetch_institutions", side_effect=fetch) as fetch_institutions:
+        mock_neo4j_handler.traverse_and_add_works(seed, depth=1)
+
+    fetch_works.assert_called_once_with(["W1", "W2", "W3"])
+    assert fetch_authors.call_args_list[0].args == (["A1"],)
+    assert fetch_authors.call_args_list[1].args == (["A2", "A3"],)
+    assert fetch_institutions.call_args_list[0].args == (["I1"],)
+    assert fetch_institutions.call_args_list[1].args == ([],)
+
+    rows = {}
+    for query, params in mock_neo4j_handler.query_buffer:
+        rows.setdefault(query, []).append(params)
+    assert sorted((row["id1"], row["id2"]) for row in rows[REFERENCED_QUERY]) == [("W0", "W1"), ("W0", "W2"), ("W0", "W3")]
+    assert len(rows[AUTHORED_QUERY]) == 6
+    assert len(rows[AFFILIATED_WITH_QUERY]) == 3
+    assert sorted(row["id"] for row in rows[WORK_QUERY]) == ["W0", "W1", "W2", "W3"]
+
+
+def test_last_level_does_not_refetch_known_works(mock_neo4j_handler):
+    """
+    Test that works already written are fetched again to expand them, but not at the last level.
+    """
+    works = {f"W{i}": make_work(f"W{i}", [], [f"W{i + 2}"]) for i in range(1, 5)}
+    seed = make_work("W0", [], ["W1", "W2"])
+    mock_neo4j_handler.id_histoty.add("W2")
+    mock_neo4j_handler.id_histoty.add("W4")
+
+    with patch("src.setup_database.OpenAlexFetcher.fetch_works", side_effect=lambda ids: [works[id] for id in ids]) as fetch_works, \
+            patch("src.setup_database.OpenAlexFetcher.fetch_authors", return_value=[]), \
+            patch("src.setup_database.OpenAlexFetcher.fetch_institutions", return_value=[]):
+        mock_neo4j_handler.traverse_and_add_works(seed, depth=2)
+
+    assert [call.args for call in fetch_works.call_args_list] == [(["W1"],), (["W2"],), (["W3"],)]
+
+
+def test_traverse_and_add_works_records_ingestion_metrics(mock_neo4j_handler, monkeypatch):
+    """
+    Test that the crawl counts works and entities per depth level, and that flushes record rows and time.
+    """
+    from pyalex import Works
+    from src.setup_database import OpenAlexFetcher
+    from src.telemetry import IngestMetrics
+
+    works = {f"W{i}": make_work(f"W{i}", ["A1"]) for i in range(1, 4)}
+    seed = make_work("W0", ["A1"], ["W1", "W2", "W3"])
+    metrics = IngestMetrics()
+    monkeypatch.setattr(OpenAlexFetcher, "metrics", metrics)
+    mock_neo4j_handler.metrics = metrics
+    mock_neo4j_handler.embedder = MagicMock()
+    mock_neo4j_handler.embedder.embed_documents.side_effect = lambda texts: [[0.0] for _ in texts]
+
+    def fetch_chunk(endpoint, chunk, fields=None):
+        if endpoint is Works:
+            return [works[id] for id in chunk]
+        return [{"id": f"https://openalex.org/{id}", "display_name": id, "affiliations": []} for id in chunk]
+
+    with patch.object(mock_neo4j_handler.driver, "session"), \
+            patch("src.setup_database.OpenAlexFetcher.fetch_chunk", side_effect=fetch_chunk):
+        mock_neo4j_handler.traverse_and_add_works(seed, depth=1)
+        mock_neo4j_handler.flush()
+
+    summary = metrics.summary()
+    assert summary["levels"]["0"]["works"] == 1
+    assert summary["levels"]["0"]["entities"] == 2
+    assert summary["levels"]["1"]["planned_works"] == 3
+    assert summary["levels"]["1"]["works"] == 3
+    assert summary["levels"]["1"]["eta_seconds"] is None
+    assert summary["counts"]["works_fetched"] == 4
+    assert summary["counts"]["flushes"] == 1
+    assert summary["counts"]["flushed_rows"] == summary["counts"]["buffered_rows"] == 12
+    assert summary["counts"]["embedded_texts"] == 4
+    assert "flush" in summary["busy_seconds"]
+
+def test_add_to_batch_auto_flushes_at_row_limit(mock_neo4j_handler):
+    """
+    Test that the buffer is flushed in its own transaction whenever it reaches max_buffer_rows.
+    """
+    mock_neo4j_handler.max_buffer_rows = 3
+    with patch.object(mock_neo4j_handler.driver, "session") as mock_session:
+        for i in range(7):
+            mock_neo4j_handler.add_author({"id": f"https://openalex.org/A{i}", "display_name": f"Author {i}"})
+
+        assert mock_session.return_value.__enter__.return_value.execute_write.call_count == 2
+    assert len(mock_neo4j_handler.query_buffer) == 1
+    assert mock_neo4j_handler.buffer_stats()["flushes"] == 2
+    assert mock_neo4j_handler.buffer_stats()["peak_buffer_rows"] == 3
+
+
+def test_auto_flush_on_a_work_row_writes_its_vector(mock_neo4j_handler):
+    """
+    Test that a Work row which itself triggers an automatic flush is embedded before it is written.
+    """
+    mock_neo4j_handler.max_buffer_rows = 1
+    mock_neo4j_handler.embedder = MagicMock()
+    mock_neo4j_handler.embedder.embed_documents.side_effect = lambda texts: [[0.5] for _ in texts]
+    written = []
+    with patch.object(mock_neo4j_handler.driver, "session"), \
+            patch.object(mock_neo4j_handler, "group_statements", side_effect=lambda buffer: written.extend(buffer) or []):
+        mock_neo4j_handler.add_work({"id": "https://openalex.org/W1", "title": "Paper"})
+
+    assert [(query, params["vectorProperty"]) for query, params in written] == [(WORK_QUERY, [0.5])]
+    assert mock_neo4j_handler.pending_embeddings == []
+
+def test_add_to_batch_auto_flushes_at_byte_limit(mock_neo4j_handler):
+    """
+    Test that the buffer is flushed once its estimated size reaches max_buffer_bytes.
+    """
+    mock_neo4j_handler.max_buffer_bytes = 1
+    with patch.object(mock_neo4j_handler.driver, "session"):
+        mock_neo4j_handler.add_author({"id": "https://openalex.org/A0", "display_name": "Author 0"})
+
+    assert mock_neo4j_handler.query_buffer == []
+    assert mock_neo4j_handler.buffer_bytes == 0
+    assert mock_neo4j_handler.peak_buffer_bytes > 0
+
+
+def test_rows_are_buffered_while_a_flush_writes(mock_neo4j_handler):
+    """
+    Test that another crawl worker can buffer rows while a flush is writing, and that its
+    rows are left for the next flush.
+    """
+    mock_neo4j_handler.add_author({"id": "https://openalex.org/A0", "display_name": "Author 0"})
+
+    def write(transaction_function):
+        worker = threading.Thread(target=mock_neo4j_handler.add_author, args=({"id": "https://openalex.org/A1", "display_name": "Author 1"},))
+        worker.start()
+        worker.join(timeout=5)
+        assert not worker.is_alive()
+
+    with patch.object(mock_neo4j_handler.driver, "session") as mock_session:
+        mock_session.return_value.__enter__.return_value.execute_write.side_effect = write
+        mock_neo4j_handler.flush()
+
+    assert [params["id"] for _, params in mock_neo4j_handler.query_buffer] == ["A1"]
+    assert mock_neo4j_handler.id_histoty.uncommitted == ["A1"]
+
+
+def test_failed_flush_keeps_its_rows(mock_neo4j_handler):
+    """
+    Test that the rows and seen IDs of a failed flush are put back in front of the rows
+    buffered since, to be written by the next flush.
+    """
+    mock_neo4j_handler.add_author({"id": "https://openalex.org/A0", "display_name": "Author 0"})
+
+    def write(transaction_function):
+        mock_neo4j_handler.add_author({"id": "https://openalex.org/A1", "display_name": "Author 1"})
+        raise ServiceUnavailable("Service unavailable")
+
+    with patch.object(mock_neo4j_handler.driver, "session") as mock_session:
+        mock_session.return_value.__enter__.return_value.execute_write.side_effect = write
+        with pytest.raises(RuntimeError):
+            mock_neo4j_handler.flush()
+
+    assert [params["id"] for _, params in mock_neo4j_handler.query_buffer] == ["A0", "A1"]
+    assert mock_neo4j_handler.id_histoty.uncommitted == ["A0", "A1"]
+    assert mock_neo4j_handler.flushes == 0
+
+
+def test_deduplication_survives_flush(mock_neo4j_handler):
+    """
+    Test that an entity added before a flush is not buffered again after it.
+    """
+    author = {"id": "https://openalex.org/A0", "display_name": "Author 0"}
+    mock_neo4j_handler.add_author(author)
+    with patch.object(mock_neo4j_handler.driver, "session"):
+        mock_neo4j_handler.flush()
+    mock_neo4j_handler.add_author(author)
+
+    assert mock_neo4j_handler.query_buffer == []
+
+
+def test_traverse_and_add_works_resumes_from_checkpoint(mock_neo4j_handler, tmp_path):
+    """
+    Test that a crawl interrupted after depth 1 resumes from the checkpointed frontier
+    without fetching or writing the completed levels again.
+    """
+    from src.checkpoint import CrawlCheckpoint, SeenIdStore
+
+    works = {
+        "W1": make_work("W1", ["A1"], ["W2"]),
+        "W2": make_work("W2", ["A1"]),
+    }
+    seed = make_work("W0", ["A1"], ["W1"])
+    fetch_authors = lambda ids: [{"id": f"https://openalex.org/{id}", "display_name": id, "affiliations": []} for id in ids]
+
+    mock_neo4j_handler.embedder = MagicMock()
+    mock_neo4j_handler.embedder.embed_documents.side_effect = lambda texts: [[0.0] for _ in texts]
+    mock_neo4j_handler.id_histoty = SeenIdStore(str(tmp_path / "seen_ids.sqlite3"))
+    mock_neo4j_handler.checkpoint = CrawlCheckpoint(str(tmp_path / "checkpoint.json"))
+    calls = []
+
+    def crash_at_depth_2(ids):
+        calls.append(ids)
+        if ids == ["W2"]:
+            raise ConnectionError("network down")
+        return [works[id] for id in ids]
+
+    with patch.object(mock_neo4j_handler.driver, "session"), \
+            patch("src.setup_database.OpenAlexFetcher.fetch_authors", side_effect=fetch_authors), \
+            patch("src.setup_database.OpenAlexFetcher.fetch_institutions", return_value=[]), \
+            patch("src.setup_database.OpenAlexFetcher.fetch_works", side_effect=crash_at_depth_2):
+        with pytest.raises(ConnectionError):
+            mock_neo4j_handler.build_graph_from_work(seed, depth=2)
+
+    assert calls == [["W1"], ["W2"]]
+    state = CrawlCheckpoint(str(tmp_path / "checkpoint.json")).level_state("W0")
+    assert state["depth"] == 1
+    assert state["frontier"] == ["W1"]
+
+    mock_neo4j_handler.query_buffer.clear()
+    mock_neo4j_handler.id_histoty = SeenIdStore(str(tmp_path / "seen_ids.sqlite3"))
+    mock_neo4j_handler.checkpoint = CrawlCheckpoint(str(tmp_path / "checkpoint.json"))
+    calls.clear()
+    with patch.object(mock_neo4j_handler.driver, "session"), \
+            patch("src.setup_database.OpenAlexFetcher.fetch_authors", side_effect=fetch_authors) as resumed_fetch_authors, \
+            patch("src.setup_database.OpenAlexFetcher.fetch_institutions", return_value=[]), \
+            patch("src.setup_database.OpenAlexFetcher.fetch_works", side_effect=lambda ids: calls.append(ids) or [works[id] for id in ids]):
+        mock_neo4j_handler.build_graph_from_work(seed, depth=2)
+
+    assert calls == [["W1"], ["W2"]]
+    # Nothing new to fetch; the author already written is fetched again to relink its affiliations
+    assert [call.args for call in resumed_fetch_authors.call_args_list] == [([],), (["A1"],)]
+    assert mock_neo4j_handler.checkpoint.is_completed("W0")
+    assert mock_neo4j_handler.checkpoint.level_state("W0") is None
+
+
+def test_resume_relinks_affiliations_of_authors_written_mid_level(mock_neo4j_handler, tmp_path):
+    """
+    Test that a resumed crawl adds the affiliations of an author flushed by the interrupted
+    run before its AFFILIATED_WITH rows were written.
+    """
+    from src.checkpoint import CrawlCheckpoint, SeenIdStore
+
+    works = {"W1": make_work("W1", [], ["W2"]), "W2": make_work("W2", ["A1"])}
+    seed = make_work("W0", [], ["W1"])
+    mock_neo4j_handler.embedder = MagicMock()
+    mock_neo4j_handler.embedder.embed_documents.side_effect = lambda texts: [[0.0] for _ in texts]
+    # The interrupted run completed depth 1, then flushed W2 and A1 but lost A1's affiliation
+    mock_neo4j_handler.id_histoty = SeenIdStore(str(tmp_path / "seen_ids.sqlite3"))
+    for id in ["W0", "W1", "W2", "A1", "I1"]:
+        mock_neo4j_handler.id_histoty.add(id)
+    mock_neo4j_handler.checkpoint = CrawlCheckpoint(str(tmp_path / "checkpoint.json"))
+    mock_neo4j_handler.checkpoint.save_level("W0", 1, ["W1"], {"W0", "W1"})
+    written = []
+    fetch_authors = lambda ids: [{"id": f"https://openalex.org/{id}", "display_name": id, "affiliations": [{"institution": {"id": "https://openalex.org/I1"}}]} for id in ids]
+
+    with patch.object(mock_neo4j_handler.driver, "session"), \
+            patch.object(mock_neo4j_handler, "group_statements", side_effect=lambda buffer: written.extend(buffer) or []), \
+            patch("src.setup_database.OpenAlexFetcher.fetch_authors", side_effect=fetch_authors), \
+            patch("src.setup_database.OpenAlexFetcher.fetch_institutions", return_value=[]), \
+            patch("src.setup_database.OpenAlexFetcher.fetch_works", side_effect=lambda ids: [works[id] for id in ids]):
+        mock_neo4j_handler.build_graph_from_work(seed, depth=2)
+
+    affiliations = [(params["id1"], params["id2"]) for query, params in written if query == AFFILIATED_WITH_QUERY]
+    assert affiliations == [("A1", "I1")]
+
+def test_create_indexes_backfills_normalized_names(mock_neo4j_handler):
+    """
+    Test that nodes written before titles and names were normalized get the normalized properties.
+    """
+    def read_query(query, **parameters):
+        if query.startswith("MATCH (n:Work)"):
+            return [{"id": "W1", "text": "ＡＴＴＥＮＴＩＯＮ  Is All"}]
+        return []
+
+    with patch.object(mock_neo4j_handler, "create_vector_index"), \
+            patch.object(mock_neo4j_handler, "read_query", side_effect=read_query), \
+            patch.object(mock_neo4j_handler, "execute_query") as execute_query:
+        mock_neo4j_handler.create_indexes()
+
+    backfills = [call for call in execute_query.call_args_list if call.args[0].startswith("UNWIND")]
+    assert len(backfills) == 1
+    assert "SET n.title_normalized = row.value" in backfills[0].args[0]
+    assert backfills[0].kwargs["rows"] == [{"id": "W1", "value": "attention is all"}]
+
+
+def test_refresh_only_reembeds_changed_titles(mock_neo4j_handler):
+    """
+    Test that refresh asks only for records updated since the last sync and re-embeds only works whose title changed.
+    """
+    stored = {
+        "MATCH (n:Work) RETURN n.id AS id, n.title_hash AS title_hash": [
+            {"id": "W1", "title_hash": text_hash("Same Title")},
+            {"id": "W2", "title_hash": text_hash("Old Title")},
+            {"id": "W3", "title_hash": text_hash("Untouched")},
+        ],
+        "MATCH (n:Author) RETURN n.id AS id": [{"id": "A1"}],
+        "MATCH (n:Institution) RETURN n.id AS id": [],
+    }
+    updated_works = [
+        dict(make_work("W1", ["A1"], ["W2", "W9"]), title="Same Title", updated_date="2024-02-01T00:00:00"),
+        dict(make_work("W2", ["A9"]), title="New Title", updated_date="2024-02-02T00:00:00"),
+    ]
+    mock_neo4j_handler.flush = MagicMock()
+
+    with patch.object(mock_neo4j_handler, "read_query", side_effect=lambda query: stored[query]), \
+            patch("src.setup_database.OpenAlexFetcher.fetch_works", return_value=updated_works) as fetch_works, \
+            patch("src.setup_database.OpenAlexFetcher.fetch_authors", return_value=[]) as fetch_authors, \
+            patch("src.setup_database.OpenAlexFetcher.fetch_institutions", return_value=[]):
+        counts = mock_neo4j_handler.refresh("2024-01-31")
+
+    fetch_works.assert_called_once_with(["W1", "W2", "W3"], "2024-01-31")
+    fetch_authors.assert_called_once_with(["A1"], "2024-01-31")
+    assert counts == {"works": 2, "reembedded_works": 1, "authors": 0, "institutions": 0}
+    buffered = [(query, params) for query, params in mock_neo4j_handler.query_buffer]
+    assert (WORK_UPDATED_DATE_QUERY, {"id": "W1", "updated_date": "2024-02-01T00:00:00"}) in buffered
+    assert [params["id"] for query, params in buffered if query == WORK_QUERY] == ["W2"]
+    assert [params["title"] for params in mock_neo4j_handler.pending_embeddings] == ["New Title"]
+    assert [(params["id1"], params["id2"]) for query, params in buffered if query == REFERENCED_QUERY] == [("W1", "W2")]
+    assert [(params["id1"], params["id2"]) for query, params in buffered if query == AUTHORED_QUERY] == [("A1", "W1")]
+    mock_neo4j_handler.flush.assert_called_once()
+
+
+def test_build_graph_from_seeds_fetches_shared_references_once(mock_neo4j_handler, tmp_path, monkeypatch):
+    """
+    Test that parallel seeds reaching the same works and authors fetch and write them only once.
+    """
+    from pyalex import Works, Authors
+    from src.openalex_cache import EntityCache
+    from src.setup_database import OpenAlexFetcher
+
+    works = {f"W{i}": make_work(f"W{i}", ["A1", f"A{i}"]) for i in range(1, 4)}
+    seeds = {f"S{i}": make_work(f"S{i}", ["A1"], ["W1", "W2", "W3"]) for i in range(1, 9)}
+    requested = []
+
+    def fetch_chunk(endpoint, chunk, fields=None):
+        requested.extend(chunk)
+        if endpoint is Works:
+            return [works[id] for id in chunk]
+        if endpoint is Authors:
+            return [{"id": f"https://openalex.org/{id}", "display_name": id, "affiliations": []} for id in chunk]
+        return []
+
+    monkeypatch.setattr(OpenAlexFetcher, "cache", EntityCache(str(tmp_path / "openalex.sqlite3")))
+    mock_neo4j_handler.embedder = MagicMock()
+    mock_neo4j_handler.embedder.embed_documents.side_effect = lambda texts: [[0.0] for _ in texts]
+    written = []
+    with patch.object(mock_neo4j_handler.driver, "session"), \
+            patch.object(mock_neo4j_handler, "group_statements", side_effect=lambda buffer: written.extend(buffer) or []), \
+            patch("src.setup_database.OpenAlexFetcher.fetch_chunk", side_effect=fetch_chunk), \
+            patch("src.setup_database.OpenAlexFetcher.fetch_work", side_effect=lambda key: seeds[key]):
+        mock_neo4j_handler.build_graph_from_seeds(list(seeds), depth=1, workers=4)
+
+    assert sorted(requested) == ["A1", "A2", "A3", "W1", "W2", "W3"]
+    node_ids = [params["id"] for query, params in written if "id" in params]
+    assert sorted(node_ids) == sorted([*seeds, "W1", "W2", "W3", "A1", "A2", "A3"])
+    referenced = {(params["id1"], params["id2"]) for query, params in written if query == REFERENCED_QUERY}
+    assert referenced == {(seed, work) for seed in seeds for work in works}
+
+
+def test_crawl_best_first_expands_most_cited_works_within_budget(mock_neo4j_handler):
+    """
+    Test that the best-first crawl expands the most cited works first and stops at max_works.
+    """
+    from src.setup_database import CrawlBudget
+
+    works = {
+        "W1": dict(make_work("W1", [], ["W4", "W5"]), cited_by_count=5),
+        "W2": dict(make_work("W2", [], ["W6", "W7"]), cited_by_count=500),
+        "W3": dict(make_work("W3", [], ["W8"]), cited_by_count=50),
+        **{f"W{i}": dict(make_work(f"W{i}", []), cited_by_count=i) for i in range(4, 9)},
+    }
+    seed = dict(make_work("W0", [], ["W1", "W2", "W3"]), cited_by_count=0)
+    calls = []
+
+    with patch("src.setup_database.OpenAlexFetcher.fetch_works", side_effect=lambda ids: calls.append(ids) or [works[id] for id in ids]), \
+            patch("src.setup_database.OpenAlexFetcher.fetch_authors", return_value=[]), \
+            patch("src.setup_database.OpenAlexFetcher.fetch_institutions", return_value=[]):
+        summary = mock_neo4j_handler.crawl_best_first(seed, CrawlBudget(max_works=6))
+
+    # W2 is expanded before W3 and W1, so only its references fit in the budget
+    assert calls == [["W1", "W2", "W3"], ["W6", "W7"]]
+    assert summary["works"] == 6
+    assert summary["stopped_by"] == "max_works"
+    rows = [params["id"] for query, params in mock_neo4j_handler.query_buffer if query == WORK_QUERY]
+    assert sorted(rows) == ["W0", "W1", "W2", "W3", "W6", "W7"]
+
+
+def test_crawl_best_first_prefers_works_referenced_by_most_crawled_works(mock_neo4j_handler):
+    """
+    Test that with the "references" priority the work cited by most crawled works is fetched first
+    and that the crawl stops once max_api_calls is spent.
+    """
+    from src.setup_database import CrawlBudget, OpenAlexFetcher
+
+    works = {
+        "W1": make_work("W1", [], ["W9", "W4"]),
+        "W2": make_work("W2", [], ["W9", "W5"]),
+        "W3": make_work("W3", [], ["W9"]),
+        **{f"W{i}": make_work(f"W{i}", []) for i in (4, 5, 9)},
+    }
+    seed = make_work("W0", [], ["W1", "W2", "W3"])
+    calls = []
+
+    def fetch_works(ids):
+        calls.append(ids)
+        OpenAlexFetcher.count_request()
+        return [works[id] for id in ids]
+
+    with patch("src.setup_database.OpenAlexFetcher.fetch_works", side_effect=fetch_works), \
+            patch("src.setup_database.OpenAlexFetcher.fetch_authors", return_value=[]), \
+            patch("src.setup_database.OpenAlexFetcher.fetch_institutions", return_value=[]):
+        summary = mock_neo4j_handler.crawl_best_first(seed, CrawlBudget(max_works=5, max_api_calls=5, priority="references"))
+
+    assert calls[1] == ["W9"]
+    assert summary["stopped_by"] == "max_works"
+
+    calls.clear()
+    mock_neo4j_handler.id_histoty.clear()
+    with patch("src.setup_database.OpenAlexFetcher.fetch_works", side_effect=fetch_works), \
+            patch("src.setup_database.OpenAlexFetcher.fetch_authors", return_value=[]), \
+            patch("src.setup_database.OpenAlexFetcher.fetch_institutions", return_value=[]):
+        summary = mock_neo4j_handler.crawl_best_first(seed, CrawlBudget(max_api_calls=1, priority="references"))
+
+    assert calls == [["W1", "W2", "W3"]]
+    assert summary == {"works": 4, "api_calls": 1, "seconds": summary["seconds"], "stopped_by": "max_api_calls"}
+
+
+def test_crawl_best_first_skips_requested_works_missing_from_openalex(mock_neo4j_handler):
+    """
+    Test that a reference requested but not returned by OpenAlex is not pushed again when
+    a later work references it too, and that requests of other crawls do not count.
+    """
+    from src.setup_database import CrawlBudget, OpenAlexFetcher
+
+    works = {"W1": make_work("W1", [], ["W9"])}
+    seed = make_work("W0", [], ["W1", "W9"])
+
+    def fetch_works(ids):
+        if ids:
+            OpenAlexFetcher.count_request()
+        # Another seed crawled at the same time
+        other_crawl = threading.Thread(target=lambda: [OpenAlexFetcher.count_request() for _ in range(5)])
+        other_crawl.start()
+        other_crawl.join()
+        return [works[id] for id in ids if id in works]
+
+    with patch("src.setup_database.OpenAlexFetcher.fetch_works", side_effect=fetch_works), \
+            patch("src.setup_database.OpenAlexFetcher.fetch_authors", return_value=[]), \
+            patch("src.setup_database.OpenAlexFetcher.fetch_institutions", return_value=[]):
+        summary = mock_neo4j_handler.crawl_best_first(seed, CrawlBudget(max_api_calls=3, priority="references"))
+
+    assert summary["works"] == 2
+    assert summary["api_calls"] == 1
+    assert summary["stopped_by"] == "exhausted"
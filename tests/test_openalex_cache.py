@@ -0,0 +1,29 @@
+from unittest.mock import patch
+from src.openalex_cache import EntityCache
+
+
+def test_entity_cache_round_trip(tmp_path):
+    cache = EntityCache(str(tmp_path / "openalex.sqlite3"))
+    work = {"id": "https://openalex.org/W1", "title": "Test Work", "referenced_works": []}
+    cache.put_many("works", {"W1": work})
+
+    assert cache.get_many("works", ["W1", "W2"]) == {"W1": work}
+    assert cache.get_many("authors", ["W1"]) == {}
+    assert cache.stats() == {"hits": 1, "misses": 2, "entries": 1}
+
+
+def test_entity_cache_expires_after_ttl(tmp_path):
+    cache = EntityCache(str(tmp_path / "openalex.sqlite3"), ttl=60)
+    with patch("src.openalex_cache.time.time", return_value=1000.0):
+        cache.put_many("works", {"W1": {"id": "https://openalex.org/W1"}})
+    with patch("src.openalex_cache.time.time", return_value=1059.0):
+        assert "W1" in cache.get_many("works", ["W1"])
+    with patch("src.openalex_cache.time.time", return_value=1061.0):
+        assert cache.get_many("works", ["W1"]) == {}
+
+
+def test_entity_cache_persists(tmp_path):
+    path = str(tmp_path / "openalex.sqlite3")
+    EntityCache(path).put_many("authors", {"A1": {"id": "https://openalex.org/A1", "display_name": "Author"}})
+
+    assert EntityCache(path).get_many("authors", ["A1"])["A1"]["display_name"] == "Author"
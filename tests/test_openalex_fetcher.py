@@ -1,5 +1,14 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import patch
-from src.setup_database import OpenAlexFetcher
+from urllib.parse import parse_qs, urlparse
+import pytest
+import pyalex
+from src.openalex_cache import EntityCache
+from src.records import AuthorRecord, WorkRecord
+from src.setup_database import OpenAlexFetcher, TokenBucket, install_openalex_session
 
 
 def test_chunk_list():
@@ -64,3 +73,205 @@ def test_fetch_works_with_error(mock_filter):
     works = OpenAlexFetcher.fetch_works(work_ids)
 
     assert works == []
+    assert "W0123456789" in OpenAlexFetcher.failed_ids["works"]
+
+
+class OpenAlexStandIn(BaseHTTPRequestHandler):
+    """
+    Serves canned OpenAlex list responses for `?filter=openalex_id:...` requests.
+    """
+    delay = 0.0
+    # Status codes to return, in order, before answering normally
+    failures = []
+    # Query strings received, in order
+    queries = []
+    # Size of the response bodies sent
+    bytes_sent = 0
+
+    def do_GET(self):
+        self.queries.append(parse_qs(urlparse(self.path).query))
+        time.sleep(self.delay)
+        if self.failures:
+            self.send_response(self.failures.pop(0))
+            self.end_headers()
+            return
+        query = parse_qs(urlparse(self.path).query)
+        ids = query["filter"][0].removeprefix("openalex_id:").split("|")
+        body = json.dumps({
+            "meta": {"count": len(ids)},
+            "results": [{"id": f"https://openalex.org/{id}", "title": f"Work {id}", "display_name": f"Entity {id}"} for id in ids],
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(body)
+        type(self).bytes_sent += len(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def openalex_stand_in(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), OpenAlexStandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setitem(pyalex.config, "openalex_url", f"http://127.0.0.1:{server.server_port}")
+    # Restored after the test, so that the session is wrapped once per test
+    monkeypatch.setattr(pyalex.api, "_get_requests_session", pyalex.api._get_requests_session)
+    install_openalex_session()
+    monkeypatch.setattr(OpenAlexFetcher, "rate_limiter", TokenBucket(rate=1000, capacity=100))
+    monkeypatch.setattr(OpenAlexFetcher, "retry_backoff", 0.01)
+    monkeypatch.setattr(OpenAlexFetcher, "failed_ids", {"works": set(), "authors": set(), "institutions": set()})
+    monkeypatch.setattr(OpenAlexStandIn, "delay", 0.0)
+    monkeypatch.setattr(OpenAlexStandIn, "failures", [])
+    monkeypatch.setattr(OpenAlexStandIn, "queries", [])
+    monkeypatch.setattr(OpenAlexStandIn, "bytes_sent", 0)
+    yield OpenAlexStandIn
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_works_concurrently_from_stand_in(openalex_stand_in, monkeypatch):
+    openalex_stand_in.delay = 0.05
+    work_ids = [f"W{i}" for i in range(800)]
+
+    monkeypatch.setattr(OpenAlexFetcher, "max_workers", 1)
+    start = time.perf_counter()
+    sequential = OpenAlexFetcher.fetch_works(work_ids)
+    sequential_time = time.perf_counter() - start
+
+    monkeypatch.setattr(OpenAlexFetcher, "max_workers", 8)
+    start = time.perf_counter()
+    concurrent = OpenAlexFetcher.fetch_works(work_ids)
+    concurrent_time = time.perf_counter() - start
+
+    assert [work["id"] for work in concurrent] == [f"https://openalex.org/{id}" for id in work_ids]
+    assert concurrent == sequential
+    assert concurrent_time < sequential_time / 2
+
+
+def test_crawl_requests_include_chunks_fetched_on_pool_threads(openalex_stand_in, monkeypatch):
+    monkeypatch.setattr(OpenAlexFetcher, "max_workers", 4)
+    crawl_requests = OpenAlexFetcher.count_crawl_requests()
+    other_thread = threading.Thread(target=OpenAlexFetcher.count_request)
+    other_thread.start()
+    other_thread.join()
+
+    OpenAlexFetcher.fetch_works([f"W{i}" for i in range(250)])
+
+    assert crawl_requests["requests"] == 3
+
+
+def test_fetch_counts_response_bytes(openalex_stand_in):
+    before = OpenAlexFetcher.metrics.counts["openalex_bytes"]
+
+    OpenAlexFetcher.fetch_works([f"W{i}" for i in range(150)])
+
+    assert openalex_stand_in.bytes_sent > 0
+    assert OpenAlexFetcher.metrics.counts["openalex_bytes"] - before == openalex_stand_in.bytes_sent
+
+
+def test_fetch_retries_rate_limited_requests(openalex_stand_in):
+    openalex_stand_in.failures = [429, 503]
+
+    authors = OpenAlexFetcher.fetch_authors(["A1", "A2"])
+
+    assert [author["id"] for author in authors] == ["https://openalex.org/A1", "https://openalex.org/A2"]
+    assert OpenAlexFetcher.failed_ids["authors"] == set()
+
+
+def test_fetch_reports_failed_ids(openalex_stand_in, monkeypatch):
+    monkeypatch.setattr(OpenAlexFetcher, "max_retries", 1)
+    openalex_stand_in.failures = [500, 500]
+
+    institutions = OpenAlexFetcher.fetch_institutions(["I1", "I2"])
+
+    assert institutions == []
+    assert OpenAlexFetcher.failed_ids["institutions"] == {"I1", "I2"}
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=100, capacity=1)
+    start = time.perf_counter()
+    for _ in range(6):
+        bucket.acquire()
+    assert time.perf_counter() - start >= 0.04
+
+
+def test_fetch_only_requests_ids_missing_from_cache(tmp_path, monkeypatch):
+    cache = EntityCache(str(tmp_path / "openalex.sqlite3"))
+    cache.put_many("works", {"W1": {"id": "https://openalex.org/W1", "title": "Cached"}})
+    monkeypatch.setattr(OpenAlexFetcher, "cache", cache)
+
+    with patch("pyalex.Works.filter") as mock_filter:
+        mock_filter.return_value.get.return_value = [{"id": "https://openalex.org/W2", "title": "Fetched"}]
+        works = OpenAlexFetcher.fetch_works(["W1", "W2"])
+
+    mock_filter.assert_called_once_with(openalex_id="W2")
+    assert [work["title"] for work in works] == ["Cached", "Fetched"]
+    assert cache.get_many("works", ["W2"])["W2"]["title"] == "Fetched"
+
+
+def test_offline_mode_builds_from_cache_only(tmp_path, monkeypatch):
+    cache = EntityCache(str(tmp_path / "openalex.sqlite3"))
+    cache.put_many("authors", {"A1": {"id": "https://openalex.org/A1", "display_name": "Cached"}})
+    monkeypatch.setattr(OpenAlexFetcher, "cache", cache)
+    monkeypatch.setattr(OpenAlexFetcher, "offline", True)
+
+    with patch("pyalex.Authors.filter") as mock_filter:
+        authors = OpenAlexFetcher.fetch_authors(["A1", "A2"])
+
+    mock_filter.assert_not_called()
+    assert [author["display_name"] for author in authors] == ["Cached"]
+    with pytest.raises(KeyError):
+        OpenAlexFetcher.fetch_work("https://doi.org/10.0000/missing")
+
+
+def test_fetch_since_filters_by_updated_date_and_bypasses_cache(tmp_path, monkeypatch):
+    cache = EntityCache(str(tmp_path / "openalex.sqlite3"))
+    cache.put_many("works", {"W1": {"id": "https://openalex.org/W1", "title": "Cached"}})
+    monkeypatch.setattr(OpenAlexFetcher, "cache", cache)
+
+    with patch("pyalex.Works.filter") as mock_filter:
+        mock_filter.return_value.get.return_value = [
+            {"id": "https://openalex.org/W1", "title": "Updated", "updated_date": "2024-01-31T08:00:00.000000"},
+            {"id": "https://openalex.org/W2", "title": "Unchanged", "updated_date": "2024-01-30T23:59:59.999999"},
+        ]
+        works = OpenAlexFetcher.fetch_works(["W1", "W2"], since="2024-01-31")
+
+    # from_updated_date needs a Premium API key, so the date is compared locally
+    mock_filter.assert_called_once_with(openalex_id="W1|W2")
+    assert [work["title"] for work in works] == ["Updated"]
+    assert cache.get_many("works", ["W1"])["W1"]["title"] == "Updated"
+
+
+def test_fetch_selects_only_used_fields_into_compact_records(openalex_stand_in):
+    works = OpenAlexFetcher.fetch_works(["W1", "W2"])
+    authors = OpenAlexFetcher.fetch_authors(["A1"])
+
+    assert openalex_stand_in.queries[0]["select"] == ["id,title,authorships,referenced_works,cited_by_count,updated_date"]
+    assert openalex_stand_in.queries[1]["select"] == ["id,display_name,affiliations,updated_date"]
+    assert works[0]._fields == WorkRecord._fields
+    assert works[1]["title"] == "Work W2"
+    assert authors[0]._fields == AuthorRecord._fields
+    assert authors[0]["display_name"] == "Entity A1"
+
+
+def test_sync_date_is_capped_by_cached_records_and_skipped_on_failures(tmp_path, monkeypatch):
+    import datetime
+    cache = EntityCache(str(tmp_path / "openalex.sqlite3"))
+    with patch("src.openalex_cache.time.time", return_value=datetime.datetime(2024, 1, 10, 12).timestamp()):
+        cache.put_many("works", {"W1": {"id": "https://openalex.org/W1"}})
+    monkeypatch.setattr(OpenAlexFetcher, "cache", cache)
+    monkeypatch.setattr(OpenAlexFetcher, "failed_ids", {"works": set(), "authors": set(), "institutions": set()})
+
+    assert OpenAlexFetcher.sync_date("2024-02-01") == "2024-02-01"
+    cache.get_many("works", ["W1"])
+    assert OpenAlexFetcher.sync_date("2024-02-01") == "2024-01-10"
+
+    monkeypatch.setattr(OpenAlexFetcher, "offline", True)
+    assert OpenAlexFetcher.sync_date("2024-02-01") is None
+    monkeypatch.setattr(OpenAlexFetcher, "offline", False)
+    OpenAlexFetcher.failed_ids["authors"].add("A1")
+    assert OpenAlexFetcher.sync_date("2024-02-01") is None
@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from src.config import EXAMPLES
+from src.prompting import ExampleSelector, TokenCountingOpenAILLM, example_question
+
+
+def test_example_question():
+    assert example_question(EXAMPLES[0]) == "Who wrote \"Attention Is All You Need\"?"
+    assert example_question(EXAMPLES[3]) == "Find all papers related to \"Transformer models\""
+
+
+def test_selects_most_similar_examples_and_embeds_them_once():
+    examples = [f"USER INPUT: q{i} QUERY: MATCH (n{i}) RETURN n{i}" for i in range(5)]
+    vectors = {"q0": [1.0, 0.0], "q1": [0.0, 1.0], "q2": [0.7, 0.7], "q3": [-1.0, 0.0], "q4": [0.9, 0.1]}
+    embedder = MagicMock()
+    embedder.embed_documents.side_effect = lambda texts: [vectors[text] for text in texts]
+
+    selector = ExampleSelector(embedder, examples, k=2)
+
+    assert selector.select([1.0, 0.0]) == [examples[0], examples[4]]
+    assert selector.select([0.1, 1.0]) == [examples[1], examples[2]]
+    embedder.embed_documents.assert_called_once()
+
+
+def test_small_example_library_is_used_whole():
+    embedder = MagicMock()
+    selector = ExampleSelector(embedder, EXAMPLES[:2], k=3)
+
+    assert selector.select([1.0]) == EXAMPLES[:2]
+    embedder.embed_documents.assert_not_called()
+
+
+def test_llm_records_prompt_tokens():
+    llm = TokenCountingOpenAILLM(model_name="gpt-4o-mini", api_key="test")
+    llm.client = MagicMock()
+    llm.client.chat.completions.create.return_value = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content="MATCH (n) RETURN n"))],
+        usage=SimpleNamespace(prompt_tokens=420, completion_tokens=12),
+    )
+
+    assert llm.invoke("prompt").content == "MATCH (n) RETURN n"
+    llm.invoke("prompt")
+
+    assert llm.last_usage() == {"prompt_tokens": 420, "completion_tokens": 12}
+    assert (llm.requests, llm.prompt_tokens, llm.completion_tokens) == (2, 840, 24)
@@ -0,0 +1,75 @@
+import numpy as np
+from src.query_cache import CypherCache, normalize_question
+
+
+def test_normalize_question():
+    assert normalize_question("  Who  wrote 'BERT'? ") == normalize_question("who wrote 'BERT'")
+    assert normalize_question("ＢＥＲＴの著者は？") == normalize_question("bertの著者は")
+
+
+def test_exact_hit_after_put():
+    cache = CypherCache()
+    cache.put("Who wrote BERT?", "MATCH (a:Author) RETURN a")
+
+    assert cache.get("who wrote bert") == "MATCH (a:Author) RETURN a"
+    assert cache.get("Who cited BERT?") is None
+    assert cache.stats() == {"exact_hits": 1, "semantic_hits": 0, "misses": 1, "entries": 1}
+
+
+def test_semantic_hit_within_threshold():
+    cache = CypherCache(similarity_threshold=0.9)
+    cache.put("Who wrote BERT?", "MATCH (a:Author) RETURN a", [1.0, 0.0, 0.0])
+
+    assert cache.get("Authors of BERT", [0.95, 0.1, 0.0]) == "MATCH (a:Author) RETURN a"
+    assert cache.get("Institutions of BERT", [0.1, 1.0, 0.0]) is None
+    assert cache.stats()["semantic_hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_semantic_hit_requires_the_same_quoted_titles():
+    cache = CypherCache(similarity_threshold=0.9)
+    cache.put('Who wrote "Paper A"?', "MATCH (a:Author)-[:AUTHORED]->(w:Work {title: 'Paper A'}) RETURN a", [1.0, 0.0, 0.0])
+
+    assert cache.get('Who wrote "Paper B"?', [0.99, 0.1, 0.0]) is None
+    assert cache.get('Who are the authors of “paper a”?', [0.95, 0.1, 0.0]) == "MATCH (a:Author)-[:AUTHORED]->(w:Work {title: 'Paper A'}) RETURN a"
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = CypherCache(max_entries=2)
+    cache.put("q1", "c1")
+    cache.put("q2", "c2")
+    cache.get("q1")
+    cache.put("q3", "c3")
+
+    assert cache.get("q2") is None
+    assert cache.get("q1") == "c1"
+    assert cache.get("q3") == "c3"
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("src.query_cache.time.monotonic", lambda: now[0])
+    cache = CypherCache(ttl=60)
+    cache.put("q1", "c1", [1.0, 0.0])
+
+    now[0] += 61
+    assert cache.get("q1", [1.0, 0.0]) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_schema_change_invalidates():
+    cache = CypherCache(schema="v1")
+    cache.put("q1", "c1")
+    cache.set_schema("v1")
+    assert cache.get("q1") == "c1"
+
+    cache.set_schema("v2")
+    assert cache.get("q1") is None
+
+
+def test_put_does_not_modify_the_callers_vector():
+    vector = np.array([3.0, 4.0], dtype=np.float32)
+    CypherCache().put("q1", "c1", vector)
+
+    assert vector.tolist() == [3.0, 4.0]
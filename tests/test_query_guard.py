@@ -0,0 +1,106 @@
+from unittest.mock import MagicMock, Mock
+import pytest
+from neo4j.exceptions import Neo4jError
+from neo4j.graph import Graph, Node
+from src.config import EXAMPLES
+from src.query_guard import QueryGuard, bound_variable_length, ensure_limit
+
+
+def test_bounds_variable_length_relationships():
+    assert bound_variable_length("MATCH p = (a)-[*]-(b) RETURN p", 4) == "MATCH p = (a)-[*1..4]-(b) RETURN p"
+    assert bound_variable_length("MATCH (a)-[r:REFERENCED*2..]->(b) RETURN b", 4) == "MATCH (a)-[r:REFERENCED*2..4]->(b) RETURN b"
+    assert bound_variable_length("MATCH (a)<-[:REFERENCED*..10]-(b) RETURN b", 4) == "MATCH (a)<-[:REFERENCED*..4]-(b) RETURN b"
+    assert bound_variable_length("MATCH (a)-[*2..3]-(b) RETURN b", 4) == "MATCH (a)-[*2..3]-(b) RETURN b"
+    assert bound_variable_length("MATCH (a)-[*9]-(b) RETURN b", 4) == "MATCH (a)-[*4]-(b) RETURN b"
+    assert bound_variable_length("MATCH ((a)-->(b)){2,} RETURN b", 4) == "MATCH ((a)-->(b)){2,4} RETURN b"
+
+
+def test_leaves_other_stars_alone():
+    cypher = "MATCH (w:Work) WITH [x IN [1, 2] | x*2] AS xs, count(*) AS n RETURN xs, n"
+    assert bound_variable_length(cypher, 4) == cypher
+
+
+def test_examples_are_bounded():
+    for example in EXAMPLES:
+        assert "[*]" not in bound_variable_length(example, 6)
+
+
+def test_ensure_limit():
+    assert ensure_limit("MATCH (w:Work) RETURN w;", 100) == "MATCH (w:Work) RETURN w LIMIT 100"
+    assert ensure_limit("MATCH (w:Work) RETURN w LIMIT 10", 100) == "MATCH (w:Work) RETURN w LIMIT 10"
+    assert ensure_limit("MATCH (w:Work) RETURN w limit 5000", 100) == "MATCH (w:Work) RETURN w limit 100"
+    assert ensure_limit("MATCH (w:Work) WITH w LIMIT 5 MATCH (w)--(x) RETURN x", 100) == "MATCH (w:Work) WITH w LIMIT 5 MATCH (w)--(x) RETURN x LIMIT 100"
+    assert ensure_limit("MATCH (a:Author) RETURN a UNION MATCH (a:Author) RETURN a", 100) == "CALL { MATCH (a:Author) RETURN a UNION MATCH (a:Author) RETURN a } RETURN * LIMIT 100"
+    assert ensure_limit("CREATE INDEX x IF NOT EXISTS FOR (w:Work) ON (w.id)", 100) == "CREATE INDEX x IF NOT EXISTS FOR (w:Work) ON (w.id)"
+
+
+def test_ensure_limit_ignores_comments_and_string_literals():
+    assert ensure_limit("MATCH (w:Work) RETURN w // every work", 100) == "MATCH (w:Work) RETURN w LIMIT 100"
+    assert ensure_limit("MATCH (w:Work)\n/* newest first */ RETURN w;\n// done", 100) == "MATCH (w:Work)\n  RETURN w LIMIT 100"
+    assert ensure_limit("MATCH (w:Work {url: 'https://doi.org/x'}) RETURN w", 100) == "MATCH (w:Work {url: 'https://doi.org/x'}) RETURN w LIMIT 100"
+    assert ensure_limit("MERGE (w:Work {title: 'What to RETURN'})", 100) == "MERGE (w:Work {title: 'What to RETURN'})"
+    assert ensure_limit('MATCH (w:Work {title: "Fast UNION"}) RETURN w', 100) == 'MATCH (w:Work {title: "Fast UNION"}) RETURN w LIMIT 100'
+    assert ensure_limit("MATCH (w:Work) RETURN w.title AS `total LIMIT 5`", 100) == "MATCH (w:Work) RETURN w.title AS `total LIMIT 5` LIMIT 100"
+
+
+def guarded_driver(records=None, error=None):
+    """
+    Driver whose read transactions stream `records`, or raise `error`.
+    """
+    driver = MagicMock()
+    session = driver.session.return_value.__enter__.return_value
+    tx = MagicMock()
+    if error is not None:
+        tx.run.side_effect = error
+    else:
+        tx.run.return_value = iter(records)
+    session.execute_read.side_effect = lambda work: work(tx)
+    return driver, tx
+
+
+def work_node(i):
+    return Node(Mock(spec=Graph), element_id=str(i), id_=i, n_labels=["Work"], properties={"id": f"W{i}", "title": f"Paper {i}"})
+
+
+def test_stops_reading_at_node_budget():
+    driver, tx = guarded_driver([[work_node(i), work_node(i + 1)] for i in range(10)])
+
+    result = QueryGuard(driver, max_hops=3, limit=50, max_nodes=4).run("MATCH p = (a)-[*]-(b) RETURN a, b", {"x": 1})
+
+    assert result.cypher == "MATCH p = (a)-[*1..3]-(b) RETURN a, b LIMIT 51"
+    assert tx.run.call_args.args == (result.cypher, {"x": 1})
+    # (0, 1), (1, 2), (2, 3) share nodes; (3, 4) would make five
+    assert len(result.records) == 3
+    assert result.truncated
+
+
+def test_small_result_is_complete():
+    driver, _ = guarded_driver([[work_node(1)], [work_node(2)]])
+
+    result = QueryGuard(driver, limit=50).run("MATCH (w:Work) RETURN w")
+
+    assert len(result.records) == 2
+    assert not result.truncated
+
+
+def test_only_rows_beyond_the_limit_are_reported_as_truncated():
+    driver, _ = guarded_driver([[work_node(i)] for i in range(3)])
+    result = QueryGuard(driver, limit=3).run("MATCH (w:Work) RETURN w")
+
+    assert result.cypher == "MATCH (w:Work) RETURN w LIMIT 4"
+    assert len(result.records) == 3
+    assert not result.truncated
+
+    driver, _ = guarded_driver([[work_node(i)] for i in range(4)])
+    result = QueryGuard(driver, limit=3).run("MATCH (w:Work) RETURN w")
+
+    assert len(result.records) == 3
+    assert result.truncated
+
+
+def test_timeout_is_reported():
+    error = Neo4jError._hydrate_neo4j(code="Neo.ClientError.Transaction.TransactionTimedOutClientConfiguration", message="The transaction has been terminated.")
+    driver, _ = guarded_driver(error=error)
+
+    with pytest.raises(RuntimeError, match="2s timeout"):
+        QueryGuard(driver, timeout=2).run("MATCH (w:Work) RETURN w")
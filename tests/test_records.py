@@ -0,0 +1,39 @@
+import pytest
+from src.records import AuthorRecord, InstitutionRecord, WorkRecord
+
+
+def test_work_record_keeps_only_crawled_fields():
+    work = WorkRecord.from_openalex({
+        "id": "https://openalex.org/W1",
+        "title": "Attention Is All You Need",
+        "authorships": [{"author": {"id": "https://openalex.org/A1"}}, {"author": {}}],
+        "referenced_works": ["https://openalex.org/W2"],
+        "cited_by_count": 42,
+        "abstract_inverted_index": {"attention": [0]},
+        "concepts": [{"id": "https://openalex.org/C1"}],
+    })
+
+    assert work == ("https://openalex.org/W1", "Attention Is All You Need", ("https://openalex.org/A1",), ("https://openalex.org/W2",), 42, None)
+    assert not hasattr(work, "concepts")
+
+
+def test_records_read_like_dicts():
+    author = AuthorRecord.from_openalex({
+        "id": "https://openalex.org/A1",
+        "display_name": "Ashish Vaswani",
+        "affiliations": [{"institution": {"id": "https://openalex.org/I1"}}],
+    })
+
+    assert author["display_name"] == "Ashish Vaswani"
+    assert author.get("updated_date") is None
+    assert author.get("missing", "default") == "default"
+    assert author[0] == "https://openalex.org/A1"
+    with pytest.raises(KeyError):
+        author["missing"]
+
+
+def test_record_ids_are_interned():
+    works = [WorkRecord.from_openalex({"id": f"https://openalex.org/W{i}", "referenced_works": ["https://openalex.org/" + "W0"]}) for i in (1, 2)]
+    institution = InstitutionRecord.from_openalex({"id": "https://openalex.org/" + "W0", "display_name": "x"})
+
+    assert works[0].referenced_works[0] is works[1].referenced_works[0] is institution.id
@@ -0,0 +1,138 @@
+import json
+import pytest
+from src.telemetry import IngestMetrics, QueryMetrics, QueryTrace, format_duration
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_trace(path, seconds, records):
+    clock = FakeClock()
+    trace = QueryTrace("Who wrote \"Attention Is All You Need\"?", clock)
+    trace.path = path
+    trace.stages = {"intent": 0.001, "cypher": seconds}
+    trace.count("records", records)
+    # 10 ms outside the stages
+    clock.now = 0.011 + seconds
+    return trace
+
+
+def test_trace_accumulates_stages_and_counts():
+    trace = QueryTrace("question")
+    with trace.stage("embedding"):
+        pass
+    with trace.stage("cypher"):
+        pass
+    with trace.stage("embedding"):
+        pass
+    trace.count("records", 3)
+    trace.count("records", 2)
+
+    assert list(trace.stages) == ["embedding", "cypher"]
+    assert trace.counts == {"records": 5}
+    assert trace.stage_seconds == sum(trace.stages.values())
+    assert trace.total_seconds >= trace.stage_seconds
+
+
+def test_trace_total_is_wall_clock_time_until_finish():
+    clock = FakeClock()
+    trace = QueryTrace("question", clock)
+    clock.now = 1.0
+    with trace.stage("cypher"):
+        clock.now = 1.5
+    clock.now = 2.0
+    trace.finish()
+    clock.now = 3.0
+
+    assert trace.stage_seconds == 0.5
+    assert trace.total_seconds == 2.0
+    assert trace.as_dict()["total_seconds"] == 2.0
+
+
+def test_trace_times_stages_that_raise():
+    trace = QueryTrace()
+    try:
+        with trace.stage("llm"):
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    assert "llm" in trace.stages
+
+
+def test_metrics_append_json_lines(tmp_path):
+    path = tmp_path / "metrics" / "queries.jsonl"
+    metrics = QueryMetrics(str(path))
+    metrics.record(make_trace("intent", 0.2, 4))
+    metrics.record(make_trace("llm", 1.5, 0))
+
+    lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [line["path"] for line in lines] == ["intent", "llm"]
+    assert lines[0]["stages"] == {"intent": 0.001, "cypher": 0.2}
+    assert lines[0]["counts"] == {"records": 4}
+    assert lines[1]["total_seconds"] == pytest.approx(1.511)
+    assert lines[1]["stage_seconds"] == pytest.approx(1.501)
+
+
+def test_metrics_write_prometheus_totals(tmp_path):
+    path = tmp_path / "queries.prom"
+    metrics = QueryMetrics(str(path))
+    metrics.record(make_trace("intent", 0.2, 4))
+    metrics.record(make_trace("intent", 1.5, 1))
+
+    text = path.read_text(encoding="utf-8")
+    assert 'paper_chain_query_questions_total{path="intent"} 2' in text
+    assert 'paper_chain_query_stage_seconds_sum{stage="cypher"} 1.700000' in text
+    assert 'paper_chain_query_stage_seconds_count{stage="cypher"} 2' in text
+    assert 'paper_chain_query_seconds_bucket{le="0.25"} 1' in text
+    assert 'paper_chain_query_seconds_bucket{le="+Inf"} 2' in text
+    assert "paper_chain_query_records_total 5" in text
+    assert not (tmp_path / "queries.prom.tmp").exists()
+
+
+def test_ingest_metrics_report_level_rate_and_eta():
+    clock = FakeClock()
+    metrics = IngestMetrics(clock)
+    metrics.start_level(1, 100)
+    metrics.fetched("works", 20)
+    metrics.fetched("authors", 30)
+    clock.now = 10.0
+
+    report = metrics.level_report(1)
+    assert report["works"] == 20
+    assert report["entities_per_second"] == 5.0
+    assert report["eta_seconds"] == 40.0
+    assert "depth 1: 20/100 works, 5.0 entities/s, ETA 0m40s" in metrics.progress_line()
+
+    metrics.end_level()
+    clock.now = 30.0
+    assert metrics.level_report(1)["seconds"] == 10.0
+    assert metrics.level_report(1)["eta_seconds"] is None
+    assert "depth 1" not in metrics.progress_line()
+
+
+def test_ingest_metrics_summary_names_the_busiest_stage():
+    clock = FakeClock()
+    metrics = IngestMetrics(clock)
+    assert metrics.summary()["bound_by"] is None
+    with metrics.timed("openalex"):
+        clock.now += 2.0
+    with metrics.timed("flush"):
+        clock.now += 5.0
+    metrics.count("flushes")
+    metrics.fetched("works", 3, cached=True)
+
+    summary = metrics.summary()
+    assert summary["bound_by"] == "neo4j"
+    assert summary["busy_seconds"] == {"flush": 5.0, "openalex": 2.0}
+    assert summary["counts"] == {"flushes": 1, "works_cached": 3}
+    assert json.loads(json.dumps(summary)) == summary
+
+
+def test_format_duration():
+    assert format_duration(75.9) == "1m15s"
+    assert format_duration(7300) == "2h01m"
@@ -0,0 +1,115 @@
+import os
+from unittest.mock import MagicMock
+import numpy as np
+import pytest
+from src.vector_index import DIMENSIONS_QUERY, EXPORT_QUERY, LocalVectorIndex, quantize
+
+
+def neo4j_works(works: dict):
+    """
+    Driver answering the index's queries from `works`: ID -> (title, title hash, vector).
+    """
+    driver = MagicMock()
+    driver.exported = []
+
+    def execute_query(query, parameters_=None, routing_=None):
+        if query == EXPORT_QUERY:
+            driver.exported.extend(parameters_["ids"])
+            return [{"id": i, "title": works[i][0], "title_hash": works[i][1], "vector": works[i][2]} for i in parameters_["ids"]], None, None
+        if query == DIMENSIONS_QUERY:
+            return [{"dimensions": len(work[2])} for work in list(works.values())[:1]], None, None
+        return [{"id": i, "title_hash": work[1]} for i, work in works.items()], None, None
+
+    driver.execute_query.side_effect = execute_query
+    return driver
+
+
+def random_works(n: int, dimensions: int = 8, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    return {f"W{i}": (f"Paper {i}", f"h{i}", rng.normal(size=dimensions).tolist()) for i in range(n)}
+
+
+def brute_force(works: dict, query, k: int) -> list[str]:
+    ids = list(works)
+    matrix = np.array([works[i][2] for i in ids])
+    scores = matrix @ query / np.linalg.norm(matrix, axis=1)
+    return [ids[i] for i in np.argsort(-scores)[:k]]
+
+
+def test_batched_top_k_matches_brute_force(tmp_path):
+    works = random_works(50)
+    index = LocalVectorIndex(str(tmp_path), block_rows=7)
+    assert index.refresh(neo4j_works(works), batch_size=16) == {"kept": 0, "exported": 50, "removed": 0}
+
+    queries = np.random.default_rng(1).normal(size=(4, 8))
+    results = index.search(queries, k=5)
+
+    assert [[work_id for work_id, _, _ in result] for result in results] == [brute_force(works, query, 5) for query in queries]
+    work_id, title, score = results[0][0]
+    assert title == works[work_id][0]
+    assert -1.0 <= score <= 1.0
+
+
+def test_int8_index_is_a_quarter_of_the_size_and_ranks_alike(tmp_path):
+    works = random_works(200, dimensions=64)
+    full = LocalVectorIndex(str(tmp_path / "float32"))
+    full.refresh(neo4j_works(works))
+    quantized = LocalVectorIndex(str(tmp_path / "int8"), dtype="int8")
+    quantized.refresh(neo4j_works(works))
+
+    assert quantized.state.matrix.nbytes * 4 == full.state.matrix.nbytes
+    queries = np.random.default_rng(2).normal(size=(10, 64))
+    assert [r[0][0] for r in quantized.search(queries, 1)] == [r[0][0] for r in full.search(queries, 1)]
+
+
+def test_quantize_round_trip():
+    vectors = np.random.default_rng(3).normal(size=(5, 16)).astype(np.float32)
+    values, scales = quantize(vectors)
+
+    assert values.dtype == np.int8
+    assert values * scales[:, None] == pytest.approx(vectors, abs=float(scales.max()))
+
+
+def test_refresh_exports_only_new_and_retitled_works(tmp_path):
+    works = random_works(10)
+    index = LocalVectorIndex(str(tmp_path))
+    index.refresh(neo4j_works(works))
+
+    works["W3"] = ("Renamed", "h3-new", works["W3"][2])
+    works["W10"] = ("Paper 10", "h10", [1.0] * 8)
+    del works["W5"]
+    driver = neo4j_works(works)
+
+    assert index.refresh(driver) == {"kept": 8, "exported": 2, "removed": 2}
+    assert sorted(driver.exported) == ["W10", "W3"]
+    assert sorted(index.state.ids) == sorted(works)
+    assert index.search([[1.0] * 8], 1)[0][0][:2] == ("W10", "Paper 10")
+    # Only the current generation is left on disk
+    assert len([name for name in os.listdir(tmp_path) if name.endswith(".npy")]) == 1
+
+
+def test_refresh_reexports_everything_after_reembedding(tmp_path):
+    works = random_works(6)
+    index = LocalVectorIndex(str(tmp_path))
+    index.refresh(neo4j_works(works))
+
+    # Shorter vectors, same titles
+    works = {work_id: (title, title_hash, vector[:4]) for work_id, (title, title_hash, vector) in works.items()}
+    assert index.refresh(neo4j_works(works)) == {"kept": 0, "exported": 6, "removed": 6}
+    assert index.state.matrix.shape == (6, 4)
+
+    # Same dimensions, another model
+    assert index.refresh(neo4j_works(works), rebuild=True) == {"kept": 0, "exported": 6, "removed": 6}
+
+
+def test_readers_pick_up_a_refresh(tmp_path):
+    works = random_works(5)
+    writer = LocalVectorIndex(str(tmp_path))
+    reader = LocalVectorIndex(str(tmp_path))
+    assert len(reader) == 0
+
+    writer.refresh(neo4j_works(works))
+
+    assert reader.reload_if_changed()
+    assert not reader.reload_if_changed()
+    assert len(reader) == 5